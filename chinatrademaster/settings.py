@@ -68,7 +68,9 @@ ACCOUNT_UNIQUE_EMAIL = True  # Ensure email is unique
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'store.middleware.PrecompressedStaticMiddleware',  # Fichiers construits par collectstatic
+    'store.middleware.ServerTimingMiddleware',  # En-tête Server-Timing et journal des requêtes lentes
+    'store.middleware.LazySessionMiddleware',  # Remplace SessionMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -82,7 +84,7 @@ ROOT_URLCONF = 'chinatrademaster.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'store.instrumentation.TimedDjangoTemplates',  # DjangoTemplates, rendu mesuré
         'DIRS': [BASE_DIR / 'templates'],  # Ajout du dossier templates
         'APP_DIRS': True,
         'OPTIONS': {
@@ -106,6 +108,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Les transactions prennent le verrou d'écriture dès le BEGIN :
+            # les commandes concurrentes attendent au lieu d'échouer en "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Base de test sur disque : la base en mémoire partagée ne gère pas
+        # l'attente du verrou (tests de concurrence de store.tests)
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -150,6 +163,17 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# `collectstatic` produit des noms hashés, dédoublonnés et précompressés (.gz/.br),
+# servis par PrecompressedStaticMiddleware (voir store/staticfiles.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'store.staticfiles.PrecompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -160,5 +184,73 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Configuration pour les sessions (panier)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'  # lectures servies par le cache
 SESSION_COOKIE_AGE = 86400  # 24 heures
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
+# Une session non modifiée n'est réenregistrée (expiration prolongée) que
+# lorsqu'il lui reste moins que ce nombre de secondes (voir LazySessionMiddleware)
+SESSION_REFRESH_THRESHOLD = 43200  # 12 heures
+
+# Moteur de stockage du panier : 'store.cart.DatabaseCart' (tout en base) ou
+# 'store.cart.SessionCart' (paniers anonymes dans le cache CART_CACHE_ALIAS,
+# écrits en base à la connexion ou à la commande)
+CART_ENGINE = 'store.cart.SessionCart'
+# Cache des paniers anonymes : à partager entre les processus en production
+CART_CACHE_ALIAS = 'default'
+# Purge périodique des paniers anonymes abandonnés et des sessions expirées
+# dans le processus web (secondes, voir store.purge) ; None : seulement
+# `manage.py purge_carts`, par exemple depuis cron
+CART_PURGE_INTERVAL = None
+CART_PURGE_BATCH_SIZE = 500
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# En production multi-processus, préférer un cache partagé, par exemple :
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+# 'LOCATION': BASE_DIR / 'cache',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chinatrademaster',
+        # Fragments JSON des produits (deux par produit), paniers et catalogue
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Cache de lecture du catalogue (versionné, invalidé par les signaux de store)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300  # 5 minutes
+# Commentaires HTML et journal des succès/échecs du cache de fragments ({% cached_fragment %})
+CATALOG_FRAGMENT_DEBUG = False
+# Fragments JSON des produits, partagés entre les processus (voir store.documents)
+PRODUCT_DOCUMENT_CACHE_ALIAS = 'default'
+PRODUCT_DOCUMENT_TIMEOUT = 86400  # 24 heures
+# Réponse de /api/bootstrap/ gardée en cache par session (secondes)
+BOOTSTRAP_CACHE_TIMEOUT = 30
+
+# Instrumentation des requêtes (voir store.middleware.ServerTimingMiddleware).
+# L'en-tête Server-Timing détaille temps et nombre de requêtes SQL de chaque
+# réponse : en développement seulement, pas pour tous les visiteurs
+SERVER_TIMING_HEADER = DEBUG
+# Au-delà, la requête est journalisée (logger store.performance) ; None pour désactiver
+SLOW_REQUEST_THRESHOLD_MS = 500
+
+# Métriques Prometheus (/internal/metrics, voir store.metrics). Avec plusieurs
+# processus (gunicorn), un répertoire partagé par les workers et vidé au
+# démarrage ; sinon les valeurs restent propres à chaque processus.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Jeton des collecteurs pour lire /internal/metrics (en-tête
+# `Authorization: Bearer <jeton>`) ; sans jeton, seul le staff y a accès
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'store.performance': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
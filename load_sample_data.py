@@ -14,6 +14,9 @@ django.setup()
 
 from store.models import Category, Product
 from django.contrib.auth.models import User
+from django.core.management import call_command
+
+SAMPLE_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'store', 'fixtures', 'sample_catalog.jsonl')
 
 def create_sample_data():
     """Créer des données d'exemple pour l'e-commerce"""
@@ -51,109 +54,8 @@ def create_sample_data():
         else:
             print(f"⚠ Catégorie existante: {category.name}")
     
-    # Créer des produits
-    products_data = [
-        {
-            'title': 'Smartphone Huawei P40',
-            'slug': 'smartphone-huawei-p40',
-            'description': 'Smartphone haut de gamme avec appareil photo Leica, écran 6.1", 128GB de stockage.',
-            'price': 599.99,
-            'stock': 15,
-            'category': categories['electronique'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Huawei+P40'
-        },
-        {
-            'title': 'Écouteurs Bluetooth Xiaomi',
-            'slug': 'ecouteurs-bluetooth-xiaomi',
-            'description': 'Écouteurs sans fil avec réduction de bruit active, autonomie 20h.',
-            'price': 89.99,
-            'stock': 25,
-            'category': categories['electronique'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Xiaomi+Earbuds'
-        },
-        {
-            'title': 'Tablette Samsung Galaxy Tab',
-            'slug': 'tablette-samsung-galaxy-tab',
-            'description': 'Tablette 10.1" avec processeur octa-core, 64GB de stockage, Android 11.',
-            'price': 299.99,
-            'stock': 8,
-            'category': categories['electronique'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Samsung+Galaxy+Tab'
-        },
-        {
-            'title': 'T-shirt en coton bio',
-            'slug': 't-shirt-coton-bio',
-            'description': 'T-shirt en coton biologique, coupe régulière, disponible en plusieurs couleurs.',
-            'price': 24.99,
-            'stock': 50,
-            'category': categories['mode'],
-            'image_url': 'https://via.placeholder.com/300x200?text=T-shirt+Bio'
-        },
-        {
-            'title': 'Sneakers casual',
-            'slug': 'sneakers-casual',
-            'description': 'Sneakers confortables en cuir synthétique, semelle en caoutchouc, style urbain.',
-            'price': 79.99,
-            'stock': 20,
-            'category': categories['mode'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Sneakers+Casual'
-        },
-        {
-            'title': 'Sac à dos léger',
-            'slug': 'sac-a-dos-leger',
-            'description': 'Sac à dos 25L avec compartiments multiples, idéal pour le quotidien.',
-            'price': 45.99,
-            'stock': 30,
-            'category': categories['mode'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Sac+a+Dos'
-        },
-        {
-            'title': 'Lampe de bureau LED',
-            'slug': 'lampe-bureau-led',
-            'description': 'Lampe de bureau moderne avec éclairage LED réglable, design minimaliste.',
-            'price': 39.99,
-            'stock': 12,
-            'category': categories['maison'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Lampe+LED'
-        },
-        {
-            'title': 'Coussin décoratif',
-            'slug': 'coussin-decoratif',
-            'description': 'Coussin décoratif en velours, 40x40cm, plusieurs motifs disponibles.',
-            'price': 19.99,
-            'stock': 35,
-            'category': categories['maison'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Coussin+Decoratif'
-        },
-        {
-            'title': 'Kit de jardinage',
-            'slug': 'kit-jardinage',
-            'description': 'Kit complet de jardinage avec outils essentiels, idéal pour débutants.',
-            'price': 69.99,
-            'stock': 10,
-            'category': categories['maison'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Kit+Jardinage'
-        },
-        {
-            'title': 'Cafetière programmable',
-            'slug': 'cafetiere-programmable',
-            'description': 'Cafetière programmable 12 tasses avec minuterie et filtre permanent.',
-            'price': 89.99,
-            'stock': 7,
-            'category': categories['maison'],
-            'image_url': 'https://via.placeholder.com/300x200?text=Cafetiere'
-        }
-    ]
-    
-    for product_data in products_data:
-        product, created = Product.objects.get_or_create(
-            slug=product_data['slug'],
-            defaults=product_data
-        )
-        if created:
-            print(f"✓ Produit créé: {product.title} - {product.price}€")
-        else:
-            print(f"⚠ Produit existant: {product.title}")
+    # Importer les produits (upsert par slug, voir `manage.py import_catalog`)
+    call_command('import_catalog', SAMPLE_CATALOG)
     
     # Créer un utilisateur de test
     if not User.objects.filter(username='admin').exists():
@@ -170,67 +170,55 @@ class CartPage {
         `;
     }
 
-    async updateQuantity(cartItemId, change) {
-        try {
-            const item = this.cart.find(item => item.id === parseInt(cartItemId));
-            if (!item) return;
+    // Modifications envoyées à /api/cart/batch/, qui renvoie le panier à jour :
+    // un seul appel par action, sans rechargement de /api/cart/
+    async applyOperations(operations) {
+        const response = await fetch('/api/cart/batch/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCSRFToken()
+            },
+            body: JSON.stringify({ operations: operations })
+        });
 
-            const newQuantity = item.quantity + change;
-            if (newQuantity < 1) {
-                this.removeFromCart(cartItemId);
-                return;
-            }
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'Erreur inconnue');
+        }
 
-            const response = await fetch('/api/cart/add/', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCSRFToken()
-                },
-                body: JSON.stringify({
-                    product_id: item.product.id,
-                    quantity: newQuantity
-                })
-            });
+        this.cart = data.items;
+        this.renderCart();
+        this.updateCartCount();
+        return data;
+    }
 
-            const data = await response.json();
+    async updateQuantity(cartItemId, change) {
+        const item = this.cart.find(item => item.id === parseInt(cartItemId));
+        if (!item) return;
 
-            if (data.success) {
-                this.loadCart();
-                this.showNotification('Succès', 'Quantité mise à jour', 'success');
-            } else {
-                this.showNotification('Erreur', data.error, 'error');
-            }
+        const newQuantity = item.quantity + change;
+        if (newQuantity < 1) {
+            this.removeFromCart(cartItemId);
+            return;
+        }
+
+        try {
+            await this.applyOperations([{ op: 'set', item_id: item.id, quantity: newQuantity }]);
+            this.showNotification('Succès', 'Quantité mise à jour', 'success');
         } catch (error) {
             console.error('Erreur lors de la mise à jour de la quantité:', error);
-            this.showNotification('Erreur', 'Erreur lors de la mise à jour', 'error');
+            this.showNotification('Erreur', error.message, 'error');
         }
     }
 
     async removeFromCart(cartItemId) {
         try {
-            const response = await fetch('/api/cart/remove/', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCSRFToken()
-                },
-                body: JSON.stringify({
-                    cart_item_id: cartItemId
-                })
-            });
-
-            const data = await response.json();
-
-            if (data.success) {
-                this.showNotification('Succès', 'Produit supprimé du panier', 'success');
-                this.loadCart();
-            } else {
-                this.showNotification('Erreur', data.error, 'error');
-            }
+            await this.applyOperations([{ op: 'remove', item_id: parseInt(cartItemId) }]);
+            this.showNotification('Succès', 'Produit supprimé du panier', 'success');
         } catch (error) {
             console.error('Erreur lors de la suppression:', error);
-            this.showNotification('Erreur', 'Erreur lors de la suppression', 'error');
+            this.showNotification('Erreur', error.message, 'error');
         }
     }
 
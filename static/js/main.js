@@ -8,19 +8,38 @@ class ChinaTradeMaster {
         this.currentPage = 1;
         this.productsPerPage = 12;
         this.currentFilters = {};
+        this.nextCursor = null;
+        this.loadingMore = false;
+        this.scrollObserver = null;
+        // Incrémenté à chaque rechargement de la liste : les réponses d'une
+        // génération précédente (anciens filtres) sont ignorées
+        this.productsGeneration = 0;
         this.user = null;
         this.cartItemCount = 0;
+        this.initialState = this.readInitialState();
         this.init();
     }
 
     init() {
         this.bindEvents();
-        this.checkAuthStatus();
-        this.loadCartCount();
+        this.loadBootstrap();
+        if (this.initialState.cart) {
+            this.updateCartCount(this.initialState.cart.items);
+        }
+        if (this.initialState.related) {
+            this.renderSimilarProducts(this.initialState.related);
+        }
         if (document.getElementById('productsGrid')) {
             this.loadProducts();
         }
     }
+
+    // État embarqué par le serveur ({{ initial_state|json_script:"initial-state" }}),
+    // au format des API : évite de les appeler au chargement de la page
+    readInitialState() {
+        const element = document.getElementById('initial-state');
+        return element ? JSON.parse(element.textContent) : {};
+    }
     
     debounce(func, wait) {
         let timeout;
@@ -75,27 +94,176 @@ class ChinaTradeMaster {
 
         productsGrid.innerHTML = `<div class="col-12 text-center my-5"><div class="spinner-border text-primary" role="status"><span class="visually-hidden">Chargement...</span></div></div>`;
 
+        const generation = ++this.productsGeneration;
+        this.nextCursor = null;
+        this.loadingMore = false;
+
+        // Défilement infini : pagination par curseur, sans comptage côté serveur
+        const cursorMode = this.isCursorMode();
         const params = new URLSearchParams({
-            page: this.currentPage,
             page_size: this.productsPerPage,
             ...this.currentFilters
         });
+        if (cursorMode) {
+            params.set('cursor', '');
+        } else {
+            params.set('page', this.currentPage);
+        }
+
+        this.loadFacets();
 
         try {
             const response = await fetch(`/api/products/?${params.toString()}`);
             if (!response.ok) throw new Error('Network response was not ok');
             const data = await response.json();
+            if (generation !== this.productsGeneration) return;
             this.renderProducts(data.results);
-            this.renderPagination(data);
+            if (cursorMode) {
+                this.nextCursor = data.pagination.next_cursor;
+                this.observeInfiniteScroll();
+            } else {
+                this.renderPagination(data);
+            }
         } catch (error) {
+            if (generation !== this.productsGeneration) return;
             productsGrid.innerHTML = `<div class="col-12"><div class="alert alert-danger">Impossible de charger les produits.</div></div>`;
             console.error('Error loading products:', error);
         }
     }
 
-    renderProducts(products) {
+    async loadFacets() {
+        // Compteurs des filtres de la barre latérale (page des produits)
+        if (!document.getElementById('category-filter-container')) return;
+        const params = new URLSearchParams();
+        ['category', 'min_price', 'max_price', 'q'].forEach(name => {
+            if (this.currentFilters[name]) params.set(name, this.currentFilters[name]);
+        });
+
+        try {
+            const response = await fetch(`/api/facets/?${params.toString()}`);
+            if (!response.ok) throw new Error('Network response was not ok');
+            this.renderFacets(await response.json());
+        } catch (error) {
+            console.error('Error loading facets:', error);
+        }
+    }
+
+    renderFacets(data) {
+        const counts = {};
+        let allCategories = 0;
+        data.categories.forEach(category => {
+            counts[category.slug] = category.count;
+            allCategories += category.count;
+        });
+        document.querySelectorAll('.category-filter').forEach(link => {
+            let badge = link.querySelector('.facet-count');
+            if (!badge) {
+                badge = document.createElement('span');
+                badge.className = 'badge bg-light text-dark float-end facet-count';
+                link.appendChild(badge);
+            }
+            const slug = link.dataset.categorySlug;
+            badge.textContent = slug ? (counts[slug] || 0) : allCategories;
+        });
+
+        const priceFacets = document.getElementById('price-facets');
+        if (!priceFacets) return;
+        priceFacets.innerHTML = '';
+        data.price_buckets.forEach(bucket => {
+            if (!bucket.count) return;
+            const label = bucket.max_price === null
+                ? `${this.formatPrice(bucket.min_price)} FCFA et plus`
+                : `${this.formatPrice(bucket.min_price)} - ${this.formatPrice(bucket.max_price)} FCFA`;
+            const link = document.createElement('a');
+            link.href = '#';
+            link.className = 'list-group-item list-group-item-action price-facet';
+            link.textContent = label;
+            const badge = document.createElement('span');
+            badge.className = 'badge bg-light text-dark float-end';
+            badge.textContent = bucket.count;
+            link.appendChild(badge);
+            link.addEventListener('click', e => {
+                e.preventDefault();
+                // Tranche [min, max[ : la borne haute est exclue
+                const maxPrice = bucket.max_price === null ? '' : (bucket.max_price - 0.01).toFixed(2);
+                this.currentFilters.min_price = String(bucket.min_price);
+                this.currentFilters.max_price = maxPrice;
+                const minInput = document.getElementById('minPrice');
+                const maxInput = document.getElementById('maxPrice');
+                if (minInput) minInput.value = bucket.min_price;
+                if (maxInput) maxInput.value = maxPrice;
+                this.currentPage = 1;
+                this.loadProducts();
+            });
+            priceFacets.appendChild(link);
+        });
+    }
+
+    isCursorMode() {
+        const productsGrid = document.getElementById('productsGrid');
+        return !!productsGrid && productsGrid.dataset.pagination === 'cursor';
+    }
+
+    observeInfiniteScroll() {
         const productsGrid = document.getElementById('productsGrid');
-        productsGrid.innerHTML = '';
+        let sentinel = document.getElementById('productsSentinel');
+        if (!sentinel) {
+            sentinel = document.createElement('div');
+            sentinel.id = 'productsSentinel';
+            productsGrid.after(sentinel);
+        }
+        if (!this.scrollObserver) {
+            this.scrollObserver = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    this.loadMoreProducts();
+                }
+            }, { rootMargin: '400px' });
+        }
+        // L'observateur ne se déclenche qu'au changement de visibilité : après
+        // l'ajout d'une page trop courte, la sentinelle reste visible et plus
+        // rien ne se passerait. Réobserver produit un nouveau rappel avec
+        // l'état courant.
+        this.scrollObserver.unobserve(sentinel);
+        this.scrollObserver.observe(sentinel);
+    }
+
+    async loadMoreProducts() {
+        if (!this.nextCursor || this.loadingMore) return;
+        const generation = this.productsGeneration;
+        this.loadingMore = true;
+
+        const params = new URLSearchParams({
+            page_size: this.productsPerPage,
+            ...this.currentFilters,
+            cursor: this.nextCursor
+        });
+
+        try {
+            const response = await fetch(`/api/products/?${params.toString()}`);
+            if (!response.ok) throw new Error('Network response was not ok');
+            const data = await response.json();
+            // Filtres changés pendant la requête : page d'une ancienne liste
+            if (generation !== this.productsGeneration) return;
+            this.renderProducts(data.results, true);
+            this.nextCursor = data.pagination.next_cursor;
+            // Rappel asynchrone, reçu après la remise à zéro de loadingMore
+            this.observeInfiniteScroll();
+        } catch (error) {
+            console.error('Error loading more products:', error);
+        } finally {
+            if (generation === this.productsGeneration) {
+                this.loadingMore = false;
+            }
+        }
+    }
+
+    renderProducts(products, append = false) {
+        const productsGrid = document.getElementById('productsGrid');
+        if (append) {
+            if (!products || products.length === 0) return;
+        } else {
+            productsGrid.innerHTML = '';
+        }
         if (!products || products.length === 0) {
             productsGrid.innerHTML = `<div class="col-12"><div class="alert alert-info">Aucun produit trouvé.</div></div>`;
             return;
@@ -120,6 +288,50 @@ class ChinaTradeMaster {
         this.bindAddToCartButtons();
     }
 
+    renderSimilarProducts(products) {
+        const container = document.getElementById('similarProducts');
+        if (!container || products.length === 0) return;
+        container.replaceChildren(...products.map(product => this.similarProductCard(product)));
+        document.getElementById('similarProductsSection').classList.remove('d-none');
+    }
+
+    // Carte construite élément par élément : les champs du produit sont
+    // affectés en texte ou en attribut, jamais interprétés comme du HTML
+    similarProductCard(product) {
+        const url = `/product/${encodeURIComponent(product.slug)}/`;
+        const column = document.createElement('div');
+        column.className = 'col-lg-3 col-md-6 mb-4';
+        const card = document.createElement('div');
+        card.className = 'card h-100';
+
+        const imageLink = document.createElement('a');
+        imageLink.href = url;
+        const image = document.createElement('img');
+        image.src = product.images.length > 0 ? product.images[0].image : '/static/images/placeholder.png';
+        image.className = 'card-img-top';
+        image.alt = product.name;
+        image.loading = 'lazy';
+        imageLink.appendChild(image);
+
+        const body = document.createElement('div');
+        body.className = 'card-body';
+        const title = document.createElement('h5');
+        title.className = 'card-title';
+        title.textContent = product.name;
+        const price = document.createElement('p');
+        price.className = 'card-text';
+        price.textContent = `${this.formatPrice(product.price)} FCFA`;
+        const detailsLink = document.createElement('a');
+        detailsLink.href = url;
+        detailsLink.className = 'btn btn-outline-primary btn-sm';
+        detailsLink.textContent = 'Voir détails';
+        body.append(title, price, detailsLink);
+
+        card.append(imageLink, body);
+        column.appendChild(card);
+        return column;
+    }
+
     renderPagination(data) {
         const paginationContainer = document.getElementById('pagination');
         if (!paginationContainer) return;
@@ -178,11 +390,7 @@ class ChinaTradeMaster {
             const response = await fetch('/api/cart/');
             if (!response.ok) return;
             const data = await response.json();
-            this.cartItemCount = data.items.reduce((sum, item) => sum + item.quantity, 0);
-            document.querySelectorAll('.cart-count').forEach(el => {
-                el.textContent = this.cartItemCount;
-                el.classList.toggle('d-none', this.cartItemCount === 0);
-            });
+            this.updateCartCount(data.items);
         } catch (error) {
             console.error('Error loading cart count:', error);
         }
@@ -191,7 +399,12 @@ class ChinaTradeMaster {
     async loadCartContent() {
         const cartContent = document.getElementById('cartContent');
         if (!cartContent) return;
-        cartContent.innerHTML = `<div class="text-center"><div class="spinner-border"></div></div>`;
+        if (this.initialState.cart) {
+            this.renderCart(this.initialState.cart);
+            return;
+        }
+        // Indicateur dans la liste seulement : renderCart a besoin du reste de la page
+        document.getElementById('cartItems').innerHTML = `<div class="text-center"><div class="spinner-border"></div></div>`;
 
         try {
             const response = await fetch('/api/cart/');
@@ -248,16 +461,39 @@ class ChinaTradeMaster {
         this.bindCartItemEvents();
     }
     
+    // Applique plusieurs opérations (add / set / remove) en un seul appel
+    // et affiche directement le panier renvoyé par le serveur
+    async applyCartOperations(operations) {
+        const response = await fetch('/api/cart/batch/', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': this.getCookie('csrftoken') },
+            body: JSON.stringify({ operations: operations })
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Erreur inconnue');
+
+        if (document.getElementById('cartItems')) {
+            this.renderCart(data);
+        }
+        this.updateCartCount(data.items);
+        return data;
+    }
+
+    updateCartCount(items) {
+        this.setCartCount(items.reduce((sum, item) => sum + item.quantity, 0));
+    }
+
+    setCartCount(count) {
+        this.cartItemCount = count;
+        document.querySelectorAll('.cart-count').forEach(el => {
+            el.textContent = this.cartItemCount;
+            el.classList.toggle('d-none', this.cartItemCount === 0);
+        });
+    }
+
     async updateCartItem(itemId, quantity) {
         try {
-            const response = await fetch(`/api/cart/update/${itemId}/`, {
-                method: 'PATCH',
-                headers: { 'Content-Type': 'application/json', 'X-CSRFToken': this.getCookie('csrftoken') },
-                body: JSON.stringify({ quantity: quantity })
-            });
-            if (!response.ok) throw new Error('Update failed');
-            this.loadCartContent();
-            this.loadCartCount();
+            await this.applyCartOperations([{ op: 'set', item_id: itemId, quantity: quantity }]);
         } catch (error) {
             this.showToast('Erreur', "Impossible de mettre à jour l'article.", 'danger');
         }
@@ -265,24 +501,21 @@ class ChinaTradeMaster {
 
     async removeCartItem(itemId) {
         try {
-            const response = await fetch(`/api/cart/remove/${itemId}/`, {
-                method: 'DELETE',
-                headers: { 'X-CSRFToken': this.getCookie('csrftoken') }
-            });
-            if (!response.ok) throw new Error('Remove failed');
-            this.loadCartContent();
-            this.loadCartCount();
+            await this.applyCartOperations([{ op: 'remove', item_id: itemId }]);
         } catch (error) {
             this.showToast('Erreur', "Impossible de supprimer l'article.", 'danger');
         }
     }
 
-    async checkAuthStatus() {
+    // Authentification, nombre d'articles du panier et catégories en un seul appel
+    async loadBootstrap() {
         try {
-            const response = await fetch('/api/auth/status/'); // Assuming this endpoint exists
+            const response = await fetch('/api/bootstrap/');
             if (response.ok) {
                 const data = await response.json();
                 this.user = data.isAuthenticated ? data.user : null;
+                this.setCartCount(data.cart.quantity);
+                this.renderCategoryNav(data.categories);
             }
         } catch (error) {
             this.user = null;
@@ -290,6 +523,21 @@ class ChinaTradeMaster {
         this.updateAuthUI();
     }
 
+    renderCategoryNav(categories) {
+        const categoryNav = document.getElementById('categoryNav');
+        if (!categoryNav || categoryNav.dataset.loaded) return;
+        categories.forEach(category => {
+            const link = document.createElement('a');
+            link.className = 'dropdown-item';
+            link.href = `/category/${encodeURIComponent(category.slug)}/`;
+            link.textContent = category.name;
+            const item = document.createElement('li');
+            item.appendChild(link);
+            categoryNav.appendChild(item);
+        });
+        categoryNav.dataset.loaded = 'true';
+    }
+
     updateAuthUI() {
         const authButtons = document.querySelector('.auth-buttons');
         if (!authButtons) return;
@@ -351,7 +599,7 @@ class ChinaTradeMaster {
                     
                     const loginModal = bootstrap.Modal.getInstance(document.getElementById('loginModal'));
                     loginModal.hide();
-                    this.checkAuthStatus();
+                    this.loadBootstrap();
                 } catch (error) {
                     this.showToast('Erreur de connexion', error.message, 'danger');
                 }
@@ -379,7 +627,7 @@ class ChinaTradeMaster {
                     
                     const registerModal = bootstrap.Modal.getInstance(document.getElementById('registerModal'));
                     registerModal.hide();
-                    this.checkAuthStatus();
+                    this.loadBootstrap();
                 } catch (error) {
                     this.showToast("Erreur d'inscription", error.message, 'danger');
                 }
@@ -4,6 +4,9 @@ class ProductDetailPage {
     constructor() {
         this.product = null;
         this.cart = [];
+        // Produit, produits similaires et panier embarqués par la vue (json_script)
+        const initialState = document.getElementById('initial-state');
+        this.initialState = initialState ? JSON.parse(initialState.textContent) : {};
         this.init();
     }
 
@@ -60,6 +63,12 @@ class ProductDetailPage {
     }
 
     async loadProduct() {
+        if (this.initialState.product) {
+            this.product = this.initialState.product;
+            this.updateProductInfo();
+            this.loadSimilarProducts();
+            return;
+        }
         try {
             // Récupérer l'ID du produit depuis l'URL
             const pathParts = window.location.pathname.split('/');
@@ -139,34 +148,46 @@ class ProductDetailPage {
     }
 
     async loadSimilarProducts() {
+        if (this.initialState.related) {
+            this.showSimilarProducts(this.initialState.related);
+            return;
+        }
         try {
-            const response = await fetch(`/api/products/?category=${this.product.category.slug}&limit=4`);
+            // Seulement les champs affichés ; un de plus que la grille, le produit courant étant exclu
+            const params = new URLSearchParams({
+                category: this.product.category.slug,
+                limit: 5,
+                fields: 'id,name,slug,description,price,images,category,is_in_stock'
+            });
+            const response = await fetch(`/api/products/?${params.toString()}`);
             const data = await response.json();
             
-            const similarProductsContainer = document.getElementById('similarProducts');
-            if (similarProductsContainer && data.products.length > 0) {
-                let html = '';
-                data.products.forEach(product => {
-                    if (product.id !== this.product.id) {
-                        html += this.renderSimilarProduct(product);
-                    }
-                });
-                similarProductsContainer.innerHTML = html;
-            }
+            this.showSimilarProducts(data.results.filter(product => product.id !== this.product.id).slice(0, 4));
         } catch (error) {
             console.error('Erreur lors du chargement des produits similaires:', error);
         }
     }
 
+    showSimilarProducts(similarProducts) {
+        const similarProductsContainer = document.getElementById('similarProducts');
+        if (similarProductsContainer && similarProducts.length > 0) {
+            let html = '';
+            similarProducts.forEach(product => {
+                html += this.renderSimilarProduct(product);
+            });
+            similarProductsContainer.innerHTML = html;
+        }
+    }
+
     renderSimilarProduct(product) {
-        const imageUrl = this.getProductImageUrl(product.image_url);
+        const imageUrl = this.getProductImageUrl(product.images.length > 0 ? product.images[0].image : '');
         
         return `
             <div class="col-lg-3 col-md-6 col-sm-12 mb-4">
                 <div class="card product-card h-100">
                     <img src="${imageUrl}" 
                          class="card-img-top" 
-                         alt="${product.title}" 
+                         alt="${product.name}" 
                          loading="lazy"
                          onerror="this.onerror=null; this.src='https://via.placeholder.com/300x200?text=Image+non+disponible'"
                          style="height: 200px; object-fit: contain; padding: 10px;">
@@ -174,7 +195,7 @@ class ProductDetailPage {
                         <div class="mb-2">
                             <span class="category-badge">${product.category.name}</span>
                         </div>
-                        <h5 class="card-title">${product.title}</h5>
+                        <h5 class="card-title">${product.name}</h5>
                         <p class="card-text text-muted">${product.description.substring(0, 100)}...</p>
                         <div class="mt-auto">
                             <div class="d-flex justify-content-between align-items-center mb-3">
@@ -252,6 +273,13 @@ class ProductDetailPage {
     }
 
     async loadCart() {
+        if (this.initialState.cart) {
+            this.cart = this.initialState.cart.items;
+            // Une seule fois : les rechargements suivants (après un ajout) interrogent l'API
+            this.initialState.cart = null;
+            this.updateCartCount();
+            return;
+        }
         try {
             const response = await fetch('/api/cart/');
             const data = await response.json();
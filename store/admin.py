@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Category, Product, CartItem, Order, OrderItem
 
+from django.core.files.storage import default_storage
 from django.utils.html import format_html
 
 @admin.register(Category)
@@ -13,13 +14,17 @@ class CategoryAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 50px; max-width: 50px;" />'.format(obj.image.url))
+            # Plus petite déclinaison JPEG plutôt que l'original redimensionné en CSS
+            thumbnails = obj.image_variants.get('jpeg')
+            url = default_storage.url(thumbnails[0][1]) if thumbnails else obj.image.url
+            return format_html('<img src="{}" style="max-height: 50px; max-width: 50px;" />', url)
         return "Aucune image"
     image_preview.short_description = 'Aperçu'
     
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.active_product_count
     product_count.short_description = 'Nb. produits'
+    product_count.admin_order_field = 'active_product_count'
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -37,6 +42,8 @@ class OrderItemInline(admin.TabularInline):
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_number', 'user', 'email', 'total', 'status', 'created_at']
+    # `user` est nullable : select_related() automatique de l'admin ne le suit pas
+    list_select_related = ['user']
     list_filter = ['status', 'created_at']
     search_fields = ['order_number', 'email', 'first_name', 'last_name']
     readonly_fields = ['order_number', 'created_at', 'updated_at']
@@ -57,6 +64,7 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['product', 'session_id', 'user', 'quantity', 'price_snapshot', 'created_at']
+    list_select_related = ['product', 'user']
     list_filter = ['created_at']
     search_fields = ['product__title', 'session_id']
     readonly_fields = ['created_at', 'updated_at']
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from . import instrumentation, signals  # noqa: F401
+        from .purge import start_periodic_purge
+        start_periodic_purge()
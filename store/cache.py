@@ -0,0 +1,212 @@
+"""
+Cache de lecture du catalogue, versionné
+
+Toutes les entrées sont préfixées par une "version du catalogue" globale.
+Les signaux de `store.signals` incrémentent cette version à chaque écriture
+sur Product ou Category, une fois la transaction validée : les anciennes
+entrées deviennent inaccessibles d'un coup, sans parcourir les clés, et
+expirent d'elles-mêmes.
+
+Les entrées qui exposent le stock (`stock=True`) dépendent en plus d'une
+version du stock, incrémentée par la commande : un achat n'invalide que ces
+entrées, pas les catégories, la navigation ni les fragments de gabarits.
+
+Les fonctions préfixées par `a` sont les variantes pour les vues asynchrones.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from .metrics import record_cache_lookup
+
+VERSION_KEY = 'catalog:version'
+STOCK_VERSION_KEY = 'catalog:stock-version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+async def _acall(cache, method, *args, **kwargs):
+    """
+    Appel asynchrone du cache. Les méthodes `a...` de Django passent par un
+    thread (sync_to_async) ; LocMemCache, sans entrée-sortie, est appelé directement.
+    """
+    if isinstance(cache, LocMemCache):
+        return getattr(cache, method)(*args, **kwargs)
+    return await getattr(cache, f'a{method}')(*args, **kwargs)
+
+
+def _get_version(key):
+    """Version courante sous `key` (initialisée si absente du cache)"""
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # Horodatage en ms : après une éviction, la nouvelle version reste
+        # supérieure aux précédentes et ne ressuscite pas d'anciennes entrées.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    cache = get_cache()
+    version = await _acall(cache, 'get', key)
+    if version is None:
+        await _acall(cache, 'add', key, int(time.time() * 1000), timeout=None)
+        version = await _acall(cache, 'get', key)
+    return version
+
+
+def _bump_version(key):
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_catalog_version():
+    """Version courante du catalogue"""
+    return _get_version(VERSION_KEY)
+
+
+async def aget_catalog_version():
+    return await _aget_version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalide d'un coup toutes les entrées du catalogue"""
+    return _bump_version(VERSION_KEY)
+
+
+def get_stock_version():
+    """Version courante du stock"""
+    return _get_version(STOCK_VERSION_KEY)
+
+
+def bump_stock_version():
+    """Invalide les seules entrées qui exposent le stock (`stock=True`)"""
+    return _bump_version(STOCK_VERSION_KEY)
+
+
+def _versioned_key(version, name, params):
+    # urlencode : une valeur contenant '&' ou '=' ne peut pas imiter un autre paramètre
+    normalized = urlencode(sorted((params or {}).items()))
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    return f'catalog:{version}:{name}:{digest}'
+
+
+def catalog_key(name, params=None, stock=False):
+    """
+    Clé de cache pour `name` et un dictionnaire de paramètres normalisé ;
+    avec `stock`, la clé dépend aussi de la version du stock
+    """
+    version = get_catalog_version()
+    if stock:
+        version = f'{version}.{get_stock_version()}'
+    return _versioned_key(version, name, params)
+
+
+async def acatalog_key(name, params=None, stock=False):
+    version = await aget_catalog_version()
+    if stock:
+        version = f'{version}.{await _aget_version(STOCK_VERSION_KEY)}'
+    return _versioned_key(version, name, params)
+
+
+def get_or_set(name, params, builder, timeout=None, stock=False):
+    """
+    Retourne la valeur en cache ou la calcule avec `builder()` et la stocke
+    (`timeout` secondes, CATALOG_CACHE_TIMEOUT par défaut)
+    """
+    cache = get_cache()
+    key = catalog_key(name, params, stock)
+    value = cache.get(key)
+    record_cache_lookup('data', value is not None)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout or get_timeout())
+    return value
+
+
+async def aget_or_set(name, params, builder, timeout=None, stock=False):
+    """Variante de `get_or_set` ; `builder` est une fonction asynchrone"""
+    cache = get_cache()
+    key = await acatalog_key(name, params, stock)
+    value = await _acall(cache, 'get', key)
+    record_cache_lookup('data', value is not None)
+    if value is None:
+        value = await builder()
+        await _acall(cache, 'set', key, value, timeout or get_timeout())
+    return value
+
+
+def forget(name, params, stock=False):
+    """Supprime l'entrée `get_or_set(name, params, ...)` de la version courante"""
+    get_cache().delete(catalog_key(name, params, stock))
+
+
+def cached_catalog_view(name, params=(), stock=False):
+    """
+    Décorateur pour les vues JSON du catalogue : le corps des réponses 200 est
+    mis en cache par combinaison (arguments d'URL + paramètres GET `params`).
+    Accepte les vues synchrones et asynchrones. `stock` : la réponse expose
+    le stock (voir `bump_stock_version`).
+
+    La clé reprend les valeurs exactes lues par la vue (`request.GET[param]`,
+    sans normalisation) : deux requêtes ne partagent une entrée que si la vue
+    les traite à l'identique.
+    """
+    def key_params(request, kwargs):
+        values = dict(kwargs)
+        for param in params:
+            if param in request.GET:
+                values[param] = request.GET[param]
+        return values
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                cache = get_cache()
+                key = await acatalog_key(name, key_params(request, kwargs), stock)
+                content = await _acall(cache, 'get', key)
+                record_cache_lookup('view', content is not None)
+                if content is not None:
+                    return HttpResponse(content, content_type='application/json')
+
+                response = await view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    await _acall(cache, 'set', key, response.content, get_timeout())
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            cache = get_cache()
+            key = catalog_key(name, key_params(request, kwargs), stock)
+            content = cache.get(key)
+            record_cache_lookup('view', content is not None)
+            if content is not None:
+                return HttpResponse(content, content_type='application/json')
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response.content, get_timeout())
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,452 @@
+"""
+Moteurs de stockage du panier
+
+Le moteur est choisi par `settings.CART_ENGINE` (chemin pointé d'une classe) :
+
+- `DatabaseCart` : chaque ligne est un `CartItem` en base (comportement historique) ;
+- `SessionCart` : le panier des visiteurs anonymes reste dans le cache
+  (`CART_CACHE_ALIAS`) et n'est écrit en base (`CartItem`) qu'à la connexion
+  ou au passage de commande. Les utilisateurs connectés utilisent le
+  stockage en base.
+"""
+import decimal
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.http import Http404
+from django.utils.module_loading import import_string
+
+from .cache import _acall
+from .models import CartItem, Product
+
+
+class CartError(Exception):
+    """Erreur métier à renvoyer au client (message et code HTTP)"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class CartLine:
+    """Ligne de panier hors base, avec la même interface que `CartItem`"""
+
+    def __init__(self, id, product, quantity, price_snapshot):
+        self.id = id
+        self.product = product
+        self.product_id = product.id
+        self.quantity = quantity
+        self.price_snapshot = price_snapshot
+
+    @property
+    def total_price(self):
+        return self.price_snapshot * self.quantity
+
+
+def cart_summary(item_count, quantity, total):
+    """Résumé du panier : lignes, quantité totale et montant (comme `/api/cart/`)"""
+    return {'item_count': item_count, 'quantity': quantity, 'total': float(total)}
+
+
+def get_cart_engine():
+    return import_string(getattr(settings, 'CART_ENGINE', 'store.cart.DatabaseCart'))
+
+
+def get_cart(request):
+    return get_cart_engine()(request)
+
+
+async def aget_cart(request):
+    """
+    Variante de `get_cart` pour les vues asynchrones : l'utilisateur et la
+    session sont chargés par leurs API asynchrones (la session reste ensuite
+    en mémoire sur l'objet), puis seules les méthodes `a...` du panier sont
+    utilisables sans bloquer.
+    """
+    user = await request.auser()
+    await request.session.aitems()
+    return get_cart_engine()(request, user=user)
+
+
+class DatabaseCart:
+    """Panier stocké dans la table `CartItem`"""
+
+    def __init__(self, request, user=None):
+        self.request = request
+        self.session = request.session
+        if user is None:
+            user = getattr(request, 'user', None)
+        self.user = user if user is not None and user.is_authenticated else None
+
+    def ensure_session(self):
+        if not self.session.session_key:
+            self.session.create()
+        return self.session.session_key
+
+    def queryset(self):
+        """Lignes du panier en base (vide si ni utilisateur ni session)"""
+        if self.user:
+            return CartItem.objects.filter(user=self.user)
+        if self.session.session_key:
+            return CartItem.objects.filter(session_id=self.session.session_key)
+        return CartItem.objects.none()
+
+    def lines(self):
+        return list(self.queryset().select_related('product'))
+
+    async def alines(self):
+        return [item async for item in self.queryset().select_related('product')]
+
+    # Alias distincts des noms de champs (un agrégat ne peut pas en masquer un)
+    SUMMARY_AGGREGATES = {
+        'line_count': Count('id'),
+        'unit_count': Sum('quantity'),
+        'amount': Sum(ExpressionWrapper(
+            F('quantity') * F('price_snapshot'), output_field=DecimalField(max_digits=12, decimal_places=2)
+        )),
+    }
+
+    def summary(self):
+        """Résumé du panier en une requête agrégée, sans charger les lignes"""
+        totals = self.queryset().aggregate(**self.SUMMARY_AGGREGATES)
+        return cart_summary(totals['line_count'], totals['unit_count'] or 0, totals['amount'] or 0)
+
+    async def asummary(self):
+        totals = await self.queryset().aaggregate(**self.SUMMARY_AGGREGATES)
+        return cart_summary(totals['line_count'], totals['unit_count'] or 0, totals['amount'] or 0)
+
+    def add(self, product, quantity):
+        session_id = self.ensure_session()
+        cart_item, created = CartItem.objects.get_or_create(
+            session_id=session_id,
+            product=product,
+            defaults={
+                'user': self.user,
+                'quantity': quantity,
+                'price_snapshot': product.price
+            }
+        )
+        if not created:
+            cart_item.quantity += quantity
+            cart_item.save()
+        return cart_item
+
+    def get_line(self, item_id):
+        cart_item = CartItem.objects.select_related('product').filter(id=item_id).first()
+        if cart_item is None:
+            raise Http404
+        # Basic ownership check (par identifiant : pas de requête sur l'utilisateur)
+        if cart_item.session_id != self.session.session_key and (
+            self.user is None or cart_item.user_id != self.user.id
+        ):
+            raise CartError('Accès refusé', status=403)
+        return cart_item
+
+    def update(self, item_id, quantity):
+        cart_item = self.get_line(item_id)
+        if cart_item.product.stock < quantity:
+            raise CartError('Stock insuffisant')
+        cart_item.quantity = quantity
+        cart_item.save()
+        return cart_item
+
+    def remove(self, item_id):
+        self.get_line(item_id).delete()
+
+    def apply(self, operations):
+        """
+        Applique une liste d'opérations en une fois et retourne les lignes
+        résultantes. Chaque opération est un dict {'op': 'add'|'set'|'remove',
+        'product_id' ou 'item_id', 'quantity'}. Les stocks de tous les produits
+        concernés sont lus en une requête ; rien n'est écrit si l'une des
+        opérations est invalide.
+        """
+        with transaction.atomic():
+            lines = {line.product_id: line for line in self.lines()}
+            products_by_item = {line.id: line.product_id for line in lines.values()}
+
+            resolved = []
+            for operation in operations:
+                kind = operation.get('op')
+                if kind not in ('add', 'set', 'remove'):
+                    raise CartError('Opération invalide')
+                if operation.get('item_id') is not None:
+                    product_id = products_by_item.get(int(operation['item_id']))
+                    if product_id is None:
+                        raise CartError('Article introuvable', status=404)
+                elif operation.get('product_id') is not None:
+                    product_id = int(operation['product_id'])
+                else:
+                    raise CartError('Produit non spécifié')
+                quantity = int(operation.get('quantity', 1 if kind == 'add' else 0))
+                if quantity < 0 or (kind == 'add' and quantity == 0):
+                    raise CartError('Quantité invalide')
+                resolved.append((kind, product_id, quantity))
+
+            products = Product.objects.in_bulk({product_id for _, product_id, _ in resolved})
+
+            quantities = {product_id: line.quantity for product_id, line in lines.items()}
+            for kind, product_id, quantity in resolved:
+                if kind == 'add':
+                    quantities[product_id] = quantities.get(product_id, 0) + quantity
+                elif kind == 'set' and quantity > 0:
+                    quantities[product_id] = quantity
+                else:
+                    quantities.pop(product_id, None)
+
+            for product_id in {product_id for _, product_id, _ in resolved}:
+                if product_id not in quantities:
+                    continue
+                product = products.get(product_id)
+                if product is None or (product_id not in lines and not product.is_active):
+                    raise CartError('Produit introuvable', status=404)
+                if product.stock < quantities[product_id]:
+                    raise CartError(f'Stock insuffisant : {product.title}')
+
+            return self.store_quantities(lines, quantities, products)
+
+    def store_quantities(self, lines, quantities, products):
+        """Écrit l'état final {id produit: quantité} calculé par `apply`"""
+        session_id = self.ensure_session()
+        to_create, to_update = [], []
+        for product_id, quantity in quantities.items():
+            line = lines.get(product_id)
+            if line is None:
+                product = products[product_id]
+                to_create.append(CartItem(
+                    session_id=session_id,
+                    user=self.user,
+                    product=product,
+                    quantity=quantity,
+                    price_snapshot=product.price
+                ))
+            elif line.quantity != quantity:
+                line.quantity = quantity
+                to_update.append(line)
+        removed = [line.pk for product_id, line in lines.items() if product_id not in quantities]
+
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+
+        return [line for product_id, line in lines.items() if product_id in quantities] + to_create
+
+    def persist(self, user=None):
+        """Écrit le panier en base avant la commande (déjà fait pour ce moteur)"""
+
+    def mark_persisted(self):
+        """Oublie les lignes hors base une fois la persistance validée"""
+
+    @classmethod
+    def on_login(cls, request, user):
+        """Appelé après la connexion d'un utilisateur"""
+
+
+def get_cart_cache():
+    return caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+
+
+class SessionCart(DatabaseCart):
+    """
+    Panier des visiteurs anonymes conservé dans le cache, sous la forme
+    {id produit: {'quantity': n, 'price': '12.34'}} ; l'id de ligne exposé par
+    l'API est l'id du produit.
+
+    L'entrée de cache est désignée par un jeton aléatoire gardé dans la
+    session (il suit la session quand la connexion en change la clé) : seul le
+    premier ajout enregistre la session, les modifications suivantes
+    n'écrivent pas en base (`cached_db` écrirait chacune dans django_session).
+    """
+    token_key = 'cart_token'
+
+    def __init__(self, request, user=None):
+        super().__init__(request, user=user)
+        self._data = None
+
+    def cache_key(self):
+        token = self.session.get(self.token_key)
+        return f'cart:{token}' if token else None
+
+    @property
+    def data(self):
+        """Lignes du panier, lues dans le cache au premier accès"""
+        if self._data is None:
+            key = self.cache_key()
+            self._data = (get_cart_cache().get(key) if key else None) or {}
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    async def aload(self):
+        """Lecture asynchrone de `data`, à appeler avant les méthodes `a...`"""
+        if self._data is None:
+            key = self.cache_key()
+            self._data = (await _acall(get_cart_cache(), 'get', key) if key else None) or {}
+
+    def save(self):
+        key = self.cache_key()
+        if not self.data:
+            if key:
+                get_cart_cache().delete(key)
+            return
+        if key is None:
+            self.session[self.token_key] = uuid.uuid4().hex
+            key = self.cache_key()
+        get_cart_cache().set(key, self.data, settings.SESSION_COOKIE_AGE)
+
+    def lines(self):
+        if self.user:
+            return super().lines()
+        return self.session_lines(Product.objects.in_bulk([int(pk) for pk in self.data]))
+
+    async def alines(self):
+        if self.user:
+            return await super().alines()
+        await self.aload()
+        return self.session_lines(await Product.objects.ain_bulk([int(pk) for pk in self.data]))
+
+    def summary(self):
+        if self.user:
+            return super().summary()
+        existing = Product.objects.filter(pk__in=[int(pk) for pk in self.data]).values_list('pk', flat=True)
+        return self.session_summary(set(existing) if self.data else set())
+
+    async def asummary(self):
+        if self.user:
+            return await super().asummary()
+        await self.aload()
+        existing = Product.objects.filter(pk__in=[int(pk) for pk in self.data]).values_list('pk', flat=True)
+        return self.session_summary({pk async for pk in existing} if self.data else set())
+
+    def session_summary(self, existing):
+        # Produits supprimés depuis l'ajout ignorés, comme dans session_lines
+        lines = [line for pk, line in self.data.items() if int(pk) in existing]
+        return cart_summary(
+            len(lines),
+            sum(line['quantity'] for line in lines),
+            sum(decimal.Decimal(line['price']) * line['quantity'] for line in lines),
+        )
+
+    def session_lines(self, products):
+        return [
+            CartLine(products[int(pk)].id, products[int(pk)], line['quantity'], decimal.Decimal(line['price']))
+            for pk, line in self.data.items()
+            if int(pk) in products
+        ]
+
+    def add(self, product, quantity):
+        if self.user:
+            return super().add(product, quantity)
+        line = self.data.setdefault(str(product.id), {'quantity': 0, 'price': str(product.price)})
+        line['quantity'] += quantity
+        self.save()
+        return CartLine(product.id, product, line['quantity'], decimal.Decimal(line['price']))
+
+    def get_line(self, item_id):
+        if self.user:
+            return super().get_line(item_id)
+        line = self.data.get(str(item_id))
+        if line is None:
+            raise Http404
+        product = Product.objects.filter(id=item_id).first()
+        if product is None:
+            raise Http404
+        return CartLine(product.id, product, line['quantity'], decimal.Decimal(line['price']))
+
+    def update(self, item_id, quantity):
+        if self.user:
+            return super().update(item_id, quantity)
+        cart_line = self.get_line(item_id)
+        if cart_line.product.stock < quantity:
+            raise CartError('Stock insuffisant')
+        self.data[str(item_id)]['quantity'] = cart_line.quantity = quantity
+        self.save()
+        return cart_line
+
+    def remove(self, item_id):
+        if self.user:
+            return super().remove(item_id)
+        if self.data.pop(str(item_id), None) is None:
+            raise Http404
+        self.save()
+
+    def store_quantities(self, lines, quantities, products):
+        if self.user:
+            return super().store_quantities(lines, quantities, products)
+        data = {}
+        for product_id, quantity in quantities.items():
+            line = lines.get(product_id)
+            price = line.price_snapshot if line else products[product_id].price
+            data[str(product_id)] = {'quantity': quantity, 'price': str(price)}
+        self.data = data
+        self.save()
+        return [
+            CartLine(product_id, lines[product_id].product if product_id in lines else products[product_id],
+                     quantity, decimal.Decimal(data[str(product_id)]['price']))
+            for product_id, quantity in quantities.items()
+        ]
+
+    def persist(self, user=None):
+        """
+        Écrit les lignes du panier dans `CartItem`, en additionnant les
+        quantités aux lignes existantes de l'utilisateur. Le panier n'est vidé
+        que par `mark_persisted()`, une fois la transaction englobante validée.
+        """
+        if not self.data:
+            return
+        user = user or self.user
+        session_id = self.ensure_session()
+        if not user:
+            # Lignes anonymes écrites en base avant ce moteur : `lines()` ne
+            # les montre pas, la commande (`queryset()`) ne doit pas les prendre
+            CartItem.objects.filter(session_id=session_id, user__isnull=True).delete()
+
+        existing_items = CartItem.objects.filter(product_id__in=[int(pk) for pk in self.data])
+        if user:
+            existing_items = existing_items.filter(user=user)
+        else:
+            existing_items = existing_items.filter(session_id=session_id)
+        existing = {item.product_id: item for item in existing_items}
+        # Produits supprimés depuis l'ajout ignorés, comme dans session_lines
+        products = set(
+            Product.objects.filter(pk__in=[int(pk) for pk in self.data]).values_list('pk', flat=True)
+        )
+
+        to_create, to_update = [], []
+        for pk, line in self.data.items():
+            if int(pk) not in products:
+                continue
+            item = existing.get(int(pk))
+            if item:
+                item.quantity += line['quantity']
+                to_update.append(item)
+            else:
+                to_create.append(CartItem(
+                    session_id=session_id,
+                    user=user,
+                    product_id=int(pk),
+                    quantity=line['quantity'],
+                    price_snapshot=decimal.Decimal(line['price'])
+                ))
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+
+    def mark_persisted(self):
+        self.data = {}
+        self.save()
+
+    @classmethod
+    def on_login(cls, request, user):
+        cart = cls(request)
+        cart.persist(user=user)
+        cart.mark_persisted()
@@ -0,0 +1,139 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) pour les API du catalogue
+
+Les validateurs sont calculés à partir de `updated_at` par agrégats (MAX, COUNT),
+sans sérialiser les lignes, pour être utilisés avec le décorateur
+`django.views.decorators.http.condition`, ou de `acondition` pour les vues
+asynchrones (fonctions préfixées par `a`).
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import cache as catalog_cache
+from .models import Category, Product
+
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def catalog_state():
+    """
+    (dernière modification, nombre de lignes) des produits et des catégories.
+    Le COUNT détecte les suppressions, que MAX(updated_at) ne voit pas.
+    Mis en cache sous les versions du catalogue et du stock (la commande
+    change `updated_at`) : aucune requête tant qu'il n'y a pas d'écriture.
+    """
+    def build():
+        products = Product.objects.aggregate(last=Max('updated_at'), n=Count('id'))
+        categories = Category.objects.aggregate(last=Max('updated_at'), n=Count('id'))
+        return products['last'], products['n'], categories['last'], categories['n']
+
+    return catalog_cache.get_or_set('state', {}, build, stock=True)
+
+
+def catalog_etag(request, *args, **kwargs):
+    return _etag(*catalog_state())
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    product_last, _, category_last, _ = catalog_state()
+    dates = [date for date in (product_last, category_last) if date]
+    return max(dates) if dates else None
+
+
+def _product_state(request, slug):
+    # Mémorisé sur la requête : l'ETag et Last-Modified ne coûtent qu'une requête
+    if not hasattr(request, '_product_state'):
+        request._product_state = (
+            Product.objects.filter(slug=slug, is_active=True)
+            .values_list('id', 'updated_at', 'category__updated_at')
+            .first()
+        )
+    return request._product_state
+
+
+def product_etag(request, slug):
+    state = _product_state(request, slug)
+    return _etag(*state) if state else None
+
+
+def product_last_modified(request, slug):
+    state = _product_state(request, slug)
+    return max(state[1], state[2]) if state else None
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    `condition` pour les vues asynchrones, avec des fonctions de validation
+    asynchrones : celui de Django les appelle de façon synchrone, ce que
+    l'ORM refuse dans la boucle d'événements.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            last_modified = None
+            if last_modified_func and (dt := await last_modified_func(request, *args, **kwargs)):
+                if not timezone.is_aware(dt):
+                    dt = timezone.make_aware(dt, datetime.timezone.utc)
+                last_modified = int(dt.timestamp())
+            etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+async def acatalog_state():
+    async def build():
+        products = await Product.objects.aaggregate(last=Max('updated_at'), n=Count('id'))
+        categories = await Category.objects.aaggregate(last=Max('updated_at'), n=Count('id'))
+        return products['last'], products['n'], categories['last'], categories['n']
+
+    return await catalog_cache.aget_or_set('state', {}, build, stock=True)
+
+
+async def acatalog_etag(request, *args, **kwargs):
+    return _etag(*await acatalog_state())
+
+
+async def acatalog_last_modified(request, *args, **kwargs):
+    product_last, _, category_last, _ = await acatalog_state()
+    dates = [date for date in (product_last, category_last) if date]
+    return max(dates) if dates else None
+
+
+async def _aproduct_state(request, slug):
+    if not hasattr(request, '_product_state'):
+        request._product_state = await (
+            Product.objects.filter(slug=slug, is_active=True)
+            .values_list('id', 'updated_at', 'category__updated_at')
+            .afirst()
+        )
+    return request._product_state
+
+
+async def aproduct_etag(request, slug):
+    state = await _aproduct_state(request, slug)
+    return _etag(*state) if state else None
+
+
+async def aproduct_last_modified(request, slug):
+    state = await _aproduct_state(request, slug)
+    return max(state[1], state[2]) if state else None
+
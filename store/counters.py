@@ -0,0 +1,55 @@
+"""
+Compteurs dénormalisés du catalogue (Category.active_product_count)
+
+Le compteur n'est écrit que par des UPDATE relatifs (F()) : l'enregistrement
+d'une catégorie réécrit la colonne par elle-même (`protect_active_product_count`)
+au lieu de la valeur en mémoire de l'instance.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Category, Product
+
+
+def adjust_active_product_count(category_id, delta):
+    """Incrémente (ou décrémente) le compteur d'une catégorie, sans lecture préalable"""
+    if not category_id or not delta:
+        return
+    Category.objects.filter(pk=category_id).update(
+        active_product_count=F('active_product_count') + delta
+    )
+
+
+def protect_active_product_count(category):
+    """
+    Avant l'UPDATE d'une catégorie existante : la valeur en mémoire est périmée
+    dès qu'un produit a changé depuis la lecture de l'instance, et l'écrire
+    remettrait le compteur à zéro (puis ferait échouer la contrainte CHECK au
+    décrément suivant). La colonne est réécrite par elle-même.
+    """
+    category.active_product_count = F('active_product_count')
+
+
+def release_active_product_count(category):
+    """Après l'enregistrement : la valeur sera relue en base au prochain accès"""
+    if isinstance(category.__dict__.get('active_product_count'), F):
+        del category.active_product_count
+
+
+def active_product_count_subquery():
+    """Nombre réel de produits actifs de la catégorie courante (OuterRef)"""
+    return Coalesce(Subquery(
+        Product.objects.filter(category=OuterRef('pk'), is_active=True)
+        .order_by().values('category').annotate(n=Count('pk')).values('n')
+    ), 0)
+
+
+def reconcile_active_product_counts():
+    """
+    Corrige les compteurs qui ont dérivé, en une seule requête UPDATE agrégée.
+    Retourne le nombre de catégories corrigées.
+    """
+    actual = active_product_count_subquery()
+    return Category.objects.exclude(active_product_count=actual).update(
+        active_product_count=actual
+    )
@@ -0,0 +1,208 @@
+"""
+Documents JSON précalculés des produits (listes et détail de l'API)
+
+Chaque produit est encodé une fois en fragment JSON, gardé dans le cache
+partagé (PRODUCT_DOCUMENT_CACHE_ALIAS) sous une clé qui porte `updated_at` du
+produit et de sa catégorie : toute écriture (save(), décrément de stock de la
+commande, import) change la clé, et l'ancien fragment n'est plus lu puis
+expire. Les fragments survivent aux changements de version du catalogue.
+
+Les signaux de `store.signals` écrivent les fragments après l'enregistrement
+d'un produit ou d'une catégorie (`store_documents`) ; les écritures sans
+signal (update()) sont rattrapées à la lecture. Une page de liste lit tous
+ses fragments en un seul `get_many`.
+
+Les réponses sont assemblées en juxtaposant les fragments (`json_object`,
+`json_array`), avec les séparateurs de `json.dumps` : le corps est identique
+à celui de `JsonResponse` sur les mêmes dictionnaires.
+
+Avec `fields=` (`LIST_FIELDS`), seules les colonnes des champs demandés sont
+lues et la description est tronquée par la base : ces listes partielles ne
+passent pas par les fragments.
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.functions import Substr
+
+from .cache import _acall
+
+LIST = 'list'
+DETAIL = 'detail'
+
+
+def get_cache():
+    return caches[getattr(settings, 'PRODUCT_DOCUMENT_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'PRODUCT_DOCUMENT_TIMEOUT', 86400)
+
+
+# Longueur de la description dans les listes
+DESCRIPTION_LENGTH = 200
+
+
+def truncate_description(text):
+    return text[:DESCRIPTION_LENGTH] + '...' if len(text) > DESCRIPTION_LENGTH else text
+
+
+def product_list_data(product):
+    """
+    Représentation d'un produit dans les listes de l'API
+    """
+    return {
+        'id': product.id,
+        'name': product.title,  # Corrected from 'title' to 'name'
+        'slug': product.slug,
+        'description': truncate_description(product.description),
+        'price': float(product.price),
+        'stock': product.stock,
+        'images': [{'image': product.image_url}] if product.image_url else [], # Corrected to 'images' array
+        'category': {
+            'name': product.category.name,
+            'slug': product.category.slug
+        },
+        'is_in_stock': product.is_in_stock,
+        'average_rating': 0, # Placeholder
+        'discount_percentage': 0 # Placeholder
+    }
+
+
+def product_detail_data(product):
+    """
+    Représentation d'un produit dans l'API de détail
+    """
+    return {
+        'id': product.id,
+        'title': product.title,
+        'slug': product.slug,
+        'description': product.description,
+        'price': float(product.price),
+        'stock': product.stock,
+        'image_url': product.image_url,
+        'category': {
+            'name': product.category.name,
+            'slug': product.category.slug
+        },
+        'is_in_stock': product.is_in_stock
+    }
+
+
+BUILDERS = {LIST: product_list_data, DETAIL: product_detail_data}
+
+
+def document_key(kind, product):
+    """Clé du fragment : change avec le produit et avec sa catégorie"""
+    return (
+        f'product-document:{kind}:{product.pk}:'
+        f'{product.updated_at.timestamp()}:{product.category.updated_at.timestamp()}'
+    )
+
+
+def encode(kind, product):
+    return json.dumps(BUILDERS[kind](product))
+
+
+def _missing_documents(kind, products, keys, found):
+    return {key: encode(kind, product) for key, product in zip(keys, products) if key not in found}
+
+
+def get_documents(kind, products):
+    """
+    Fragments JSON des produits (chargés avec leur catégorie), dans l'ordre ;
+    les fragments absents du cache sont encodés et écrits
+    """
+    products = list(products)
+    keys = [document_key(kind, product) for product in products]
+    cache = get_cache()
+    found = cache.get_many(keys)
+    missing = _missing_documents(kind, products, keys, found)
+    if missing:
+        cache.set_many(missing, get_timeout())
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+async def aget_documents(kind, products):
+    """Variante de `get_documents` pour les vues asynchrones"""
+    products = list(products)
+    keys = [document_key(kind, product) for product in products]
+    cache = get_cache()
+    found = await _acall(cache, 'get_many', keys)
+    missing = _missing_documents(kind, products, keys, found)
+    if missing:
+        await _acall(cache, 'set_many', missing, get_timeout())
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def store_documents(products):
+    """Encode et écrit les fragments (liste et détail) de `products`"""
+    get_cache().set_many({
+        document_key(kind, product): encode(kind, product)
+        for product in products for kind in BUILDERS
+    }, get_timeout())
+
+
+# Champs de la représentation de liste sélectionnables avec `fields=`, dans
+# l'ordre de product_list_data : (colonnes à lire, valeur)
+LIST_FIELDS = {
+    'id': ((), lambda product: product.id),
+    'name': (('title',), lambda product: product.title),
+    'slug': (('slug',), lambda product: product.slug),
+    'description': ((), lambda product: truncate_description(product.description_excerpt)),
+    'price': (('price',), lambda product: float(product.price)),
+    'stock': (('stock',), lambda product: product.stock),
+    'images': (('image_url',), lambda product: [{'image': product.image_url}] if product.image_url else []),
+    'category': (
+        ('category__name', 'category__slug'),
+        lambda product: {'name': product.category.name, 'slug': product.category.slug},
+    ),
+    'is_in_stock': (('stock',), lambda product: product.is_in_stock),
+    'average_rating': ((), lambda product: 0),
+    'discount_percentage': ((), lambda product: 0),
+}
+
+
+def parse_fields(value):
+    """
+    Champs demandés par `fields=a,b,c`, dans l'ordre de LIST_FIELDS ; lève
+    ValueError avec les noms inconnus
+    """
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(LIST_FIELDS)
+    if unknown:
+        raise ValueError(', '.join(sorted(unknown)))
+    return [name for name in LIST_FIELDS if name in requested]
+
+
+def sparse_queryset(queryset, fields):
+    """
+    Restreint la requête aux colonnes des champs `fields` ; `created_at` reste
+    lu pour la pagination par curseur
+    """
+    columns = {'created_at'}
+    for name in fields:
+        columns.update(LIST_FIELDS[name][0])
+    if 'category' not in fields:
+        queryset = queryset.select_related(None)
+    if 'description' in fields:
+        # Un caractère de plus pour savoir s'il faut ajouter '...'
+        queryset = queryset.annotate(description_excerpt=Substr('description', 1, DESCRIPTION_LENGTH + 1))
+    return queryset.only(*columns)
+
+
+def product_sparse_data(product, fields):
+    """Représentation de liste réduite aux champs `fields` (voir sparse_queryset)"""
+    return {name: LIST_FIELDS[name][1](product) for name in fields}
+
+
+def json_array(fragments):
+    return '[' + ', '.join(fragments) + ']'
+
+
+def json_object(items):
+    """Objet JSON à partir de paires (clé, fragment déjà encodé)"""
+    return '{' + ', '.join(f'{json.dumps(key)}: {fragment}' for key, fragment in items) + '}'
@@ -0,0 +1,96 @@
+"""
+Déclinaisons responsives des images (Pillow)
+
+Pour chaque image source, on génère des miniatures à largeurs fixes en WebP,
+en AVIF si Pillow le supporte, et en JPEG (format de repli). Le résultat est
+décrit par un dictionnaire {format: [[largeur, nom], ...], 'source': nom}
+stocké dans `Category.image_variants`.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (160, 320, 640, 1024)
+
+# Formats par ordre de préférence pour <picture> ; le dernier sert de <img>
+FORMATS = [fmt for fmt in ('avif', 'webp', 'jpeg') if fmt == 'jpeg' or features.check(fmt)]
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def derivative_widths(source_width, widths=DERIVATIVE_WIDTHS):
+    """Largeurs à produire : jamais d'agrandissement"""
+    selected = [width for width in widths if width < source_width]
+    return selected or [source_width]
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # Pas de transparence en JPEG : aplatir sur fond blanc
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def generate_derivatives(source, prefix, storage=default_storage, widths=DERIVATIVE_WIDTHS):
+    """
+    Génère les déclinaisons de `source` (fichier ou chemin) sous `prefix`
+    dans `storage`, et retourne le dictionnaire des variantes.
+    """
+    variants = {}
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        for width in derivative_widths(original.width, widths):
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in FORMATS:
+                name = f'{prefix}-{width}w.{EXTENSIONS[fmt]}'
+                if storage.exists(name):
+                    storage.delete(name)
+                storage.save(name, ContentFile(_encode(resized, fmt)))
+                variants.setdefault(fmt, []).append([width, name])
+    return variants
+
+
+def delete_derivatives(variants, storage=default_storage):
+    for fmt in FORMATS:
+        for _, name in variants.get(fmt, []):
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def build_category_variants(category):
+    """
+    (Re)génère les déclinaisons de `category.image`. Retourne le dictionnaire
+    de variantes, vide si la catégorie n'a pas d'image ou si elle est illisible.
+    """
+    delete_derivatives(category.image_variants or {})
+    if not category.image:
+        return {}
+    base, _ = os.path.splitext(category.image.name)
+    try:
+        with category.image.open('rb') as source:
+            variants = generate_derivatives(source, f'derivatives/{base}')
+    except (OSError, ValueError):
+        logger.exception("Impossible de générer les déclinaisons de %s", category.image.name)
+        return {}
+    variants['source'] = category.image.name
+    return variants
@@ -0,0 +1,143 @@
+"""
+Import en masse du catalogue (CSV ou JSONL)
+
+Chaîne de traitement de `manage.py import_catalog` :
+
+1. lecture en flux du fichier, découpé en lots de lignes (`read_rows`, `batched`) ;
+2. analyse et validation de chaque lot (`validate_batch`) : fonctions pures,
+   sans accès à la base, exécutables dans un pool de processus ;
+3. écriture par un seul processus (voir la commande) : upsert des produits par
+   slug avec `bulk_create(update_conflicts=True)`, une transaction par lot.
+
+Ce module n'importe pas l'ORM : les processus du pool peuvent le charger sans
+initialiser Django.
+
+Colonnes : slug, title, price et category (slug de la catégorie) obligatoires ;
+description, stock, image_url, is_active et category_name facultatives. Une
+colonne facultative absente remet le champ à sa valeur par défaut.
+"""
+import csv
+import decimal
+import json
+import re
+from itertools import islice
+
+FORMATS = ('csv', 'jsonl')
+
+SLUG_RE = re.compile(r'^[-a-zA-Z0-9_]+$')
+TRUE_VALUES = {'1', 'true', 'yes', 'oui', 'vrai'}
+FALSE_VALUES = {'0', 'false', 'no', 'non', 'faux'}
+
+MAX_PRICE = decimal.Decimal('99999999.99')  # max_digits=10, decimal_places=2
+
+
+def detect_format(path):
+    extension = path.rsplit('.', 1)[-1].lower()
+    return 'jsonl' if extension in ('jsonl', 'ndjson') else 'csv'
+
+
+def read_rows(path, fmt):
+    """
+    Lit le fichier ligne à ligne et produit des couples (numéro de ligne, brut) :
+    un dictionnaire pour le CSV, le texte JSON pour le JSONL (décodé au moment
+    de la validation, donc dans le pool de processus le cas échéant).
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, line
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _text(row, field, max_length=None, required=False):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"champ « {field} » manquant")
+    if max_length and len(value) > max_length:
+        raise ValueError(f"« {field} » dépasse {max_length} caractères")
+    return value
+
+
+def _slug(row, field, max_length):
+    value = _text(row, field, max_length, required=True)
+    if not SLUG_RE.match(value):
+        raise ValueError(f"« {field} » n'est pas un slug valide : {value!r}")
+    return value
+
+
+def validate_row(row):
+    """Retourne le produit nettoyé ou lève ValueError avec un message lisible"""
+    if not isinstance(row, dict):
+        raise ValueError("la ligne doit être un objet")
+
+    try:
+        price = decimal.Decimal(str(row.get('price', '')).strip().replace(',', '.'))
+    except decimal.InvalidOperation:
+        raise ValueError(f"prix invalide : {row.get('price')!r}")
+    if not price.is_finite() or not decimal.Decimal('0.01') <= price <= MAX_PRICE:
+        raise ValueError(f"prix hors limites : {price}")
+
+    stock = row.get('stock')
+    try:
+        stock = int(stock) if stock not in (None, '') else 0
+    except (TypeError, ValueError):
+        raise ValueError(f"stock invalide : {stock!r}")
+    if stock < 0:
+        raise ValueError(f"stock négatif : {stock}")
+
+    is_active = row.get('is_active')
+    if isinstance(is_active, str):
+        if is_active.strip().lower() in TRUE_VALUES | {''}:
+            is_active = True
+        elif is_active.strip().lower() in FALSE_VALUES:
+            is_active = False
+        else:
+            raise ValueError(f"is_active invalide : {is_active!r}")
+    elif is_active is None:
+        is_active = True
+
+    return {
+        'slug': _slug(row, 'slug', 200),
+        'title': _text(row, 'title', 200, required=True),
+        'description': _text(row, 'description'),
+        'price': price.quantize(decimal.Decimal('0.01')),
+        'stock': stock,
+        'category': _slug(row, 'category', 100),
+        'category_name': _text(row, 'category_name', 100),
+        'image_url': _text(row, 'image_url', 200),
+        'is_active': bool(is_active),
+    }
+
+
+def validate_batch(batch):
+    """
+    Valide un lot de (numéro de ligne, brut). Retourne (produits valides,
+    erreurs [(numéro de ligne, message)]). Si un slug apparaît plusieurs fois
+    dans le lot, la dernière occurrence l'emporte.
+    """
+    products, errors = {}, []
+    for line_number, raw in batch:
+        try:
+            if isinstance(raw, str):
+                try:
+                    raw = json.loads(raw)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"JSON invalide : {e.msg}")
+            product = validate_row(raw)
+        except ValueError as e:
+            errors.append((line_number, str(e)))
+            continue
+        products.pop(product['slug'], None)
+        products[product['slug']] = product
+    return list(products.values()), errors
@@ -0,0 +1,113 @@
+"""
+Mesures par requête : SQL, gabarits, vue et enregistrement de la session
+
+`ServerTimingMiddleware` (voir store.middleware) ouvre un `RequestMetrics`
+pour chaque requête et le rend courant via une ContextVar ; les autres
+composants y ajoutent leurs durées avec `timed(...)` :
+
+- le SQL via un `execute_wrapper` posé sur chaque connexion à son ouverture
+  (nombre, durée, requêtes répétées) : il lit la mesure courante dans la
+  ContextVar, ce qui marche aussi pour les requêtes de l'ORM asynchrone,
+  exécutées dans un autre thread avec une copie du contexte ;
+- le rendu des gabarits via le moteur `TimedDjangoTemplates` ;
+- l'enregistrement de la session via LazySessionMiddleware.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import QUERY_LATENCY
+
+current_metrics = ContextVar('store_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Durées (secondes) et requêtes SQL d'une requête HTTP"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = Counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self._depth = Counter()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """À passer à `connection.execute_wrapper`"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.sql_count += 1
+            self.sql_time += duration
+            QUERY_LATENCY.observe(duration)
+            # Texte paramétré : les requêtes N+1 ne diffèrent que par leurs paramètres
+            self.statements[sql] += 1
+
+    @contextmanager
+    def timed(self, name):
+        # Seul le niveau le plus externe compte (gabarit rendu depuis un gabarit, ...)
+        self._depth[name] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] -= 1
+            if not self._depth[name]:
+                self.durations[name] += time.perf_counter() - start
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def duplicated_statements(self, limit=5):
+        """Requêtes SQL exécutées plusieurs fois, les plus répétées d'abord"""
+        return [(sql, count) for sql, count in self.statements.most_common(limit) if count > 1]
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Enregistre la requête SQL dans la mesure en cours, s'il y en a une"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.execute_wrapper(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    # La liste appartient à l'objet connexion de Django, conservé d'une
+    # reconnexion à l'autre : une seule installation
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+@contextmanager
+def timed(name):
+    """Ajoute la durée du bloc à la mesure `name` de la requête en cours, s'il y en a une"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.timed(name):
+        yield
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Moteur Django dont le rendu des gabarits est mesuré (mesure `template`)"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,190 @@
+"""
+Test de charge HTTP des routes de store (voir `manage.py load_test`)
+
+Chaque utilisateur virtuel garde ses cookies (session, panier, connexion) et
+enchaîne des parcours réalistes : navigation, recherche, panier, compte et
+commande. Les temps de réponse sont regroupés par nom de route
+(`store:api_products`, ...) pour calculer p50/p95/p99 et le débit.
+Seule la bibliothèque standard est utilisée : le serveur testé (runserver,
+uvicorn, gunicorn...) n'a pas à partager le processus.
+"""
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from urllib.parse import quote
+from collections import defaultdict
+
+# Comptes créés par `manage.py generate_load_data`
+USER_PREFIX = 'load-user-'
+USER_PASSWORD = 'charge-2024'
+
+
+def percentile(sorted_values, p):
+    """Percentile au rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Mesures (durée, statut) par route, partagées entre les threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, elapsed, status):
+        with self.lock:
+            self.samples[endpoint].append(elapsed)
+            self.statuses[endpoint][str(status)] += 1
+
+    def summary(self, wall_time):
+        def stats(durations, statuses):
+            durations = sorted(durations)
+            errors = sum(count for status, count in statuses.items() if status == 'error' or int(status) >= 500)
+            return {
+                'requests': len(durations),
+                'errors': errors,
+                'throughput_rps': round(len(durations) / wall_time, 2),
+                'mean_ms': round(sum(durations) / len(durations) * 1000, 2),
+                'p50_ms': round(percentile(durations, 50) * 1000, 2),
+                'p95_ms': round(percentile(durations, 95) * 1000, 2),
+                'p99_ms': round(percentile(durations, 99) * 1000, 2),
+                'max_ms': round(durations[-1] * 1000, 2),
+                'statuses': dict(sorted(statuses.items())),
+            }
+
+        endpoints = {
+            endpoint: stats(self.samples[endpoint], self.statuses[endpoint])
+            for endpoint in sorted(self.samples)
+        }
+        all_statuses = defaultdict(int)
+        for statuses in self.statuses.values():
+            for status, count in statuses.items():
+                all_statuses[status] += count
+        all_durations = [d for durations in self.samples.values() for d in durations]
+        total = stats(all_durations, all_statuses) if all_durations else {'requests': 0}
+        return {'total': total, 'endpoints': endpoints}
+
+
+class VirtualUser:
+    """Un visiteur avec ses propres cookies"""
+
+    def __init__(self, base_url, recorder, fixtures, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.fixtures = fixtures
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, endpoint, path, method='GET', data=None):
+        """Envoie la requête, enregistre la mesure et retourne le JSON décodé (ou None)"""
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if body is not None:
+            request.add_header('Content-Type', 'application/json')
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                content, status = response.read(), response.status
+        except urllib.error.HTTPError as e:
+            content, status = e.read(), e.code
+        except OSError:
+            self.recorder.record(endpoint, time.perf_counter() - start, 'error')
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, status)
+        if not endpoint.startswith('store:api_'):
+            return None
+        try:
+            return json.loads(content)
+        except ValueError:
+            return None
+
+    def page(self, endpoint, path):
+        """Page HTML, suivie de l'appel /api/bootstrap/ que main.js fait sur chaque page"""
+        self.request(endpoint, path)
+        self.request('store:api_bootstrap', '/api/bootstrap/')
+
+    def product_list(self, query):
+        """Liste des produits et facettes, demandées ensemble par main.js à chaque filtre"""
+        self.request('store:api_products', f'/api/products/?{query}')
+        self.request('store:api_product_facets', f'/api/facets/?{query}')
+
+    # Parcours ---------------------------------------------------------------
+
+    def browse(self):
+        products, categories = self.fixtures['products'], self.fixtures['categories']
+        _, slug = random.choice(products)
+        category = random.choice(categories)
+        self.page('store:index', '/')
+        self.page('store:products', '/products/')
+        self.product_list(f'page={random.randint(1, 5)}')
+        self.product_list(f'category={category}')
+        self.product_list(f"q={quote(random.choice(self.fixtures['words']))}")
+        self.page('store:categories', '/categories/')
+        self.request('store:api_categories', '/api/categories/')
+        self.page('store:category_detail', f'/category/{category}/')
+        self.page('store:product_detail', f'/product/{slug}/')
+        self.request('store:api_product_detail', f'/api/products/{slug}/')
+        self.request('store:api_auth_status', '/api/auth/status/')
+        if random.random() < 0.2:
+            self.page('store:about', '/about/')
+            self.page('store:contact', '/contact/')
+
+    def shop(self):
+        products = self.fixtures['products']
+        first, second = random.sample(products, 2)
+        added = self.request('store:api_cart_add', '/api/cart/add/', 'POST',
+                             {'product_id': first[0], 'quantity': 1})
+        self.page('store:cart', '/cart/')
+        self.request('store:api_cart', '/api/cart/')
+        if added and added.get('cart_item'):
+            item_id = added['cart_item']['id']
+            self.request('store:api_cart_update', f'/api/cart/update/{item_id}/', 'PATCH', {'quantity': 2})
+            self.request('store:api_cart_batch', '/api/cart/batch/', 'POST', {'operations': [
+                {'op': 'add', 'product_id': second[0]},
+                {'op': 'set', 'product_id': first[0], 'quantity': 1},
+            ]})
+            if random.random() < 0.5:
+                self.request('store:api_cart_remove_item', f'/api/cart/remove/{item_id}/', 'DELETE')
+
+    def account(self):
+        if not self.fixtures['users']:
+            return
+        username = random.choice(self.fixtures['users'])
+        self.request('store:api_auth_login', '/api/auth/login/', 'POST',
+                     {'username': username, 'password': USER_PASSWORD})
+        self.request('store:api_auth_status', '/api/auth/status/')
+        self.page('store:mon_compte', '/mon-compte/')
+        self.page('store:mes_commandes', '/mes-commandes/')
+        self.request('store:api_user_orders', '/api/user/orders/')
+        self.shop()
+        self.page('store:checkout', '/checkout/')
+        self.request('store:api_checkout', '/api/checkout/', 'POST', {
+            'email': f'{username}@example.com', 'first_name': 'Charge', 'last_name': 'Test',
+            'address': '1 rue du Test, Abidjan',
+        })
+        self.request('store:api_auth_logout', '/api/auth/logout/', 'POST', {})
+
+    def register(self):
+        username = f'load-signup-{uuid.uuid4().hex[:12]}'
+        self.request('store:api_auth_register', '/api/auth/register/', 'POST', {
+            'username': username, 'email': f'{username}@example.com', 'password': USER_PASSWORD,
+        })
+        self.request('store:api_auth_logout', '/api/auth/logout/', 'POST', {})
+
+    def run_once(self):
+        """Un parcours tiré au sort, pondéré comme un trafic de boutique"""
+        scenario = random.choices(
+            [self.browse, self.shop, self.account, self.register], weights=[60, 25, 12, 3]
+        )[0]
+        scenario()
@@ -0,0 +1,88 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from store.models import Product
+
+BROWSING_URLS = [
+    '/',
+    '/api/products/',
+    '/api/categories/',
+    '/api/auth/status/',
+    '/api/cart/',
+    '/products/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compte les écritures dans django_session par requête, avec l'ancien mode "
+        "(SESSION_SAVE_EVERY_REQUEST, sessions en base) et le mode paresseux actuel"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300,
+                            help="Nombre de pages vues par visiteur (défaut : 300)")
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True, stock__gt=0).first()
+        if product is None:
+            self.stderr.write("Aucun produit en stock : chargez d'abord des données.")
+            return
+
+        # Ancienne configuration : sessions en base, enregistrées à chaque requête
+        legacy = override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            SESSION_SAVE_EVERY_REQUEST=True,
+            MIDDLEWARE=[
+                'django.contrib.sessions.middleware.SessionMiddleware'
+                if middleware == 'store.middleware.LazySessionMiddleware' else middleware
+                for middleware in settings.MIDDLEWARE
+            ],
+        )
+
+        setup_test_environment()
+        try:
+            results = {}
+            with legacy:
+                results['avant'] = self.run_scenario(product, options['requests'])
+            results['après'] = self.run_scenario(product, options['requests'])
+        finally:
+            teardown_test_environment()
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>6} : {result['session_writes']:>5} écritures de session / "
+                f"{result['requests']} requêtes = {result['writes_per_request']:.3f} par requête"
+            )
+        self.stdout.write(json.dumps(results, ensure_ascii=False))
+
+    def run_scenario(self, product, page_views):
+        """
+        Un visiteur ajoute un produit au panier (session créée) puis navigue ;
+        tout est annulé à la fin pour ne pas polluer la base.
+        """
+        client = Client()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx:
+                client.post('/api/cart/add/', json.dumps({'product_id': product.id, 'quantity': 1}),
+                            content_type='application/json')
+                for i in range(page_views):
+                    client.get(BROWSING_URLS[i % len(BROWSING_URLS)])
+            transaction.set_rollback(True)
+
+        writes = sum(
+            1 for query in ctx.captured_queries
+            if 'django_session' in query['sql']
+            and query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))
+        )
+        requests = page_views + 1
+        return {
+            'requests': requests,
+            'session_writes': writes,
+            'writes_per_request': writes / requests,
+        }
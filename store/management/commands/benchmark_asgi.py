@@ -0,0 +1,157 @@
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from store.loadtest import percentile
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit des API de lecture servies par le gestionnaire ASGI "
+        "(vues asynchrones, une boucle d'événements) et par le gestionnaire WSGI "
+        "(un thread par requête en cours), à concurrence égale, dans le processus "
+        "courant : sans serveur HTTP, seul le coût de Django est mesuré"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64, help="Requêtes simultanées (défaut : 64)")
+        parser.add_argument('--requests', type=int, default=2000, help="Requêtes par mode (défaut : 2000)")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Chemin à interroger (répétable ; défaut : les API de lecture asynchrones)")
+        parser.add_argument('--mode', choices=('asgi', 'wsgi', 'both'), default='both')
+        parser.add_argument('--output', help="Fichier JSON des résultats")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency et --requests doivent être positifs")
+        paths = options['paths'] or self.default_paths()
+        requests = [paths[i % len(paths)] for i in range(options['requests'])]
+
+        results = {}
+        modes = ('wsgi', 'asgi') if options['mode'] == 'both' else (options['mode'],)
+        for mode in modes:
+            run = self.run_wsgi if mode == 'wsgi' else self.run_asgi
+            # Premier passage pour chauffer caches et connexions, non compté
+            run(paths, options['concurrency'])
+            wall_time, durations, errors = run(requests, options['concurrency'])
+            durations.sort()
+            results[mode] = {
+                'requests': len(durations),
+                'errors': errors,
+                'throughput_rps': round(len(durations) / wall_time, 1),
+                'p50_ms': round(percentile(durations, 50) * 1000, 2),
+                'p95_ms': round(percentile(durations, 95) * 1000, 2),
+                'p99_ms': round(percentile(durations, 99) * 1000, 2),
+            }
+
+        self.stdout.write(f"{'mode':<6}{'req':>7}{'err':>6}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"{mode:<6}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>10}"
+                f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+            )
+        if len(results) == 2:
+            ratio = results['asgi']['throughput_rps'] / results['wsgi']['throughput_rps']
+            self.stdout.write(self.style.SUCCESS(
+                f"ASGI / WSGI : x{ratio:.2f} à {options['concurrency']} requêtes simultanées"
+            ))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'concurrency': options['concurrency'], 'paths': paths, **results},
+                          f, indent=2, sort_keys=True)
+
+    def default_paths(self):
+        product = Product.objects.filter(is_active=True).only('slug').first()
+        if product is None:
+            raise CommandError("Catalogue vide : lancez d'abord `manage.py generate_load_data`.")
+        return [
+            '/api/products/',
+            '/api/products/?page=2',
+            f'/api/products/{product.slug}/',
+            '/api/categories/',
+            '/api/cart/',
+            '/api/auth/status/',
+        ]
+
+    def run_wsgi(self, paths, concurrency):
+        handler = WSGIHandler()
+
+        def call(path):
+            url = urlsplit(path)
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'REMOTE_ADDR': '127.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            status = []
+            start = time.perf_counter()
+            result = handler(environ, lambda s, headers, exc_info=None: status.append(int(s[:3])))
+            try:
+                b''.join(result)
+            finally:
+                result.close()
+            return time.perf_counter() - start, status[0]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(call, paths))
+        return self.summarize(time.perf_counter() - start, outcomes)
+
+    def run_asgi(self, paths, concurrency):
+        handler = ASGIHandler()
+
+        async def call(path):
+            url = urlsplit(path)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(),
+                'query_string': url.query.encode(), 'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            }
+            body_sent = False
+            status = []
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Le client ne se déconnecte pas : Django annule cette attente à la fin
+                await asyncio.Future()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            start = time.perf_counter()
+            await handler(scope, receive, send)
+            return time.perf_counter() - start, status[0]
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited(path):
+                async with semaphore:
+                    return await call(path)
+
+            return await asyncio.gather(*(limited(path) for path in paths))
+
+        start = time.perf_counter()
+        outcomes = asyncio.run(run_all())
+        return self.summarize(time.perf_counter() - start, outcomes)
+
+    def summarize(self, wall_time, outcomes):
+        durations = [duration for duration, _ in outcomes]
+        errors = sum(1 for _, status in outcomes if status >= 500)
+        return wall_time, durations, errors
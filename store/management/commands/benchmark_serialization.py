@@ -0,0 +1,67 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse, JsonResponse
+
+from store import documents
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Temps CPU de sérialisation d'une page de /api/products/ : dictionnaires "
+        "encodés à chaque requête (JsonResponse) contre fragments précalculés "
+        "lus dans le cache et juxtaposés (store.documents), hors accès à la base"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[12, 48, 200], help="Tailles de page (défaut : 12 48 200)")
+        parser.add_argument('--repeat', type=int, default=200, help="Répétitions par mesure (défaut : 200)")
+        parser.add_argument('--output', help="Fichier JSON des résultats")
+
+    def handle(self, *args, **options):
+        products = list(
+            Product.objects.filter(is_active=True).select_related('category')[:max(options['sizes'])]
+        )
+        if len(products) < max(options['sizes']):
+            raise CommandError(
+                f"{len(products)} produits actifs : lancez d'abord `manage.py generate_load_data`."
+            )
+        pagination = {'current_page': 1, 'total_pages': 1, 'has_next': False, 'has_previous': False}
+
+        def encode_dicts(page):
+            return JsonResponse({
+                'count': len(page),
+                'results': [documents.product_list_data(product) for product in page],
+                'pagination': pagination,
+            }).content
+
+        def splice_fragments(page):
+            return HttpResponse(documents.json_object([
+                ('count', json.dumps(len(page))),
+                ('results', documents.json_array(documents.get_documents(documents.LIST, page))),
+                ('pagination', json.dumps(pagination)),
+            ]), content_type='application/json').content
+
+        results = {}
+        self.stdout.write(f"{'produits':>9}{'dicts (µs)':>14}{'fragments (µs)':>17}{'gain':>8}")
+        for size in options['sizes']:
+            page = products[:size]
+            if encode_dicts(page) != splice_fragments(page):  # remplit aussi le cache
+                raise CommandError("Les deux sérialisations diffèrent")
+            dicts = self.cpu_time(encode_dicts, page, options['repeat'])
+            fragments = self.cpu_time(splice_fragments, page, options['repeat'])
+            results[size] = {'dicts_us': round(dicts, 1), 'fragments_us': round(fragments, 1)}
+            self.stdout.write(f"{size:>9}{dicts:>14.1f}{fragments:>17.1f}{dicts / fragments:>7.1f}x")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    def cpu_time(self, function, page, repeat):
+        """Temps CPU moyen d'un appel, en microsecondes"""
+        start = time.process_time()
+        for _ in range(repeat):
+            function(page)
+        return (time.process_time() - start) / repeat * 1e6
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.cache import bump_catalog_version
+from store.images import build_category_variants
+from store.models import Category
+
+
+class Command(BaseCommand):
+    help = "Génère les déclinaisons responsives des images de catégories"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Régénère aussi les images déjà déclinées")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        categories = []
+        for category in Category.objects.exclude(image=''):
+            if not options['force'] and category.image_variants.get('source') == category.image.name:
+                continue
+            category.image_variants = build_category_variants(category)
+            categories.append(category)
+        if categories:
+            Category.objects.bulk_update(categories, ['image_variants'])
+            bump_catalog_version()
+        self.stdout.write(f"{len(categories)} image(s) de catégorie traitée(s)")
+        self.stdout.write(self.style.SUCCESS(f"Terminé en {time.perf_counter() - start:.1f}s"))
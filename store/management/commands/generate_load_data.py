@@ -0,0 +1,168 @@
+import decimal
+import random
+import time
+import uuid
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store import search
+from store.cache import bump_catalog_version
+from store.counters import reconcile_active_product_counts
+from store.loadtest import USER_PASSWORD, USER_PREFIX
+from store.models import CartItem, Category, Order, OrderItem, Product
+
+ADJECTIVES = ['Premium', 'Compact', 'Sans fil', 'Pliable', 'Étanche', 'Connecté', 'Artisanal',
+              'Ergonomique', 'Portable', 'Solaire', 'Classique', 'Professionnel']
+NOUNS = ['Smartphone', 'Écouteurs', 'Tablette', 'Lampe', 'Coussin', 'Sac', 'Montre', 'Sneakers',
+         'Cafetière', 'Chargeur', 'Enceinte', 'Robe', 'Veste', 'Tapis', 'Casque', 'Ventilateur']
+BRANDS = ['Xiaomi', 'Huawei', 'Anker', 'Lenovo', 'Oppo', 'Haier', 'Midea', 'Tecno', 'Infinix', 'TCL']
+ORDER_STATUSES = (['delivered'] * 50 + ['shipped'] * 15 + ['processing'] * 10
+                  + ['pending'] * 20 + ['cancelled'] * 5)
+
+BATCH_SIZE = 5000
+
+
+def zipf_weights(count, exponent=1.1):
+    """Popularité décroissante : quelques articles concentrent l'essentiel du trafic"""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données volumineux (catégories, produits, utilisateurs, "
+        "paniers, commandes) par insertions en masse, pour les tests de charge"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--carts', type=int, default=2000,
+                            help="Paniers ouverts, anonymes ou non (défaut : 2000)")
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--seed', type=int, help="Graine aléatoire, pour un jeu reproductible")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Suffixe propre à chaque exécution : les slugs et identifiants ne se
+        # heurtent pas à ceux d'un jeu déjà généré
+        run = uuid.UUID(int=rng.getrandbits(128)).hex[:6]
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            categories = self.create_categories(rng, run, options['categories'])
+            products = self.create_products(rng, run, categories, options['products'])
+            users = self.create_users(run, options['users'])
+            popularity = zipf_weights(len(products))
+            carts = self.create_carts(rng, products, popularity, users, options['carts'])
+            orders = self.create_orders(rng, products, popularity, users, options['orders'])
+        self.stdout.write(f"Insertions terminées en {time.perf_counter() - start:.2f}s")
+
+        # bulk_create ne déclenche pas les signaux
+        start = time.perf_counter()
+        if search.is_available():
+            with transaction.atomic():
+                search.rebuild_index()
+        reconcile_active_product_counts()
+        bump_catalog_version()
+        self.stdout.write(f"Index et compteurs mis à jour en {time.perf_counter() - start:.2f}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(categories)} catégories, {len(products)} produits, {len(users)} utilisateurs "
+            f"(mot de passe : {USER_PASSWORD}), {carts} lignes de panier, {orders} commandes"
+        ))
+
+    def create_categories(self, rng, run, count):
+        names = [f'{rng.choice(NOUNS)} {rng.choice(BRANDS)} {i}' for i in range(count)]
+        return Category.objects.bulk_create(
+            [Category(name=name, slug=f'charge-{run}-cat-{i}', description=f'Catégorie {name}')
+             for i, name in enumerate(names)],
+            batch_size=BATCH_SIZE
+        )
+
+    def create_products(self, rng, run, categories, count):
+        # Quelques grandes catégories et une longue traîne
+        category_weights = zipf_weights(len(categories), exponent=0.8)
+        products = []
+        for i in range(count):
+            title = f'{rng.choice(NOUNS)} {rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {i}'
+            # Prix log-normal : médiane ~30, quelques articles très chers
+            price = min(decimal.Decimal(rng.lognormvariate(3.4, 1.0)), decimal.Decimal('99999'))
+            products.append(Product(
+                title=title,
+                slug=f'charge-{run}-{i}',
+                description=f'{title}. ' + ' '.join(rng.choices(ADJECTIVES + NOUNS, k=rng.randint(10, 60))),
+                price=max(price, decimal.Decimal('0.5')).quantize(decimal.Decimal('0.01')),
+                # 8 % de ruptures, sinon stock à décroissance exponentielle
+                stock=0 if rng.random() < 0.08 else int(rng.expovariate(1 / 40)) + 1,
+                category=rng.choices(categories, cum_weights=category_weights)[0],
+                is_active=rng.random() > 0.03,
+            ))
+        return Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+
+    def create_users(self, run, count):
+        # Un seul hachage (coûteux) partagé par tous les comptes générés
+        password = make_password(USER_PASSWORD)
+        return User.objects.bulk_create(
+            [User(username=f'{USER_PREFIX}{run}-{i}', email=f'{USER_PREFIX}{run}-{i}@example.com',
+                  password=password, first_name='Client', last_name=str(i))
+             for i in range(count)],
+            batch_size=BATCH_SIZE
+        )
+
+    def pick_products(self, rng, products, popularity, count):
+        picked = {}
+        for product in rng.choices(products, cum_weights=popularity, k=count):
+            picked[product.id] = product
+        return list(picked.values())
+
+    def create_carts(self, rng, products, popularity, users, count):
+        items = []
+        for _ in range(count):
+            # Deux tiers de paniers anonymes, souvent abandonnés
+            user = rng.choice(users) if users and rng.random() < 0.33 else None
+            session_id = uuid.UUID(int=rng.getrandbits(128)).hex
+            for product in self.pick_products(rng, products, popularity, rng.randint(1, 5)):
+                items.append(CartItem(
+                    session_id=session_id, user=user, product=product,
+                    quantity=rng.choices([1, 2, 3, 5], weights=[70, 20, 7, 3])[0],
+                    price_snapshot=product.price,
+                ))
+        CartItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+        return len(items)
+
+    def create_orders(self, rng, products, popularity, users, count):
+        if not users:
+            return 0
+        orders, order_lines = [], []
+        for _ in range(count):
+            # Quelques clients fidèles passent la majorité des commandes
+            user = users[min(int(rng.paretovariate(1.2)) - 1, len(users) - 1)] if rng.random() < 0.5 \
+                else rng.choice(users)
+            lines = [
+                (product, rng.choices([1, 2, 3], weights=[80, 15, 5])[0])
+                for product in self.pick_products(rng, products, popularity, rng.randint(1, 4))
+            ]
+            orders.append(Order(
+                order_number=f'CTM-{uuid.UUID(int=rng.getrandbits(128)).hex[:8].upper()}',
+                user=user, email=user.email, first_name=user.first_name, last_name=user.last_name,
+                address='1 rue du Commerce, Abidjan', status=rng.choice(ORDER_STATUSES),
+                total=sum(product.price * quantity for product, quantity in lines),
+            ))
+            order_lines.append(lines)
+
+        orders = Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=product, quantity=quantity,
+                          price=product.price, total=product.price * quantity)
+                for order, lines in zip(orders, order_lines)
+                for product, quantity in lines
+            ],
+            batch_size=BATCH_SIZE
+        )
+        return len(orders)
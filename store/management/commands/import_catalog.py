@@ -0,0 +1,160 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store import search
+from store.cache import bump_catalog_version
+from store.counters import reconcile_active_product_counts
+from store.importer import FORMATS, batched, detect_format, read_rows, validate_batch
+from store.models import Category, Product
+
+# Champs réécrits quand le slug existe déjà (created_at est conservé)
+UPDATE_FIELDS = ['title', 'description', 'price', 'stock', 'category', 'image_url', 'is_active', 'updated_at']
+
+# Erreurs affichées en détail (les suivantes sont seulement comptées)
+MAX_REPORTED_ERRORS = 20
+
+
+class CatalogWriter:
+    """
+    Écrivain unique : résout les catégories via une table slug → id gardée
+    en mémoire et upserte chaque lot dans sa propre transaction.
+    """
+
+    def __init__(self, create_categories=False):
+        self.create_categories = create_categories
+        self.category_ids = dict(Category.objects.values_list('slug', 'id'))
+        self.created_categories = 0
+
+    def resolve_categories(self, products):
+        """Sépare les produits dont la catégorie est connue (ou créée) des autres"""
+        missing = {}
+        for product in products:
+            if product['category'] not in self.category_ids:
+                missing.setdefault(product['category'], product['category_name'] or product['category'])
+        if missing and self.create_categories:
+            Category.objects.bulk_create(
+                [Category(slug=slug, name=name) for slug, name in missing.items()],
+                ignore_conflicts=True
+            )
+            created = dict(Category.objects.filter(slug__in=missing).values_list('slug', 'id'))
+            self.created_categories += len(created)
+            self.category_ids.update(created)
+
+        resolved, errors = [], []
+        for product in products:
+            if product['category'] in self.category_ids:
+                resolved.append(product)
+            else:
+                errors.append((product['slug'], f"catégorie inconnue : {product['category']}"))
+        return resolved, errors
+
+    def write(self, products):
+        """Upserte un lot validé ; retourne (nombre écrit, erreurs)"""
+        with transaction.atomic():
+            products, errors = self.resolve_categories(products)
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        slug=product['slug'],
+                        title=product['title'],
+                        description=product['description'],
+                        price=product['price'],
+                        stock=product['stock'],
+                        category_id=self.category_ids[product['category']],
+                        image_url=product['image_url'],
+                        is_active=product['is_active'],
+                    )
+                    for product in products
+                ],
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=UPDATE_FIELDS,
+            )
+        return len(products), errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe un catalogue CSV ou JSONL en flux : upsert des produits par slug, "
+        "par lots, puis reconstruction de l'index de recherche et des compteurs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier CSV ou JSONL")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Format du fichier (défaut : d'après l'extension)")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Lignes par lot et par transaction (défaut : 1000)")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processus d'analyse et de validation (défaut : 0, dans le processus courant)")
+        parser.add_argument('--create-categories', action='store_true',
+                            help="Crée les catégories inconnues (nom : colonne category_name, sinon le slug)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"Fichier introuvable : {path}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être positif")
+
+        fmt = options['format'] or detect_format(path)
+        writer = CatalogWriter(create_categories=options['create_categories'])
+        batches = batched(read_rows(path, fmt), options['batch_size'])
+
+        imported = rejected = 0
+        start = time.perf_counter()
+        for i, (products, errors) in enumerate(self.validated(batches, options['workers']), start=1):
+            written, unresolved = writer.write(products)
+            imported += written
+            rejections = [(f'ligne {line}', message) for line, message in errors]
+            rejections += [(f'slug {slug}', message) for slug, message in unresolved]
+            for where, message in rejections:
+                rejected += 1
+                if rejected <= MAX_REPORTED_ERRORS:
+                    self.stderr.write(f"Rejeté ({where}) : {message}")
+            if i % 10 == 0:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{imported} produits importés ({imported / elapsed:.0f} lignes/s)")
+        import_time = time.perf_counter() - start
+
+        if rejected > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... et {rejected - MAX_REPORTED_ERRORS} autres lignes rejetées")
+
+        # bulk_create ne déclenche pas les signaux : index, compteurs et cache sont
+        # remis à jour en une fois
+        start = time.perf_counter()
+        if search.is_available():
+            with transaction.atomic():
+                search.rebuild_index()
+        reconcile_active_product_counts()
+        bump_catalog_version()
+        post_time = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{imported} produits importés, {rejected} lignes rejetées, "
+            f"{writer.created_categories} catégorie(s) créée(s) en {import_time:.2f}s "
+            f"({imported / import_time if import_time else 0:.0f} lignes/s) ; "
+            f"index et compteurs mis à jour en {post_time:.2f}s"
+        ))
+
+    def validated(self, batches, workers):
+        """
+        Lots validés dans l'ordre du fichier. Avec des processus, au plus
+        2 lots par processus sont en attente : le fichier reste lu en flux.
+        """
+        if workers < 1:
+            yield from map(validate_batch, batches)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(validate_batch, batch))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
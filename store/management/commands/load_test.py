@@ -0,0 +1,91 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+
+from store.loadtest import USER_PREFIX, Recorder, VirtualUser
+from store.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge de toutes les routes de store contre un serveur déjà lancé "
+        "(runserver, uvicorn chinatrademaster.asgi:application, ...) ; écrit "
+        "p50/p95/p99 et le débit par route dans un fichier JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8, help="Utilisateurs virtuels simultanés")
+        parser.add_argument('--duration', type=float, default=30, help="Durée du test en secondes")
+        parser.add_argument('--timeout', type=float, default=10, help="Délai maximal par requête")
+        parser.add_argument('--output', default='loadtest.json', help="Fichier de résultats (défaut : loadtest.json)")
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        fixtures = self.load_fixtures()
+        if len(fixtures['products']) < 2 or not fixtures['categories']:
+            raise CommandError("Pas assez de données : lancez d'abord `manage.py generate_load_data`.")
+        random.seed(options['seed'])
+
+        recorder = Recorder()
+        deadline = time.monotonic() + options['duration']
+
+        def run_user():
+            user = VirtualUser(options['base_url'], recorder, fixtures, timeout=options['timeout'])
+            while time.monotonic() < deadline:
+                user.run_once()
+
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_user, daemon=True) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+
+        results = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'duration_s': round(wall_time, 2),
+            **recorder.summary(wall_time),
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+        self.stdout.write(f"{'route':<32}{'req':>7}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for endpoint, stats in results['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<32}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+            )
+        total = results['total']
+        if not total['requests']:
+            raise CommandError(f"Aucune réponse de {options['base_url']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total['requests']} requêtes en {wall_time:.1f}s ({total['throughput_rps']} req/s, "
+            f"p95 {total['p95_ms']} ms, {total['errors']} erreurs) -> {options['output']}"
+        ))
+
+    def load_fixtures(self):
+        """Identifiants utilisés par les parcours, lus une fois dans la base du serveur"""
+        products = list(
+            Product.objects.filter(is_active=True, stock__gt=0)
+            .order_by('?').values_list('id', 'slug')[:1000]
+        )
+        titles = Product.objects.filter(is_active=True).values_list('title', flat=True)[:200]
+        return {
+            'products': products,
+            'categories': list(Category.objects.values_list('slug', flat=True)),
+            'users': list(
+                User.objects.filter(username__startswith=USER_PREFIX).values_list('username', flat=True)[:500]
+            ),
+            'words': sorted({word.lower() for title in titles for word in title.split() if len(word) > 3})
+            or ['produit'],
+        }
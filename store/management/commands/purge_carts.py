@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.purge import DEFAULT_BATCH_SIZE, DEFAULT_MIN_AGE, purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les lignes de panier anonymes dont la session a expiré ou "
+        "disparu, puis les sessions expirées, par lots de courtes transactions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"Lignes supprimées par transaction (défaut : {DEFAULT_BATCH_SIZE})")
+        parser.add_argument('--min-age', type=int, default=int(DEFAULT_MIN_AGE.total_seconds()),
+                            help="Âge minimal (secondes) d'une ligne de panier à supprimer (défaut : 3600)")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Pause entre deux lots, en secondes (défaut : 0)")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les lignes sans les supprimer")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être positif")
+        result = purge(
+            batch_size=options['batch_size'],
+            min_age=timedelta(seconds=options['min_age']),
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = "à supprimer" if options['dry_run'] else "supprimée(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['cart_items']} ligne(s) de panier et {result['sessions']} session(s) {verb} "
+            f"en {result['duration']:.2f}s"
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement l'index de recherche plein texte des produits"
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                "Index FTS5 indisponible : base non SQLite ou migrations non appliquées."
+            )
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = search.rebuild_index()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} produits indexés en {elapsed:.2f}s"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.cache import bump_catalog_version
+from store.counters import reconcile_active_product_counts
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs de produits actifs des catégories qui ont dérivé"
+
+    def handle(self, *args, **options):
+        fixed = reconcile_active_product_counts()
+        if fixed:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"{fixed} catégorie(s) corrigée(s)"))
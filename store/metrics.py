@@ -0,0 +1,275 @@
+"""
+Métriques au format texte Prometheus (servies par /internal/metrics)
+
+Compteurs et histogrammes sont des sommes : chaque processus ajoute ses
+valeurs dans son propre stockage et l'export additionne ceux de tous les
+processus. Avec `settings.METRICS_DIR`, chaque processus (worker gunicorn,
+...) projette en mémoire (mmap) un fichier `<pid>.db` de ce répertoire : un
+incrément n'est qu'une écriture en mémoire, sans verrou entre processus, et
+le processus qui répond à /internal/metrics lit tous les fichiers. Le
+répertoire doit être vidé au démarrage du serveur (hook `on_starting` de
+gunicorn par exemple). Sans METRICS_DIR, les valeurs restent dans le
+processus courant (runserver, tests).
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+AMOUNT_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def read_entries(data):
+    """(clé, valeur, position de la valeur) d'un fichier de valeurs"""
+    used = struct.unpack_from('i', data, 0)[0]
+    pos = 8
+    while pos < used:
+        length = struct.unpack_from('i', data, pos)[0]
+        key = data[pos + 4:pos + 4 + length].decode()
+        pos += 4 + length
+        pos += -pos % 8  # valeurs alignées sur 8 octets
+        yield key, struct.unpack_from('d', data, pos)[0], pos
+        pos += 8
+
+
+class MmapValues:
+    """
+    Valeurs d'un processus dans un fichier projeté en mémoire : un en-tête
+    (octets utilisés) puis des entrées (longueur, clé, flottant) ajoutées à la
+    suite. Les positions des clés sont gardées en mémoire.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(self.INITIAL_SIZE)
+        self.capacity = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        self.used = struct.unpack_from('i', self.map, 0)[0] or 8
+        self.positions = {key: pos for key, _, pos in read_entries(self.map)}
+
+    def add(self, key, amount):
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.init_key(key)
+        value = struct.unpack_from('d', self.map, pos)[0]
+        struct.pack_into('d', self.map, pos, value + amount)
+
+    def init_key(self, key):
+        encoded = key.encode()
+        padding = -(self.used + 4 + len(encoded)) % 8
+        size = 4 + len(encoded) + padding + 8
+        while self.used + size > self.capacity:
+            self.capacity *= 2
+            self.map.close()
+            self.file.truncate(self.capacity)
+            self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        struct.pack_into(f'i{len(encoded)}s{padding}xd', self.map, self.used, len(encoded), encoded, 0.0)
+        pos = self.used + size - 8
+        self.used += size
+        # En-tête écrit en dernier : un lecteur ne voit que des entrées complètes
+        struct.pack_into('i', self.map, 0, self.used)
+        self.positions[key] = pos
+        return pos
+
+    def items(self):
+        return [(key, value) for key, value, _ in read_entries(self.map)]
+
+
+class MemoryValues:
+    def __init__(self):
+        self.values = defaultdict(float)
+
+    def add(self, key, amount):
+        self.values[key] += amount
+
+    def items(self):
+        return list(self.values.items())
+
+
+_lock = threading.Lock()
+_store = None
+_store_pid = None
+
+
+def _get_store():
+    """Stockage du processus courant (recréé après un fork)"""
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            _store = MmapValues(os.path.join(directory, f'{os.getpid()}.db'))
+        else:
+            _store = MemoryValues()
+        _store_pid = os.getpid()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(*, setting, **kwargs):
+    global _store
+    if setting == 'METRICS_DIR':
+        with _lock:
+            _store = None
+
+
+def _add(key, amount):
+    with _lock:
+        _get_store().add(key, amount)
+
+
+def collect():
+    """Valeurs additionnées de tous les processus, par clé"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    totals = defaultdict(float)
+    if directory:
+        with _lock:
+            _get_store()  # le processus courant apparaît même sans mesure
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) >= 8:
+                for key, value, _ in read_entries(data):
+                    totals[key] += value
+    else:
+        with _lock:
+            for key, value in _get_store().items():
+                totals[key] += value
+    return totals
+
+
+def _key(sample, labels):
+    return json.dumps([sample, sorted(labels.items())], ensure_ascii=False)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def check_labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} : étiquettes attendues {self.labelnames}, reçues {tuple(labels)}")
+        return {name: str(value) for name, value in labels.items()}
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _add(_key(self.name, self.check_labels(labels)), amount)
+
+    def samples(self, values):
+        return [(self.name, labels, values[key]) for key, labels in values.keys_for(self.name)]
+
+
+class Histogram(Metric):
+    """Seau de la valeur incrémenté seul : les cumuls sont calculés à l'export"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        labels = self.check_labels(labels)
+        bucket = next(le for le in self.buckets if value <= le)
+        with _lock:
+            store = _get_store()
+            store.add(_key(f'{self.name}_bucket', {**labels, 'le': format_value(bucket)}), 1)
+            store.add(_key(f'{self.name}_sum', labels), value)
+            store.add(_key(f'{self.name}_count', labels), 1)
+
+    def samples(self, values):
+        samples = []
+        for key, labels in values.keys_for(f'{self.name}_count'):
+            cumulative = 0
+            for le in self.buckets:
+                le = format_value(le)
+                cumulative += values.get(_key(f'{self.name}_bucket', {**labels, 'le': le}), 0)
+                samples.append((f'{self.name}_bucket', {**labels, 'le': le}, cumulative))
+            samples.append((f'{self.name}_sum', labels, values.get(_key(f'{self.name}_sum', labels), 0)))
+            samples.append((f'{self.name}_count', labels, values[key]))
+        return samples
+
+
+class Values(dict):
+    """Valeurs collectées, avec accès aux clés d'un échantillon donné"""
+
+    def keys_for(self, sample):
+        for key in sorted(self):
+            name, labels = json.loads(key)
+            if name == sample:
+                yield key, dict(labels)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+def render():
+    """Exposition au format texte Prometheus 0.0.4"""
+    values = Values(collect())
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for sample, labels, value in metric.samples(values):
+            lines.append(f'{sample}{format_labels(labels)} {format_value(value)}')
+
+    # Ratio calculé à l'export, pour les tableaux de bord sans PromQL
+    lines.append('# HELP store_cache_hit_ratio Part des lectures de cache servies depuis le cache')
+    lines.append('# TYPE store_cache_hit_ratio gauge')
+    lookups = defaultdict(lambda: [0, 0])
+    for key, labels in values.keys_for(CACHE_LOOKUPS.name):
+        lookups[labels['cache']][labels['result'] == 'hit'] += values[key]
+    for cache, (misses, hits) in sorted(lookups.items()):
+        lines.append(f'store_cache_hit_ratio{format_labels({"cache": cache})} {format_value(hits / (hits + misses))}')
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = []
+
+REQUESTS = Counter('store_http_requests_total', 'Requêtes HTTP par route', ['view', 'method', 'status'])
+REQUEST_LATENCY = Histogram('store_http_request_duration_seconds', 'Durée des requêtes HTTP par route', ['view'])
+REQUEST_QUERIES = Histogram(
+    'store_db_queries_per_request', 'Requêtes SQL par requête HTTP', ['view'], buckets=QUERY_COUNT_BUCKETS
+)
+QUERY_LATENCY = Histogram('store_db_query_duration_seconds', 'Durée des requêtes SQL')
+CACHE_LOOKUPS = Counter('store_cache_lookups_total', 'Lectures du cache du catalogue', ['cache', 'result'])
+CART_ADDITIONS = Counter('store_cart_additions_total', 'Produits ajoutés au panier', ['source'])
+CHECKOUTS = Counter('store_checkouts_total', 'Commandes tentées', ['result'])
+ORDER_TOTALS = Histogram('store_order_total', 'Montant des commandes créées', buckets=AMOUNT_BUCKETS)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
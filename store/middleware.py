@@ -0,0 +1,256 @@
+"""
+Middlewares de l'application store
+"""
+import json
+import logging
+import mimetypes
+import os
+import time
+from urllib.parse import unquote, urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .instrumentation import RequestMetrics, current_metrics, timed
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES, REQUESTS
+from .staticfiles import ENCODINGS
+
+performance_logger = logging.getLogger('store.performance')
+
+# Horodatage (epoch) du dernier enregistrement de la session
+SESSION_REFRESHED_KEY = '_refreshed_at'
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """
+    Remplace SESSION_SAVE_EVERY_REQUEST : une session non modifiée n'est
+    réenregistrée (expiration et cookie prolongés) que lorsque sa durée de vie
+    restante passe sous `settings.SESSION_REFRESH_THRESHOLD` secondes.
+    Les requêtes en lecture seule n'écrivent donc plus dans la table des sessions.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and not settings.SESSION_SAVE_EVERY_REQUEST:
+            self.refresh_if_needed(session)
+        if session is None or not (session.modified or settings.SESSION_SAVE_EVERY_REQUEST):
+            return super().process_response(request, response)
+        with timed('session'):
+            return super().process_response(request, response)
+
+    def refresh_if_needed(self, session):
+        now = int(time.time())
+        if session.modified:
+            if not session.is_empty():
+                session[SESSION_REFRESHED_KEY] = now
+            return
+        # Session non lue par la requête : rien à prolonger, pas de chargement
+        if not session.accessed or session.is_empty():
+            return
+        refreshed_at = session.get(SESSION_REFRESHED_KEY)
+        threshold = getattr(settings, 'SESSION_REFRESH_THRESHOLD', settings.SESSION_COOKIE_AGE // 2)
+        if refreshed_at is None or refreshed_at + session.get_expiry_age() - now < threshold:
+            session[SESSION_REFRESHED_KEY] = now
+
+
+def accepted_encodings(header):
+    """Encodages acceptés d'après l'en-tête Accept-Encoding (q=0 exclus)"""
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if encoding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Sert les fichiers de STATIC_ROOT produits par `collectstatic`, en
+    choisissant la variante .br ou .gz selon Accept-Encoding. Les noms hashés
+    (présents dans le manifeste) sont mis en cache un an avec `immutable` ;
+    les noms d'origine sont revalidés à chaque requête (Last-Modified).
+    Les chemins absents de STATIC_ROOT suivent la chaîne normale.
+    """
+    IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = '/' + urlsplit(settings.STATIC_URL).path.lstrip('/')
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self._immutable_names = None
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.static_response(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        # Lecture de métadonnées locales (stat) seulement : pas de passage par un thread
+        response = self.static_response(request)
+        return response if response is not None else await self.get_response(request)
+
+    def static_response(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            return self.serve(request, unquote(request.path_info[len(self.prefix):]))
+        return None
+
+    def immutable_names(self):
+        """
+        Noms hashés du manifeste, en ensemble pour un test d'appartenance en
+        temps constant ; construit au premier fichier servi (le manifeste ne
+        change qu'avec `collectstatic`, suivi d'un redémarrage)
+        """
+        if self._immutable_names is None:
+            self._immutable_names = frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._immutable_names
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        immutable = name in self.immutable_names()
+        if not immutable and not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime
+        ):
+            return HttpResponseNotModified()
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if immutable:
+            patch_cache_control(response, public=True, max_age=self.IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            response.headers['Last-Modified'] = http_date(stat.st_mtime)
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Mesure chaque requête, alimente les métriques par route de store.metrics
+    et ajoute l'en-tête Server-Timing :
+    `sql` (nombre de requêtes et durée), `view` (vue, gabarits et SQL compris),
+    `template`, `session` (enregistrement) et `total`.
+
+    Au-delà de `settings.SLOW_REQUEST_THRESHOLD_MS`, une ligne JSON est écrite
+    dans le journal `store.performance`, avec les requêtes SQL les plus
+    répétées (symptôme d'un N+1). L'en-tête n'est envoyé qu'avec
+    `settings.SERVER_TIMING_HEADER` (par défaut : DEBUG) ; le journal et les
+    métriques ne dépendent pas de ce réglage.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Crochet asynchrone : Django n'a pas à l'adapter (sync_to_async)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        view_start = getattr(request, '_view_started_at', None)
+        if view_start is not None:
+            # De l'appel de la vue au retour ici, hors enregistrement de la session
+            metrics.durations['view'] = time.perf_counter() - view_start - metrics.durations['session']
+        total = metrics.elapsed()
+        self.observe(request, response, metrics, total)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            response.headers['Server-Timing'] = self.server_timing(metrics, total)
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+        if threshold is not None and total * 1000 >= threshold:
+            self.log_slow_request(request, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started_at = time.perf_counter()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # `process_view` désigne cette méthode en mode asynchrone
+        request._view_started_at = time.perf_counter()
+
+    def observe(self, request, response, metrics, total):
+        """Métriques exposées par /internal/metrics (voir store.metrics)"""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_LATENCY.observe(total, view=view)
+        REQUEST_QUERIES.observe(metrics.sql_count, view=view)
+
+    def server_timing(self, metrics, total):
+        entries = [f'sql;desc="{metrics.sql_count} queries";dur={metrics.sql_time * 1000:.1f}']
+        for name in ('view', 'template', 'session'):
+            if name in metrics.durations:
+                entries.append(f'{name};dur={metrics.durations[name] * 1000:.1f}')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+    def log_slow_request(self, request, response, metrics, total):
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sql_count': metrics.sql_count,
+            'sql_ms': round(metrics.sql_time * 1000, 1),
+            **{f'{name}_ms': round(duration * 1000, 1) for name, duration in sorted(metrics.durations.items())},
+            'duplicated_sql': [
+                {'count': count, 'sql': sql} for sql, count in metrics.duplicated_statements()
+            ],
+        }
+        performance_logger.warning('slow_request %s', json.dumps(record, ensure_ascii=False))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils.text import slugify
@@ -19,6 +20,19 @@ class Category(models.Model):
         null=True,
         verbose_name="Image de la catégorie"
     )
+    # Déclinaisons responsives de l'image (voir store.images)
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Déclinaisons de l'image"
+    )
+    # Compteur dénormalisé, maintenu par les signaux de store.signals
+    active_product_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Nombre de produits actifs"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Modifié le")
 
@@ -64,6 +78,20 @@ class Product(models.Model):
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
         ordering = ['-created_at']
+        # Index calqués sur les requêtes du catalogue (voir IndexUsageTests) :
+        # listes de produits actifs triées par date, par catégorie et par prix
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], condition=Q(is_active=True),
+                name='product_active_recent_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at'], condition=Q(is_active=True),
+                name='product_active_cat_recent_idx',
+            ),
+            models.Index(fields=['category', 'is_active', 'price'], name='product_cat_active_price_idx'),
+            models.Index(fields=['price'], condition=Q(is_active=True), name='product_active_price_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -108,6 +136,11 @@ class CartItem(models.Model):
         verbose_name = "Élément du panier"
         verbose_name_plural = "Éléments du panier"
         unique_together = ['session_id', 'product']
+        # Panier d'un utilisateur connecté (les paniers de session sont servis
+        # par l'index unique (session_id, product))
+        indexes = [
+            models.Index(fields=['user', 'product'], name='cartitem_user_product_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.title} - {self.quantity}"
@@ -156,6 +189,9 @@ class Order(models.Model):
         verbose_name = "Commande"
         verbose_name_plural = "Commandes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Commande {self.order_number}"
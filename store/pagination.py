@@ -0,0 +1,160 @@
+"""
+Pagination par curseur (keyset) pour les listes de produits
+
+Contrairement à `Paginator`, aucune requête COUNT(*) n'est exécutée et la
+page est obtenue par une condition de recherche sur `(created_at, id)`,
+cohérente avec `Product.Meta.ordering`, au lieu d'un OFFSET.
+
+Les résultats d'une recherche plein texte (`search.search_products`) restent
+triés par pertinence : le curseur porte alors sur `(score bm25, id)`.
+"""
+import base64
+import math
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from . import search
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou falsifié"""
+
+
+def encode_cursor(direction, position, pk):
+    """`position` : date de création, ou score de pertinence (float) d'une recherche"""
+    # repr() d'un float se relit à l'identique : l'égalité sur le score reste exacte
+    value = f'r{position!r}' if isinstance(position, float) else position.isoformat()
+    raw = f'{direction}|{value}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retourne (direction, position, pk) ; lève InvalidCursor si invalide"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, value, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        if direction not in ('n', 'p'):
+            raise ValueError(direction)
+        if value.startswith('r'):
+            position = float(value[1:])
+            if not math.isfinite(position):
+                raise ValueError(value)
+        else:
+            position = datetime.fromisoformat(value)
+        return direction, position, int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+class CursorPage:
+    """
+    Page de résultats obtenue par curseur. Expose la même interface de base
+    qu'une `Page` Django (itération, has_next, has_previous) plus les curseurs.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def paginate_by_cursor(queryset, cursor, per_page):
+    """
+    Retourne la `CursorPage` correspondant à `cursor` (chaîne vide ou None pour
+    la première page). Le tri du queryset est remplacé par (-created_at, -id),
+    ou par (pertinence, id) pour une recherche plein texte.
+    """
+    direction, key, queryset = _cursor_queryset(queryset, cursor)
+    # Un élément de plus pour savoir s'il existe une page suivante
+    items = list(queryset[:per_page + 1])
+    return _cursor_page(items, direction, key, cursor, per_page)
+
+
+async def apaginate_by_cursor(queryset, cursor, per_page):
+    """Variante de `paginate_by_cursor` pour les vues asynchrones"""
+    direction, key, queryset = _cursor_queryset(queryset, cursor)
+    items = [item async for item in queryset[:per_page + 1]]
+    return _cursor_page(items, direction, key, cursor, per_page)
+
+
+async def apage(queryset, number, per_page):
+    """
+    Équivalent asynchrone de `Paginator(queryset, per_page).get_page(number)` :
+    le COUNT et la page sont lus par l'ORM asynchrone ; le reste (validation
+    du numéro, has_next...) est celui de `Paginator`.
+    """
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()  # cached_property, renseignée d'avance
+    page = paginator.get_page(number)
+    page.object_list = [item async for item in page.object_list]
+    return paginator, page
+
+
+def _cursor_queryset(queryset, cursor):
+    """Retourne (direction, attribut de position des éléments, queryset filtré et trié)"""
+    ranked = search.RANK_ALIAS in queryset.query.extra_select
+    direction, position, pk = 'n', None, None
+    if cursor:
+        direction, position, pk = decode_cursor(cursor)
+        if isinstance(position, float) != ranked:
+            raise InvalidCursor("Curseur d'une autre liste")
+    # 'n' : suite de la liste ; 'p' : page précédente, lue à rebours
+    forward = direction == 'n'
+
+    if ranked:
+        key, ordering = search.RANK_ALIAS, [search.RANK_ALIAS, 'pk']
+        if position is not None:
+            op = '>' if forward else '<'
+            queryset = queryset.extra(
+                where=[
+                    f'({search.RANK_EXPRESSION}) {op} %s OR '
+                    f'(({search.RANK_EXPRESSION}) = %s AND store_product.id {op} %s)'
+                ],
+                params=[position, position, pk],
+            )
+    else:
+        key, ordering = 'created_at', ['-created_at', '-pk']
+        if position is not None:
+            lookup = 'lt' if forward else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'created_at__{lookup}': position}) | Q(created_at=position, **{f'pk__{lookup}': pk})
+            )
+
+    if not forward:
+        ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+    return direction, key, queryset.order_by(*ordering)
+
+
+def _cursor_page(items, direction, key, cursor, per_page):
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if direction == 'p':
+        items.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, bool(cursor)
+
+    next_cursor = previous_cursor = None
+    if items:
+        first, last = items[0], items[-1]
+        if has_next:
+            next_cursor = encode_cursor('n', getattr(last, key), last.pk)
+        if has_previous:
+            previous_cursor = encode_cursor('p', getattr(first, key), first.pk)
+
+    return CursorPage(items, next_cursor, previous_cursor)
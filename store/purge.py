@@ -0,0 +1,108 @@
+"""
+Purge des paniers abandonnés et des sessions expirées
+
+Les lignes `CartItem` anonymes (sans utilisateur) dont la session n'existe
+plus ou a expiré ne seront plus jamais lues : elles sont supprimées, ainsi
+que les lignes expirées de `django_session`. Les paniers des utilisateurs
+connectés sont conservés.
+
+La suppression se fait par lots, une courte transaction par lot (lecture
+des clés puis DELETE ... WHERE pk IN (...)) : le verrou d'écriture de SQLite
+n'est jamais tenu longtemps et les requêtes du site passent entre deux lots.
+
+Utilisation : `manage.py purge_carts`, ou dans le processus web avec
+`settings.CART_PURGE_INTERVAL` (voir `start_periodic_purge`).
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import CartItem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+# Délai de grâce : une ligne toute récente peut appartenir à une session en
+# cours de création par une autre requête
+DEFAULT_MIN_AGE = timedelta(hours=1)
+
+
+def stale_cart_items(now, min_age=DEFAULT_MIN_AGE):
+    """Lignes anonymes sans session vivante, non modifiées depuis `min_age`"""
+    live_session = Session.objects.filter(session_key=OuterRef('session_id'), expire_date__gt=now)
+    return CartItem.objects.filter(
+        user__isnull=True, updated_at__lt=now - min_age
+    ).exclude(Exists(live_session))
+
+
+def expired_sessions(now):
+    return Session.objects.filter(expire_date__lte=now)
+
+
+def delete_in_batches(queryset, batch_size=DEFAULT_BATCH_SIZE, pause=0):
+    """Supprime les lignes de `queryset` par lots ; retourne le nombre supprimé"""
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            deleted += model.objects.filter(pk__in=pks).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def purge(batch_size=DEFAULT_BATCH_SIZE, min_age=DEFAULT_MIN_AGE, pause=0, dry_run=False):
+    """
+    Supprime les paniers anonymes abandonnés puis les sessions expirées.
+    Retourne {'cart_items': n, 'sessions': n, 'duration': secondes} ; avec
+    `dry_run`, les lignes sont seulement comptées.
+    """
+    start = time.perf_counter()
+    now = timezone.now()
+    # Paniers d'abord : leurs sessions expirées servent encore à les repérer
+    querysets = {'cart_items': stale_cart_items(now, min_age), 'sessions': expired_sessions(now)}
+    result = {
+        name: queryset.count() if dry_run else delete_in_batches(queryset, batch_size, pause)
+        for name, queryset in querysets.items()
+    }
+    result['duration'] = time.perf_counter() - start
+    return result
+
+
+_purge_thread = None
+
+
+def start_periodic_purge(interval=None):
+    """
+    Lance la purge toutes les `interval` secondes (CART_PURGE_INTERVAL par
+    défaut) dans un thread du processus courant ; une seule fois par processus.
+    """
+    global _purge_thread
+    interval = interval or getattr(settings, 'CART_PURGE_INTERVAL', None)
+    if not interval or _purge_thread is not None:
+        return None
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                result = purge(batch_size=getattr(settings, 'CART_PURGE_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+                logger.info('purge_carts %s', result)
+            except Exception:
+                logger.exception('Échec de la purge des paniers')
+            finally:
+                close_old_connections()
+
+    _purge_thread = threading.Thread(target=run, name='store-purge-carts', daemon=True)
+    _purge_thread.stop = stop
+    _purge_thread.start()
+    return _purge_thread
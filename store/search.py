@@ -0,0 +1,145 @@
+"""
+Index de recherche plein texte du catalogue (SQLite FTS5)
+
+La table virtuelle `store_product_fts` contient une ligne par produit
+(rowid = id du produit) avec le titre, la description et le nom de la
+catégorie. Elle est tenue à jour par les signaux de `store.signals` et peut
+être reconstruite en masse avec `manage.py rebuild_search_index`.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'store_product_fts'
+
+# Score de pertinence (plus petit = meilleur) ; poids bm25 : titre > nom de
+# catégorie > description. Exposé sous RANK_ALIAS dans les résultats
+RANK_ALIAS = 'search_rank'
+RANK_EXPRESSION = f'bm25({FTS_TABLE}, 10.0, 1.0, 5.0)'
+
+# Mots de la requête utilisateur
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Bases (par nom) sur lesquelles la table FTS a déjà été trouvée
+_available_on = set()
+
+
+def is_available():
+    """Indique si l'index FTS5 est utilisable sur la base courante"""
+    if connection.vendor != 'sqlite':
+        return False
+    name = str(connection.settings_dict['NAME'])
+    if name in _available_on:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        found = cursor.fetchone() is not None
+    if found:
+        _available_on.add(name)
+    return found
+
+
+async def ais_available():
+    """Variante de `is_available` pour les vues asynchrones"""
+    if connection.vendor != 'sqlite':
+        return False
+    if str(connection.settings_dict['NAME']) in _available_on:
+        return True
+    return await sync_to_async(is_available)()
+
+
+def build_match_expression(q):
+    """
+    Construit une expression MATCH FTS5 à partir de la saisie utilisateur.
+    Chaque mot devient un préfixe entre guillemets (recherche au fil de la frappe),
+    les mots sont combinés en ET implicite. Retourne None si rien n'est indexable.
+    """
+    tokens = _TOKEN_RE.findall(q or '')
+    if not tokens:
+        return None
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def search_products(queryset, q, available=None):
+    """
+    Filtre un queryset de produits sur la requête `q`, trié par pertinence (bm25).
+    Retombe sur l'ancien filtre `icontains` si l'index n'est pas disponible.
+    `available` évite de revérifier l'index (résultat de `ais_available()`
+    dans une vue asynchrone).
+    """
+    expression = build_match_expression(q)
+    if available is None:
+        available = expression is not None and is_available()
+    if expression is None or not available:
+        return queryset.filter(
+            Q(title__icontains=q) |
+            Q(description__icontains=q) |
+            Q(category__name__icontains=q)
+        )
+
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = store_product.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[expression],
+        select={RANK_ALIAS: RANK_EXPRESSION},
+        order_by=[RANK_ALIAS, '-created_at'],
+    )
+
+
+def index_product(product):
+    """Ajoute ou remplace un produit dans l'index"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, category_name) '
+            f'SELECT p.id, p.title, p.description, c.name '
+            f'FROM store_product p INNER JOIN store_category c ON c.id = p.category_id '
+            f'WHERE p.id = %s',
+            [product.pk]
+        )
+
+
+def remove_product(product_id):
+    """Retire un produit de l'index"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def update_category_name(category):
+    """Répercute le nom d'une catégorie sur tous ses produits indexés"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET category_name = %s '
+            f'WHERE rowid IN (SELECT id FROM store_product WHERE category_id = %s)',
+            [category.name, category.pk]
+        )
+
+
+def rebuild_index():
+    """
+    Reconstruit l'index complet en deux requêtes (vidage + INSERT ... SELECT).
+    Retourne le nombre de produits indexés.
+    """
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, category_name) '
+            f'SELECT p.id, p.title, p.description, c.name '
+            f'FROM store_product p INNER JOIN store_category c ON c.id = p.category_id'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,110 @@
+"""
+Signaux du catalogue : synchronisation de l'index de recherche, des
+compteurs dénormalisés, des déclinaisons d'images et des fragments JSON des
+produits, invalidation du cache de lecture. L'invalidation attend la
+validation de la transaction : une requête concurrente ne peut pas remettre
+en cache l'état d'avant l'écriture sous la nouvelle version.
+Signal de connexion : écriture en base du panier de session.
+"""
+from functools import partial
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache as catalog_cache
+from . import documents
+from . import search
+from .cart import get_cart_engine
+from .counters import adjust_active_product_count, protect_active_product_count, release_active_product_count
+from .images import build_category_variants
+from .models import Category, Product
+
+
+def store_product_documents(**filters):
+    # Relu après commit : les fragments portent l'état validé en base
+    products = Product.objects.filter(is_active=True, **filters).select_related('category')
+    documents.store_documents(products)
+
+
+def refresh_category_variants(category_id):
+    # Après commit, hors de la transaction d'écriture ; relu en base, ce qui
+    # ignore aussi les enregistrements répétés d'une même image
+    category = Category.objects.filter(pk=category_id).first()
+    if category is None or (category.image.name or '') == category.image_variants.get('source', ''):
+        return
+    variants = build_category_variants(category)
+    Category.objects.filter(pk=category_id).update(image_variants=variants)
+
+
+@receiver(pre_save, sender=Product)
+def product_pre_save(sender, instance, raw=False, **kwargs):
+    # Mémorise l'état en base pour calculer la variation des compteurs
+    instance._previous_state = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_state = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list('category_id', 'is_active')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if previous != (instance.category_id, instance.is_active):
+        if previous and previous[1]:
+            adjust_active_product_count(previous[0], -1)
+        if instance.is_active:
+            adjust_active_product_count(instance.category_id, 1)
+    search.index_product(instance)
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+    if instance.is_active:
+        transaction.on_commit(partial(store_product_documents, pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    if instance.is_active:
+        adjust_active_product_count(instance.category_id, -1)
+    search.remove_product(instance.pk)
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+
+@receiver(pre_save, sender=Category)
+def category_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        protect_active_product_count(instance)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created=False, raw=False, **kwargs):
+    release_active_product_count(instance)
+    if raw:
+        return
+    if not created:
+        search.update_category_name(instance)
+        # Le nom et `updated_at` de la catégorie entrent dans les fragments
+        transaction.on_commit(partial(store_product_documents, category_id=instance.pk))
+    # Nouvelle image téléversée (ou supprimée) : régénérer les déclinaisons
+    # après commit, avant l'invalidation du cache (rappels exécutés dans
+    # l'ordre d'enregistrement)
+    if (instance.image.name or '') != instance.image_variants.get('source', ''):
+        transaction.on_commit(partial(refresh_category_variants, instance.pk))
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+
+@receiver(user_logged_in)
+def user_logged_in_cart(sender, request, user, **kwargs):
+    if request is None or not hasattr(request, 'session'):
+        return
+    get_cart_engine().on_login(request, user)
@@ -0,0 +1,112 @@
+"""
+Construction des fichiers statiques : noms hashés, dédoublonnage et précompression
+
+`PrecompressedManifestStaticFilesStorage` est branché sur `STORAGES['staticfiles']`,
+`manage.py collectstatic` sert donc d'étape de build :
+
+- chaque fichier est copié sous un nom contenant le hash de son contenu
+  (`css/style.3f2a9c1b7e4d.css`) ; le manifeste `staticfiles.json` fait le lien
+  pour la balise `{% static %}` ;
+- les fichiers identiques octet pour octet partagent un seul nom hashé (un seul
+  fichier écrit, une seule URL mise en cache par le navigateur) ;
+- chaque fichier compressible reçoit des voisins `.gz` et `.br` (ce dernier
+  seulement si le module `brotli` est installé), servis par
+  `store.middleware.PrecompressedStaticMiddleware`.
+"""
+import gzip
+import logging
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# (Content-Encoding, suffixe) par ordre de préférence
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')] if brotli else [('gzip', '.gz')]
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico'}
+
+# En dessous, l'en-tête gzip/brotli coûte plus qu'il ne rapporte
+MIN_COMPRESS_SIZE = 256
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    # mtime=0 : sortie identique d'un build à l'autre
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage avec dédoublonnage des fichiers identiques et
+    écriture des variantes précompressées
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # {(hash, extension): nom hashé retenu}, seulement pendant collectstatic
+        self._blobs = None
+
+    def stored_name(self, name):
+        # Tant que collectstatic n'a pas été lancé (développement, tests),
+        # les fichiers sont servis sous leur nom d'origine
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def hashed_name(self, name, content=None, filename=None):
+        hashed_name = super().hashed_name(name, content, filename)
+        # Les fichiers réécrits (CSS, ...) contiennent des URL relatives à leur
+        # dossier : ils gardent leur propre nom
+        if self._blobs is None or matches_patterns(name, self._patterns) or '?' in hashed_name or '#' in hashed_name:
+            return hashed_name
+        root, extension = os.path.splitext(hashed_name)
+        return self._blobs.setdefault((os.path.splitext(root)[1], extension), hashed_name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        self._blobs = {}
+        # Premier passage : le nom retenu pour un contenu partagé est le plus
+        # court (`images/artisanale.png` plutôt que `images/artisanale - Copie.png`)
+        for name in sorted(paths, key=lambda name: (len(name), name)):
+            if not matches_patterns(name, self._patterns):
+                storage, path = paths[name]
+                with storage.open(path) as original_file:
+                    self.hashed_name(name, original_file)
+        try:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+        finally:
+            self._blobs = None
+
+        names = set(paths) | set(self.hashed_files.values())
+        compressed = sum(self.write_compressed_variants(name) for name in sorted(names))
+        logger.info("%d variantes précompressées écrites (%s)", compressed,
+                    ', '.join(encoding for encoding, _ in ENCODINGS))
+
+    def write_compressed_variants(self, name):
+        """Écrit les voisins .gz/.br de `name` et retourne leur nombre"""
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+            return 0
+        with self.open(name) as f:
+            data = f.read()
+        written = 0
+        for encoding, suffix in ENCODINGS:
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            payload = compress(data, encoding)
+            # Inutile de garder une variante qui ne fait presque rien gagner
+            if len(payload) < len(data) * 0.95:
+                self._save(name + suffix, ContentFile(payload))
+                written += 1
+        return written
@@ -0,0 +1,122 @@
+"""
+Cache de fragments de gabarits, versionné avec le catalogue
+
+Usage :
+    {% load store_cache %}
+    {% cached_fragment "nav" %}...{% endcached_fragment %}
+    {% cached_fragment "category_grid" page %}...{% endcached_fragment %}
+
+La clé combine la version du catalogue (voir store.cache), la langue active,
+le nom du fragment et les éventuelles variables suivantes : toute écriture sur
+Product ou Category invalide les fragments. Ne jamais y placer de contenu
+propre à l'utilisateur (jeton CSRF, nom, panier).
+
+Avec `settings.CATALOG_FRAGMENT_DEBUG`, chaque fragment est précédé d'un
+commentaire HTML (succès ou échec, temps de rendu) et
+`{% fragment_cache_report %}` affiche le bilan de la page.
+"""
+import logging
+import time
+
+from django import template
+from django.conf import settings
+from django.utils.html import format_html
+from django.utils.translation import get_language
+
+from store import cache as catalog_cache
+from store.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+STATS_ATTRIBUTE = '_fragment_cache_stats'
+
+
+def debug_enabled():
+    return getattr(settings, 'CATALOG_FRAGMENT_DEBUG', False)
+
+
+def get_stats(context):
+    """Compteurs de la page en cours, portés par la requête (y compris les {% include %})"""
+    request = context.get('request')
+    if request is None:
+        return context.render_context.setdefault(STATS_ATTRIBUTE, new_stats())
+    if not hasattr(request, STATS_ATTRIBUTE):
+        setattr(request, STATS_ATTRIBUTE, new_stats())
+    return getattr(request, STATS_ATTRIBUTE)
+
+
+def new_stats():
+    return {'hits': 0, 'misses': 0, 'render_ms': 0.0, 'saved_ms': 0.0}
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        params = {'lang': get_language() or ''}
+        for i, variable in enumerate(self.vary_on):
+            params[f'v{i}'] = variable.resolve(context)
+        cache = catalog_cache.get_cache()
+        key = catalog_cache.catalog_key(f'fragment:{self.name}', params)
+
+        cached = cache.get(key)
+        record_cache_lookup('fragment', cached is not None)
+        if cached is None:
+            start = time.perf_counter()
+            content = self.nodelist.render(context)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # Le temps de rendu est gardé pour estimer le gain des succès suivants
+            cache.set(key, (content, elapsed_ms), catalog_cache.get_timeout())
+        else:
+            content, elapsed_ms = cached
+
+        if not debug_enabled():
+            return content
+        stats = get_stats(context)
+        if cached is None:
+            stats['misses'] += 1
+            stats['render_ms'] += elapsed_ms
+            status = f'miss, rendu en {elapsed_ms:.2f} ms'
+        else:
+            stats['hits'] += 1
+            stats['saved_ms'] += elapsed_ms
+            status = f'hit, ~{elapsed_ms:.2f} ms évitées'
+        logger.debug("Fragment %s : %s", self.name, status)
+        return format_html('<!-- fragment {} : {} -->{}', self.name, status, content)
+
+
+@register.tag
+def cached_fragment(parser, token):
+    """
+    {% cached_fragment "nom" [variable ...] %} ... {% endcached_fragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' attend au moins un nom de fragment")
+    name = bits[1]
+    if name[0] not in ('"', "'") or name[-1] != name[0]:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' : le nom du fragment doit être entre guillemets")
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(nodelist, name[1:-1], [parser.compile_filter(bit) for bit in bits[2:]])
+
+
+@register.simple_tag(takes_context=True)
+def fragment_cache_report(context):
+    """Bilan des fragments de la page (seulement avec CATALOG_FRAGMENT_DEBUG)"""
+    if not debug_enabled():
+        return ''
+    stats = get_stats(context)
+    logger.info(
+        "Fragments : %d succès, %d échecs, %.2f ms de rendu, ~%.2f ms économisées",
+        stats['hits'], stats['misses'], stats['render_ms'], stats['saved_ms']
+    )
+    return format_html(
+        '<!-- cache de fragments : {} succès, {} échecs, {} ms de rendu, ~{} ms économisées -->',
+        stats['hits'], stats['misses'], f"{stats['render_ms']:.2f}", f"{stats['saved_ms']:.2f}"
+    )
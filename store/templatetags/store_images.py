@@ -0,0 +1,45 @@
+"""
+Balises d'images responsives : <picture> avec srcset par format
+"""
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from store.images import FORMATS, MIME_TYPES
+
+register = template.Library()
+
+# Largeur de l'<img> de repli pour les navigateurs sans srcset
+FALLBACK_WIDTH = 640
+
+
+def render_picture(variants, url, fallback_url, alt, sizes, css_class):
+    fallback_format = FORMATS[-1]
+    if not variants or not variants.get(fallback_format):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy" decoding="async">',
+                           fallback_url, css_class, alt)
+
+    def srcset(fmt):
+        return ', '.join(f'{url(name)} {width}w' for width, name in variants[fmt])
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], srcset(fmt), sizes) for fmt in FORMATS[:-1] if variants.get(fmt))
+    )
+    candidates = [name for width, name in variants[fallback_format] if width <= FALLBACK_WIDTH]
+    src = url(candidates[-1] if candidates else variants[fallback_format][0][1])
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+        sources, src, srcset(fallback_format), sizes, css_class, alt
+    )
+
+
+@register.simple_tag
+def category_image(category, sizes='100vw', css_class='', alt=None):
+    """
+    Usage : {% category_image category sizes="(min-width: 992px) 16vw, 50vw" css_class="..." %}
+    """
+    return render_picture(
+        category.image_variants, default_storage.url, category.image.url if category.image else '',
+        category.name if alt is None else alt, sizes, css_class
+    )
@@ -1,3 +1,1593 @@
-from django.test import TestCase
+import base64
+import decimal
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import statistics
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.urls import resolve
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest import skipUnless
+
+from PIL import Image
+
+from . import cache as catalog_cache
+from . import documents
+from . import images
+from . import search
+from . import views
+from . import metrics
+from . import purge
+from .instrumentation import RequestMetrics
+from .loadtest import USER_PASSWORD, Recorder, VirtualUser
+from .models import Category, Product, CartItem, Order, OrderItem
+
+CHECKOUT_DATA = {
+    'email': 'client@example.com',
+    'first_name': 'Jean',
+    'last_name': 'Dupont',
+    'address': '1 rue du Commerce, Abidjan',
+}
+
+
+class CatalogTestCase(TestCase):
+    """
+    Catégorie 'Maison' et produit 'Lampe' (20.00, stock 5), créés comme une
+    écriture validée : les rappels transaction.on_commit (invalidation du
+    cache, fragments JSON) sont exécutés, ce que TestCase ne fait pas seul.
+    """
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Maison', slug='maison')
+            self.product = Product.objects.create(
+                title='Lampe', slug='lampe', description='Description',
+                price='20.00', stock=5, category=self.category
+            )
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Électronique', slug='electronique')
+        self.user = User.objects.create_user('acheteur', 'acheteur@example.com', 'motdepasse')
+        self.client.force_login(self.user)
+
+    def fill_cart(self, lines, stock=10, quantity=2):
+        start = Product.objects.count()
+        for i in range(start, start + lines):
+            product = Product.objects.create(
+                title=f'Produit {i}', slug=f'produit-{i}', description='Description',
+                price='10.00', stock=stock, category=self.category
+            )
+            CartItem.objects.create(
+                session_id=self.client.session.session_key, user=self.user,
+                product=product, quantity=quantity, price_snapshot=product.price
+            )
+
+    def checkout(self):
+        return self.client.post(
+            '/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json'
+        )
+
+    def test_checkout_creates_order_and_decrements_stock(self):
+        self.fill_cart(3)
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual(order.total, 60)
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+        self.assertEqual(list(Product.objects.values_list('stock', flat=True)), [8, 8, 8])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_insufficient_stock_rolls_back(self):
+        self.fill_cart(2, stock=1)
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(list(Product.objects.values_list('stock', flat=True)), [1, 1])
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        self.fill_cart(1)
+        # Première requête hors mesure : prolongation de session (LazySessionMiddleware)
+        self.client.get('/api/auth/status/')
+        with CaptureQueriesContext(connection) as small:
+            self.checkout()
+
+        self.fill_cart(20)
+        with CaptureQueriesContext(connection) as large:
+            self.checkout()
+
+        self.assertEqual(len(small), len(large))
+
+
+@override_settings(CART_ENGINE='store.cart.SessionCart')
+class SessionCartTests(CatalogTestCase):
+    def add_to_cart(self, quantity=1):
+        return self.client.post(
+            '/api/cart/add/', json.dumps({'product_id': self.product.id, 'quantity': quantity}),
+            content_type='application/json'
+        )
+
+    def test_anonymous_cart_stays_in_session(self):
+        self.add_to_cart(2)
+        self.add_to_cart(1)
+
+        self.assertFalse(CartItem.objects.exists())
+        cart = self.client.get('/api/cart/').json()
+        self.assertEqual(cart['items'][0]['quantity'], 3)
+        self.assertEqual(cart['total'], 60)
+
+    def test_cart_is_persisted_on_login(self):
+        self.add_to_cart(2)
+        user = User.objects.create_user('client', 'client@example.com', 'motdepasse')
+        self.client.post(
+            '/api/auth/login/', json.dumps({'username': 'client', 'password': 'motdepasse'}),
+            content_type='application/json'
+        )
+
+        item = CartItem.objects.get()
+        self.assertEqual((item.user, item.quantity), (user, 2))
+        self.assertEqual(self.client.get('/api/cart/').json()['item_count'], 1)
+
+    def test_anonymous_checkout_persists_then_orders(self):
+        self.add_to_cart(2)
+        response = self.client.post(
+            '/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.get('/api/cart/').json()['item_count'], 0)
+
+    def test_anonymous_additions_do_not_write_to_the_database(self):
+        self.add_to_cart(1)  # crée la session et le jeton du panier
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(4):
+                self.assertEqual(self.add_to_cart(1).status_code, 200)
+        writes = [query['sql'] for query in ctx.captured_queries
+                  if query['sql'].split(' ', 1)[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+        self.assertEqual(self.client.get('/api/cart/').json()['items'][0]['quantity'], 5)
+
+    def test_legacy_anonymous_rows_are_not_ordered(self):
+        self.add_to_cart(1)
+        other = Product.objects.create(
+            title='Vase', slug='vase', description='Description',
+            price='5.00', stock=5, category=self.product.category
+        )
+        # Ligne anonyme laissée en base par l'ancien stockage : invisible dans le panier
+        CartItem.objects.create(session_id=self.client.session.session_key, product=other,
+                                quantity=3, price_snapshot=other.price)
+        self.assertEqual(self.client.get('/api/cart/').json()['item_count'], 1)
+
+        response = self.client.post(
+            '/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(OrderItem.objects.values_list('product_id', 'quantity')), [(self.product.id, 1)])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_deleted_products_are_dropped_when_persisting(self):
+        other = Product.objects.create(
+            title='Vase', slug='vase', description='Description',
+            price='5.00', stock=5, category=self.product.category
+        )
+        self.add_to_cart(2)
+        self.client.post(
+            '/api/cart/add/', json.dumps({'product_id': other.id, 'quantity': 1}), content_type='application/json'
+        )
+        other.delete()
+
+        response = self.client.post(
+            '/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(OrderItem.objects.values_list('product_id', 'quantity')), [(self.product.id, 2)])
+
+    def test_deleted_products_are_dropped_on_login(self):
+        self.add_to_cart(1)
+        self.product.delete()
+        User.objects.create_user('client', 'client@example.com', 'motdepasse')
+        response = self.client.post(
+            '/api/auth/login/', json.dumps({'username': 'client', 'password': 'motdepasse'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maison', slug='maison')
+        self.products = [
+            Product.objects.create(
+                title=f'Produit {i}', slug=f'produit-{i}', description='Description',
+                price='10.00', stock=5, category=category
+            )
+            for i in range(3)
+        ]
+
+    def batch(self, operations):
+        return self.client.post(
+            '/api/cart/batch/', json.dumps({'operations': operations}), content_type='application/json'
+        )
+
+    def test_batch_applies_all_operations(self):
+        first, second, third = self.products
+        self.batch([{'op': 'add', 'product_id': p.id, 'quantity': 2} for p in (first, second)])
+        response = self.batch([
+            {'op': 'set', 'product_id': first.id, 'quantity': 4},
+            {'op': 'remove', 'product_id': second.id},
+            {'op': 'add', 'product_id': third.id},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        quantities = {item['product']['id']: item['quantity'] for item in response.json()['items']}
+        self.assertEqual(quantities, {first.id: 4, third.id: 1})
+        self.assertEqual(response.json()['total'], 50)
+
+    def test_batch_is_all_or_nothing(self):
+        first, second, _ = self.products
+        self.batch([{'op': 'add', 'product_id': first.id}])
+        response = self.batch([
+            {'op': 'set', 'product_id': first.id, 'quantity': 3},
+            {'op': 'add', 'product_id': second.id, 'quantity': 6},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        items = self.client.get('/api/cart/').json()['items']
+        self.assertEqual([(item['product']['id'], item['quantity']) for item in items], [(first.id, 1)])
+
+
+class LazySessionTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Crée la session avec un panier
+        self.client.post(
+            '/api/cart/add/', json.dumps({'product_id': self.product.id, 'quantity': 1}),
+            content_type='application/json'
+        )
+
+    def session_writes(self, requests=5):
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(requests):
+                self.client.get('/api/cart/')
+        return sum(
+            1 for query in ctx.captured_queries
+            if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')
+        )
+
+    def test_read_only_requests_do_not_write_session(self):
+        self.assertEqual(self.session_writes(), 0)
+
+    @override_settings(SESSION_REFRESH_THRESHOLD=10 ** 9)
+    def test_session_is_refreshed_below_threshold(self):
+        self.assertEqual(self.session_writes(), 5)
+
+
+class CatalogCacheTests(CatalogTestCase):
+    def product_names(self, query=''):
+        return [product['name'] for product in self.client.get(f'/api/products/{query}').json()['results']]
+
+    def category_names(self):
+        return [category['name'] for category in self.client.get('/api/categories/').json()['categories']]
+
+    def test_key_uses_the_values_seen_by_the_view(self):
+        # 'maison ' ne correspond à aucune catégorie : sa réponse vide ne doit
+        # pas être servie pour 'maison'
+        self.assertEqual(self.product_names('?category=maison%20'), [])
+        self.assertEqual(self.product_names('?category=maison'), ['Lampe'])
+
+    def test_product_changes_invalidate_product_list(self):
+        self.assertEqual(self.product_names(), ['Lampe'])
+        version = catalog_cache.get_catalog_version()
+
+        self.product.title = 'Lampe LED'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertGreater(catalog_cache.get_catalog_version(), version)
+        self.assertEqual(self.product_names(), ['Lampe LED'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.product_names(), [])
+
+    def test_checkout_only_invalidates_stock_entries(self):
+        self.assertEqual(self.client.get('/api/products/lampe/').json()['stock'], 5)
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['stock'], 5)
+        self.category_names()
+        version = catalog_cache.get_catalog_version()
+
+        self.client.post('/api/cart/add/', json.dumps({'product_id': self.product.id, 'quantity': 2}),
+                         content_type='application/json')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(catalog_cache.get_catalog_version(), version)
+        self.assertIsNotNone(catalog_cache.get_cache().get(catalog_cache.catalog_key('api_categories', {})))
+        self.assertEqual(self.client.get('/api/products/lampe/').json()['stock'], 3)
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['stock'], 3)
+
+    def test_invalidation_waits_for_commit(self):
+        # Avant la validation, une requête concurrente remettrait en cache
+        # l'ancien état sous la nouvelle version
+        version = catalog_cache.get_catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.title = 'Lampe LED'
+            self.product.save()
+            self.category.save()
+            Product.objects.create(title='Vase', slug='vase', price=5, stock=1, category=self.category)
+            self.product.delete()
+            self.assertEqual(catalog_cache.get_catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog_cache.get_catalog_version(), version)
+
+    def test_category_changes_invalidate_categories_and_product_list(self):
+        self.assertEqual(self.product_names(), ['Lampe'])
+        self.assertEqual(self.category_names(), ['Maison'])
+
+        self.category.name = 'Intérieur'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(self.category_names(), ['Intérieur'])
+        self.assertEqual(
+            self.client.get('/api/products/').json()['results'][0]['category']['name'], 'Intérieur'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(self.category_names(), [])
+        self.assertEqual(self.product_names(), [])
+
+    def test_category_changes_invalidate_index(self):
+        self.assertContains(self.client.get('/'), 'Maison')
+        self.category.name = 'Intérieur'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get('/')
+        self.assertContains(response, 'Intérieur')
+        self.assertNotContains(response, 'Maison')
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Maison', slug='maison')
+
+    def test_fragments_are_invalidated_by_catalog_changes(self):
+        self.assertContains(self.client.get('/'), 'Maison')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Jardin', slug='jardin')
+        self.assertContains(self.client.get('/'), 'Jardin')
+
+    @override_settings(CATALOG_FRAGMENT_DEBUG=True)
+    def test_debug_report_counts_hits_and_misses(self):
+        self.assertContains(self.client.get('/'), 'cache de fragments : 0 succès, 5 échecs')
+        self.assertContains(self.client.get('/'), 'cache de fragments : 5 succès, 0 échecs')
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Maison', slug='maison')
+            for i in range(3):
+                Product.objects.create(title=f'Lampe {i}', slug=f'lampe-{i}', price=10, stock=5, category=category)
+
+    def timings(self, response):
+        return {
+            entry.split(';')[0]: entry for entry in response.headers['Server-Timing'].split(', ')
+        }
+
+    def test_header_reports_sql_view_and_templates(self):
+        timings = self.timings(self.client.get('/products/'))
+        self.assertEqual(set(timings), {'sql', 'view', 'template', 'total'})
+        timings = self.timings(self.client.get('/api/products/'))
+        self.assertRegex(timings['sql'], r'^sql;desc="[1-9]\d* queries";dur=[\d.]+$')
+        self.assertNotIn('template', timings)
+
+    def test_session_save_is_measured(self):
+        product = Product.objects.first()
+        response = self.client.post('/api/cart/add/', json.dumps({'product_id': product.id}),
+                                    content_type='application/json')
+        self.assertIn('session', self.timings(response))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_log_lists_duplicated_sql(self):
+        with self.assertLogs('store.performance', 'WARNING') as logs:
+            self.client.get('/api/products/')
+        record = json.loads(logs.records[0].getMessage().split(' ', 1)[1])
+        self.assertEqual(record['view'], 'store:api_products')
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn('duplicated_sql', record)
+
+    def test_duplicated_statements_are_grouped(self):
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics.execute_wrapper):
+            for product in Product.objects.all():
+                product.category.name
+        self.assertEqual(metrics.duplicated_statements()[0][1], 3)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/products/').headers)
+
+    def test_header_is_off_without_setting(self):
+        with self.settings():
+            del settings.SERVER_TIMING_HEADER
+            self.assertNotIn('Server-Timing', self.client.get('/api/products/').headers)
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mode = Category.objects.create(name='Mode', slug='mode')
+            maison = Category.objects.create(name='Maison', slug='maison')
+            for i, (category, price) in enumerate([(mode, 8), (mode, 30), (mode, 2000), (maison, 30), (maison, 60)]):
+                Product.objects.create(title=f'Article {i}', slug=f'article-{i}', description='Article',
+                                       price=price, stock=1, category=category)
+            Product.objects.create(title='Archivé', slug='archive', description='Article', price=30,
+                                   stock=1, category=mode, is_active=False)
+
+    def facets(self, query=''):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(f'/api/facets/{query}').json()
+        grouped = [q for q in ctx.captured_queries if 'GROUP BY' in q['sql']]
+        return data, grouped
+
+    def counts(self, data):
+        categories = {category['slug']: category['count'] for category in data['categories']}
+        buckets = {bucket['min_price']: bucket['count'] for bucket in data['price_buckets'] if bucket['count']}
+        return data['count'], categories, buckets
+
+    def test_counts_in_one_grouped_query(self):
+        data, grouped = self.facets()
+        self.assertEqual(len(grouped), 1)
+        self.assertEqual(self.counts(data), (5, {'mode': 3, 'maison': 2}, {0: 1, 25: 2, 50: 1, 1000: 1}))
+        self.assertEqual(data['price_buckets'][-1], {'min_price': 1000, 'max_price': None, 'count': 1})
+
+    def test_each_facet_ignores_its_own_filter(self):
+        data, _ = self.facets('?category=mode&min_price=25&max_price=100')
+        # Catégories : filtre de prix appliqué ; tranches : filtre de catégorie appliqué
+        self.assertEqual(self.counts(data), (1, {'mode': 1, 'maison': 2}, {0: 1, 25: 1, 1000: 1}))
+
+    def test_results_are_cached_per_filter_signature(self):
+        self.facets('?max_price=50')
+        _, grouped = self.facets('?max_price=50')
+        self.assertEqual(grouped, [])
+        _, grouped = self.facets('?max_price=60')
+        self.assertEqual(len(grouped), 1)
+
+    def test_route_does_not_shadow_product_slugs(self):
+        Product.objects.create(title='Facettes', slug='facets', description='Article', price=5,
+                               stock=1, category=Category.objects.get(slug='mode'))
+        self.assertEqual(self.client.get('/api/products/facets/').json()['slug'], 'facets')
+        self.assertIn('categories', self.client.get('/api/facets/').json())
+
+
+class ProductDocumentTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Maison', slug='maison')
+            for i in range(3):
+                Product.objects.create(title=f'Lampe {i}', slug=f'lampe-{i}', description='Lampe ' * 60,
+                                       price='19.90', stock=5, image_url='https://example.com/l.jpg' if i else '',
+                                       category=self.category)
+
+    def test_spliced_responses_match_json_response(self):
+        products = list(Product.objects.filter(is_active=True).select_related('category'))
+        expected = JsonResponse({
+            'count': 3,
+            'results': [documents.product_list_data(product) for product in products],
+            'pagination': {'current_page': 1, 'total_pages': 1, 'has_next': False, 'has_previous': False},
+        }).content
+        self.assertEqual(self.client.get('/api/products/').content, expected)
+        self.assertEqual(
+            self.client.get('/api/products/lampe-1/').content,
+            JsonResponse(documents.product_detail_data(products[1])).content,
+        )
+
+    def test_writes_outside_save_refresh_documents(self):
+        self.client.get('/api/products/')
+        # Décrément de stock de la commande : update() sans signal, updated_at changé
+        Product.objects.filter(slug='lampe-0').update(stock=0, updated_at=timezone.now())
+        self.category.name = 'Luminaires'
+        self.category.save()
+        catalog_cache.bump_catalog_version()
+        results = {p['slug']: p for p in self.client.get('/api/products/').json()['results']}
+        self.assertEqual((results['lampe-0']['stock'], results['lampe-0']['is_in_stock']), (0, False))
+        self.assertEqual({p['category']['name'] for p in results.values()}, {'Luminaires'})
+
+    def test_saves_write_fragments_to_the_shared_cache(self):
+        products = list(Product.objects.filter(is_active=True).select_related('category'))
+        keys = [documents.document_key(documents.LIST, product) for product in products]
+        self.assertEqual(set(documents.get_cache().get_many(keys)), set(keys))
+        # La liste lit les fragments du cache, sans les réencoder
+        documents.get_cache().set(keys[0], '{"id": 0}')
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0], {'id': 0})
+
+        self.category.name = 'Luminaires'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        product = Product.objects.select_related('category').get(slug='lampe-0')
+        fragment = documents.get_cache().get(documents.document_key(documents.DETAIL, product))
+        self.assertEqual(json.loads(fragment)['category']['name'], 'Luminaires')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 (SQLite) requis')
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Maison', slug='maison')
+            self.product = Product.objects.create(title='Lampe', slug='lampe', description='Pied en bois',
+                                                  price=10, stock=1, category=self.category)
+
+    def indexed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid, title, description, category_name FROM {search.FTS_TABLE} ORDER BY rowid')
+            return cursor.fetchall()
+
+    def matches(self, q):
+        return list(search.search_products(Product.objects.all(), q).values_list('slug', flat=True))
+
+    def test_index_follows_product_writes(self):
+        self.assertEqual(self.indexed(), [(self.product.pk, 'Lampe', 'Pied en bois', 'Maison')])
+
+        self.product.title = 'Applique'
+        self.product.save()
+        self.assertEqual(self.matches('lampe'), [])
+        self.assertEqual(self.matches('appli'), ['lampe'])
+
+        self.product.delete()
+        self.assertEqual(self.indexed(), [])
+
+    def test_category_rename_is_propagated(self):
+        self.category.name = 'Luminaires'
+        self.category.save()
+        self.assertEqual(self.indexed()[0][3], 'Luminaires')
+        self.assertEqual(self.matches('luminaires'), ['lampe'])
+        self.assertEqual(self.matches('maison'), [])
+
+    def test_title_match_ranks_above_description_match(self):
+        Product.objects.create(title='Vase', slug='vase', description='Se marie avec une lampe',
+                               price=10, stock=1, category=self.category)
+        Product.objects.create(title='Tapis', slug='tapis', description='Laine',
+                               price=10, stock=1, category=self.category)
+        self.assertEqual(self.matches('lampe'), ['lampe', 'vase'])
+
+    def test_rebuild_search_index_starts_from_scratch(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+            cursor.execute(
+                f"INSERT INTO {search.FTS_TABLE} (rowid, title, description, category_name) "
+                f"VALUES (9999, 'Fantôme', '', '')"
+            )
+        # Écriture hors signaux : l'index n'est pas tenu à jour
+        Product.objects.filter(pk=self.product.pk).update(title='Lanterne')
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('1 produits indexés', out.getvalue())
+        self.assertEqual(self.indexed(), [(self.product.pk, 'Lanterne', 'Pied en bois', 'Maison')])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Maison', slug='maison')
+            for i in range(5):
+                Product.objects.create(title=f'Article {i}', slug=f'article-{i}', description='Objet',
+                                       price=10, stock=1, category=category)
+            # Trois produits créés au même instant : départagés par l'id
+            Product.objects.filter(slug__in=['article-1', 'article-2', 'article-3']).update(
+                created_at=Product.objects.get(slug='article-2').created_at
+            )
+            self.expected = list(Product.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def page(self, query):
+        response = self.client.get(f'/api/products/?page_size=2&{query}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [product['id'] for product in data['results']], data['pagination']
+
+    def walk(self, query=''):
+        """Parcourt la liste en avant puis en arrière ; retourne les deux ordres obtenus"""
+        pages = []
+        ids, pagination = self.page(f'{query}&cursor=')
+        self.assertFalse(pagination['has_previous'])
+        pages.append(ids)
+        while pagination['next_cursor']:
+            ids, pagination = self.page(f"{query}&cursor={pagination['next_cursor']}")
+            pages.append(ids)
+        self.assertFalse(pagination['has_next'])
+
+        backwards = [ids]
+        while pagination['previous_cursor']:
+            ids, pagination = self.page(f"{query}&cursor={pagination['previous_cursor']}")
+            backwards.append(ids)
+        self.assertFalse(pagination['has_previous'])
+        return [pk for ids in pages for pk in ids], [pk for ids in reversed(backwards) for pk in ids]
+
+    def test_next_and_previous_round_trip_with_created_at_ties(self):
+        forward, backward = self.walk()
+        self.assertEqual(forward, self.expected)
+        self.assertEqual(backward, self.expected)
+
+    def test_malformed_cursors_are_rejected(self):
+        def encode(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode()
+
+        for cursor in ['%%%', encode('n|hier|1'), encode('x|2025-01-01T00:00:00|1'), encode('n|rnan|1'),
+                       encode('n|r-1.5|1')]:
+            response = self.client.get(f'/api/products/?cursor={cursor}')
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.json(), {'error': 'Curseur invalide'})
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 (SQLite) requis')
+    def test_search_results_stay_ranked(self):
+        category = Category.objects.get()
+        Product.objects.create(title='Lampe', slug='lampe', description='Objet',
+                               price=10, stock=1, category=category)
+        Product.objects.create(title='Vase', slug='vase', description='Lampe et vase',
+                               price=10, stock=1, category=category)
+        Product.objects.create(title='Lampe de bureau', slug='lampe-bureau', description='Lampe de bureau',
+                               price=10, stock=1, category=category)
+        ranked = [product['id'] for product in self.client.get('/api/products/?q=lampe').json()['results']]
+
+        forward, backward = self.walk('q=lampe')
+        self.assertEqual(forward, ranked)
+        self.assertEqual(backward, ranked)
+        self.assertEqual(Product.objects.get(pk=forward[-1]).slug, 'vase')
+
+        # Un curseur de liste chronologique ne s'applique pas à une recherche
+        _, pagination = self.page('cursor=')
+        response = self.client.get(f"/api/products/?q=lampe&cursor={pagination['next_cursor']}")
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Maison', slug='maison')
+            for i in range(3):
+                Product.objects.create(title=f'Lampe {i}', slug=f'lampe-{i}', description='Lampe ' * 60,
+                                       price='19.90', stock=i, category=category)
+
+    def test_limit_and_page_size_are_capped(self):
+        data = self.client.get('/api/products/?limit=2').json()
+        self.assertEqual((len(data['results']), data['pagination']['total_pages']), (2, 2))
+        data = self.client.get('/api/products/?page_size=1&cursor=').json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertTrue(data['pagination']['has_next'])
+        self.assertEqual(views.page_size({'page_size': '100000'}), views.MAX_PAGE_SIZE)
+        self.assertEqual(views.page_size({'limit': 'abc'}), views.DEFAULT_PAGE_SIZE)
+
+    def test_fields_are_projected_in_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/products/?fields=price,id,description,is_in_stock').json()
+        page_sql = ctx.captured_queries[-1]['sql']
+        full = self.client.get('/api/products/').json()['results']
+        self.assertEqual(data['results'], [
+            {key: product[key] for key in ('id', 'description', 'price', 'is_in_stock')} for product in full
+        ])
+        self.assertTrue(data['results'][0]['description'].endswith('...'))
+        # Description lue seulement tronquée, dans SUBSTR(...)
+        self.assertRegex(page_sql, r'SUBSTR\w*\("store_product"\."description", 1, 201\)')
+        self.assertEqual(page_sql.count('"store_product"."description"'), 1)
+        self.assertNotIn('store_category', page_sql)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/products/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Champ inconnu : secret'})
+
+
+class InitialStateTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            maison = Category.objects.create(name='Maison', slug='maison')
+            mode = Category.objects.create(name='Mode', slug='mode')
+            for i in range(6):
+                Product.objects.create(title=f'Lampe {i}', slug=f'lampe-{i}', description='Lampe',
+                                       price=10, stock=5, category=maison)
+            Product.objects.create(title='Robe', slug='robe', description='Robe', price=30, stock=5, category=mode)
+
+    def initial_state(self, path):
+        content = self.client.get(path).content.decode()
+        match = re.search(r'<script id="initial-state" type="application/json">(.*?)</script>', content, re.S)
+        return json.loads(match.group(1))
+
+    def test_product_page_embeds_product_related_and_cart(self):
+        lamp = Product.objects.get(slug='lampe-0')
+        self.client.post('/api/cart/add/', json.dumps({'product_id': lamp.id, 'quantity': 2}),
+                         content_type='application/json')
+        state = self.initial_state('/product/lampe-0/')
+        self.assertEqual(state['product'], self.client.get('/api/products/lampe-0/').json())
+        self.assertEqual(len(state['related']), 4)
+        self.assertTrue(all(p['category']['slug'] == 'maison' and p['slug'] != 'lampe-0' for p in state['related']))
+        self.assertEqual(state['cart'], self.client.get('/api/cart/').json())
+        self.assertEqual(state['cart']['items'][0]['quantity'], 2)
+
+    def test_cart_page_embeds_cart(self):
+        self.assertEqual(self.initial_state('/cart/')['cart'], {'items': [], 'total': 0.0, 'item_count': 0})
+
+
+class BootstrapTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            maison = Category.objects.create(name='Maison', slug='maison')
+            Category.objects.create(name='Vide', slug='vide')
+            self.lamp = Product.objects.create(title='Lampe', slug='lampe', price='19.90', stock=10, category=maison)
+            self.user = User.objects.create_user('client', 'client@example.com', 'motdepasse')
+
+    def bootstrap(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/bootstrap/').json()
+        return data, len(ctx)
+
+    def add(self, quantity):
+        self.client.post('/api/cart/add/', json.dumps({'product_id': self.lamp.id, 'quantity': quantity}),
+                         content_type='application/json')
+
+    def test_anonymous_state_and_category_nav(self):
+        data, _ = self.bootstrap()
+        self.assertEqual(data, {
+            'isAuthenticated': False,
+            'cart': {'item_count': 0, 'quantity': 0, 'total': 0.0},
+            'categories': [{'name': 'Maison', 'slug': 'maison', 'product_count': 1}],
+        })
+
+    def test_cart_summary_is_cached_per_session_and_refreshed_on_change(self):
+        self.add(2)
+        data, queries = self.bootstrap()
+        self.assertEqual(data['cart'], {'item_count': 1, 'quantity': 2, 'total': 39.8})
+        self.assertEqual(data['cart']['total'], self.client.get('/api/cart/').json()['total'])
+        self.assertEqual(self.bootstrap(), (data, 0))
+        self.add(1)
+        self.assertEqual(self.bootstrap()[0]['cart']['quantity'], 3)
+
+    def test_authenticated_user_and_database_cart(self):
+        self.add(1)
+        self.client.login(username='client', password='motdepasse')
+        data, _ = self.bootstrap()
+        self.assertEqual(data['user']['username'], 'client')
+        self.assertEqual(data['cart'], {'item_count': 1, 'quantity': 1, 'total': 19.9})
+        self.add(3)
+        self.assertEqual(self.bootstrap()[0]['cart']['quantity'], 4)
+
+
+class ConditionalRequestTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.newer = Product.objects.create(title='Vase', slug='vase', description='Vase',
+                                                price=10, stock=1, category=self.category)
+
+    def test_product_detail_validators(self):
+        response = self.client.get('/api/products/lampe/')
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        self.assertEqual(response.json()['slug'], 'lampe')
+
+        response = self.client.get('/api/products/lampe/', headers={'If-None-Match': etag})
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        response = self.client.get('/api/products/lampe/', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+        # Un autre produit a son propre ETag
+        self.assertNotEqual(self.client.get('/api/products/vase/').headers['ETag'], etag)
+
+        self.product.price = 12
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        response = self.client.get('/api/products/lampe/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        # Le nom de la catégorie fait partie du document
+        etag = response.headers['ETag']
+        self.category.name = 'Intérieur'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get('/api/products/lampe/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['category']['name'], 'Intérieur')
+
+    def test_unknown_product_has_no_validators(self):
+        response = self.client.get('/api/products/inconnu/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_catalog_etag_changes_when_an_older_product_is_deleted(self):
+        response = self.client.get('/api/products/')
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/api/categories/').headers['ETag'], etag)
+        for url in ('/api/products/', '/api/categories/', '/api/facets/'):
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304, url)
+        self.assertEqual(
+            self.client.get('/api/products/', headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code,
+            304
+        )
+
+        # MAX(updated_at) inchangé : seul le COUNT voit la suppression
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        response = self.client.get('/api/products/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual([product['name'] for product in response.json()['results']], ['Vase'])
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Maison', slug='maison')
+            self.products = [
+                Product.objects.create(title=f'Lampe {i}', slug=f'lampe-{i}', description='Lampe de bureau',
+                                       price=10 + i, stock=5, category=category)
+                for i in range(3)
+            ]
+            self.user = User.objects.create_user('async', 'async@example.com', 'motdepasse')
+
+    def test_middleware_chain_needs_no_adaptation(self):
+        records = []
+        handler = logging.Handler(logging.DEBUG)
+        handler.emit = records.append
+        logger = logging.getLogger('django.request')
+        logger.addHandler(handler)
+        level, logger.level = logger.level, logging.DEBUG
+        try:
+            with override_settings(DEBUG=True):
+                ASGIHandler()
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+        adapted = [r.getMessage() for r in records if 'adapted for middleware' in r.getMessage()]
+        self.assertEqual(adapted, [])
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    async def test_catalog_reads(self):
+        response = await self.async_client.get('/api/products/?q=lampe')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertRegex(response.headers['Server-Timing'], r'^sql;desc="[1-9]\d* queries"')
+
+        cursor_page = (await self.async_client.get('/api/products/?cursor=')).json()
+        self.assertEqual(len(cursor_page['results']), 3)
+        self.assertFalse(cursor_page['pagination']['has_next'])
+
+        etag = response.headers['ETag']
+        response = await self.async_client.get('/api/products/?q=lampe', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get('/api/products/lampe-1/')
+        self.assertEqual(response.json()['slug'], 'lampe-1')
+        response = await self.async_client.get('/api/products/inconnu/')
+        self.assertEqual(response.status_code, 404)
+
+        categories = (await self.async_client.get('/api/categories/')).json()['categories']
+        self.assertEqual([c['slug'] for c in categories], ['maison'])
+
+    async def test_session_and_user_carts(self):
+        product = self.products[0]
+        await self.async_client.post('/api/cart/add/', {'product_id': product.id, 'quantity': 2},
+                                     content_type='application/json')
+        cart = (await self.async_client.get('/api/cart/')).json()
+        self.assertEqual([(i['product']['id'], i['quantity']) for i in cart['items']], [(product.id, 2)])
+        self.assertFalse((await self.async_client.get('/api/auth/status/')).json()['isAuthenticated'])
+
+        await self.async_client.aforce_login(self.user)
+        status = (await self.async_client.get('/api/auth/status/')).json()
+        self.assertEqual(status['user']['username'], 'async')
+        cart = (await self.async_client.get('/api/cart/')).json()
+        self.assertEqual(cart['items'][0]['quantity'], 2)
+
+
+@override_settings(METRICS_TOKEN='jeton-de-test')
+class MetricsTests(CatalogTestCase):
+    def sample(self, text, line):
+        for row in text.splitlines():
+            if row.startswith(line + ' '):
+                return float(row.rsplit(' ', 1)[1])
+        return 0
+
+    def scrape(self):
+        response = self.client.get('/internal/metrics', headers={'Authorization': 'Bearer jeton-de-test'})
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_cart_and_checkout_metrics(self):
+        requests_line = 'store_http_requests_total{method="GET",status="200",view="store:api_products"}'
+        before = self.scrape()
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+        self.client.post('/api/cart/add/', json.dumps({'product_id': self.product.id, 'quantity': 2}),
+                         content_type='application/json')
+        self.client.post('/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json')
+        after = self.scrape()
+
+        def delta(line):
+            return self.sample(after, line) - self.sample(before, line)
+
+        self.assertEqual(delta(requests_line), 2)
+        self.assertEqual(delta('store_http_request_duration_seconds_count{view="store:api_products"}'), 2)
+        self.assertEqual(delta('store_http_request_duration_seconds_bucket{view="store:api_products",le="+Inf"}'), 2)
+        self.assertEqual(delta('store_cache_lookups_total{cache="view",result="hit"}'), 1)
+        self.assertEqual(delta('store_cart_additions_total{source="add"}'), 2)
+        self.assertEqual(delta('store_checkouts_total{result="success"}'), 1)
+        self.assertEqual(delta('store_order_total_sum'), 40)
+        self.assertIn('# TYPE store_db_queries_per_request histogram', after)
+        self.assertIn('store_cache_hit_ratio{cache="view"}', after)
+
+    def test_endpoint_requires_token_or_staff(self):
+        # Derrière un proxy inverse, tous les clients arrivent de 127.0.0.1
+        self.assertEqual(self.client.get('/internal/metrics', REMOTE_ADDR='127.0.0.1').status_code, 404)
+        for header in ('Bearer autre-jeton', 'Basic jeton-de-test', 'Bearer '):
+            response = self.client.get('/internal/metrics', headers={'Authorization': header})
+            self.assertEqual(response.status_code, 404, header)
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get('/internal/metrics', headers={'Authorization': 'Bearer '})
+            self.assertEqual(response.status_code, 404)
+
+        self.client.force_login(User.objects.create_user('client', password='secret'))
+        self.assertEqual(self.client.get('/internal/metrics').status_code, 404)
+        self.client.force_login(User.objects.create_user('equipe', password='secret', is_staff=True))
+        self.assertEqual(self.client.get('/internal/metrics').status_code, 200)
+
+    def test_values_are_summed_across_processes(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            # Fichier d'un autre worker, assez rempli pour agrandir la projection
+            other = metrics.MmapValues(os.path.join(directory, '99999.db'))
+            for i in range(2000):
+                other.add(metrics._key('store_checkouts_total', {'result': f'r{i}'}), 1)
+            other.add(metrics._key('store_checkouts_total', {'result': 'success'}), 3)
+            other.map.close()
+            metrics.CHECKOUTS.inc(result='success')
+            metrics.CHECKOUTS.inc(result='success')
+
+            text = metrics.render()
+            self.assertEqual(self.sample(text, 'store_checkouts_total{result="success"}'), 5)
+            self.assertEqual(self.sample(text, 'store_checkouts_total{result="r1999"}'), 1)
+            # Réouverture : les positions sont relues depuis le fichier
+            reopened = metrics.MmapValues(os.path.join(directory, '99999.db'))
+            reopened.add(metrics._key('store_checkouts_total', {'result': 'success'}), 1)
+            self.assertEqual(self.sample(metrics.render(), 'store_checkouts_total{result="success"}'), 6)
+            reopened.map.close()
+
+
+class PurgeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        Session.objects.create(session_key='live', session_data='', expire_date=now + timedelta(days=1))
+        Session.objects.create(session_key='expired', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='expired2', session_data='', expire_date=now - timedelta(days=1))
+        self.user = User.objects.create_user(username='client', password='secret')
+        for session_id, user in [('live', None), ('expired', None), ('gone', None), ('gone2', None), ('expired2', self.user)]:
+            CartItem.objects.create(
+                session_id=session_id, user=user, product=self.product, quantity=1, price_snapshot=self.product.price
+            )
+        CartItem.objects.update(updated_at=now - timedelta(hours=2))
+
+    def test_purge_removes_abandoned_anonymous_carts_and_expired_sessions(self):
+        result = purge.purge(batch_size=1)
+
+        self.assertEqual((result['cart_items'], result['sessions']), (3, 2))
+        self.assertEqual(
+            set(CartItem.objects.values_list('session_id', 'user')), {('live', None), ('expired2', self.user.id)}
+        )
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+    def test_recent_rows_are_kept(self):
+        CartItem.objects.filter(session_id='gone').update(updated_at=timezone.now())
+        self.assertEqual(purge.purge()['cart_items'], 2)
+        self.assertTrue(CartItem.objects.filter(session_id='gone').exists())
+
+    def test_command_reports_counts_and_dry_run_deletes_nothing(self):
+        out = StringIO()
+        call_command('purge_carts', '--dry-run', stdout=out)
+        self.assertIn('3 ligne(s) de panier et 2 session(s) à supprimer', out.getvalue())
+        self.assertEqual(CartItem.objects.count(), 5)
+
+        out = StringIO()
+        call_command('purge_carts', '--batch-size', '2', stdout=out)
+        self.assertIn('3 ligne(s) de panier et 2 session(s) supprimée(s) en ', out.getvalue())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+
+class CategoryCounterTests(TestCase):
+    def setUp(self):
+        self.maison = Category.objects.create(name='Maison', slug='maison')
+        self.jardin = Category.objects.create(name='Jardin', slug='jardin')
+
+    def create_product(self, slug, **kwargs):
+        return Product.objects.create(
+            title=slug, slug=slug, description='Description', price='10.00', stock=1,
+            category=kwargs.pop('category', self.maison), **kwargs
+        )
+
+    def counts(self):
+        return dict(Category.objects.values_list('slug', 'active_product_count'))
+
+    def test_create_and_delete(self):
+        lampe = self.create_product('lampe')
+        self.create_product('vase')
+        self.create_product('brouillon', is_active=False)
+        self.assertEqual(self.counts(), {'maison': 2, 'jardin': 0})
+
+        lampe.delete()
+        Product.objects.get(slug='brouillon').delete()
+        self.assertEqual(self.counts(), {'maison': 1, 'jardin': 0})
+
+    def test_move_to_another_category(self):
+        lampe = self.create_product('lampe')
+        lampe.category = self.jardin
+        lampe.save()
+        self.assertEqual(self.counts(), {'maison': 0, 'jardin': 1})
+
+        lampe.is_active = False
+        lampe.category = self.maison
+        lampe.save()
+        self.assertEqual(self.counts(), {'maison': 0, 'jardin': 0})
+
+    def test_toggle_is_active(self):
+        lampe = self.create_product('lampe')
+        lampe.is_active = False
+        lampe.save()
+        self.assertEqual(self.counts()['maison'], 0)
+        lampe.save()
+        self.assertEqual(self.counts()['maison'], 0)
+        lampe.is_active = True
+        lampe.save()
+        self.assertEqual(self.counts()['maison'], 1)
+
+    def test_saving_a_stale_category_keeps_its_counter(self):
+        self.create_product('lampe')
+        self.maison.name = 'Intérieur'
+        self.maison.save()
+        self.assertEqual(self.counts()['maison'], 1)
+        # L'instance relit le compteur en base au lieu de garder sa valeur périmée
+        self.assertEqual(self.maison.active_product_count, 1)
+
+        # Suppression en cascade des produits puis de la catégorie
+        self.maison.delete()
+        self.assertFalse(Product.objects.exists())
+
+    def test_recount_categories_fixes_drift(self):
+        self.create_product('lampe')
+        self.create_product('rosier', category=self.jardin)
+        Category.objects.filter(slug='maison').update(active_product_count=7)
+        version = catalog_cache.get_catalog_version()
+
+        out = StringIO()
+        call_command('recount_categories', stdout=out)
+        self.assertIn('1 catégorie(s) corrigée(s)', out.getvalue())
+        self.assertEqual(self.counts(), {'maison': 1, 'jardin': 1})
+        self.assertGreater(catalog_cache.get_catalog_version(), version)
+
+        out = StringIO()
+        call_command('recount_categories', stdout=out)
+        self.assertIn('0 catégorie(s) corrigée(s)', out.getvalue())
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Maison', slug='maison')
+
+    def import_csv(self, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        call_command('import_catalog', f.name, *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_import_upserts_by_slug(self):
+        Product.objects.create(
+            title='Lampe', slug='lampe', description='Ancienne', price='20.00', stock=1, category=self.category
+        )
+        created_at = Product.objects.get().created_at
+        self.import_csv(
+            'slug,title,price,stock,category\n'
+            'lampe,Lampe LED,25.50,4,maison\n'
+            'coussin,Coussin,9.99,10,maison\n'
+            'tapis,Tapis,prix,3,maison\n'
+            'chaise,Chaise,30,2,inconnue\n'
+        )
+
+        lampe = Product.objects.get(slug='lampe')
+        self.assertEqual((lampe.title, lampe.price, lampe.stock), ('Lampe LED', decimal.Decimal('25.50'), 4))
+        self.assertEqual(lampe.created_at, created_at)
+        self.assertEqual(set(Product.objects.values_list('slug', flat=True)), {'lampe', 'coussin'})
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.active_product_count, 2)
+
+    def test_unknown_categories_can_be_created(self):
+        self.import_csv(
+            'slug,title,price,category,category_name\n'
+            'chaise,Chaise,30,jardin,Jardin\n',
+            '--create-categories'
+        )
+        self.assertEqual(Product.objects.get().category.name, 'Jardin')
+
+
+class LoadDataTests(TestCase):
+    def test_generate_load_data_creates_consistent_dataset(self):
+        call_command(
+            'generate_load_data', '--categories', '3', '--products', '40', '--users', '4',
+            '--carts', '6', '--orders', '8', '--seed', '1', stdout=StringIO()
+        )
+
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Order.objects.count(), 8)
+        self.assertTrue(self.client.login(username=User.objects.first().username, password=USER_PASSWORD))
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.total, sum(item.total for item in order.items.all()))
+        active = sum(Category.objects.values_list('active_product_count', flat=True))
+        self.assertEqual(active, Product.objects.filter(is_active=True).count())
+
+    def test_recorder_reports_percentiles_per_endpoint(self):
+        recorder = Recorder()
+        for ms in range(1, 101):
+            recorder.record('store:api_products', ms / 1000, 200)
+        recorder.record('store:api_cart', 0.5, 500)
+
+        summary = recorder.summary(wall_time=10)
+        products = summary['endpoints']['store:api_products']
+        self.assertEqual((products['p50_ms'], products['p95_ms'], products['p99_ms']), (50, 95, 99))
+        self.assertEqual(products['throughput_rps'], 10)
+        self.assertEqual(summary['total']['errors'], 1)
+
+    def test_scenarios_cover_the_routes_called_by_main_js(self):
+        requested = set()
+
+        class DryRunUser(VirtualUser):
+            def request(test_user, endpoint, path, method='GET', data=None):
+                match = resolve(path.split('?')[0])
+                self.assertEqual(endpoint, f'{match.namespace}:{match.url_name}', path)
+                requested.add(endpoint)
+                return {'cart_item': {'id': 1}}
+
+        fixtures = {'products': [(1, 'lampe'), (2, 'vase')], 'categories': ['maison'],
+                    'words': ['lampe'], 'users': ['client']}
+        user = DryRunUser('http://testserver', Recorder(), fixtures)
+        for scenario in (user.browse, user.shop, user.account, user.register):
+            scenario()
+
+        with open(settings.BASE_DIR / 'static' / 'js' / 'main.js', encoding='utf-8') as f:
+            paths = re.findall(r"fetch\(\s*[`'\"](/api/[^`'\"?$]*)", f.read())
+        called = {f'{resolve(path).namespace}:{resolve(path).url_name}' for path in paths}
+        self.assertIn('store:api_bootstrap', called)
+        self.assertEqual(called - requested, set())
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def png(self, width, height, mode='RGBA'):
+        buffer = BytesIO()
+        Image.new(mode, (width, height), (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_derivatives_keep_ratio_and_never_upscale(self):
+        variants = images.generate_derivatives(BytesIO(self.png(700, 350)), 'derivatives/test')
+
+        self.assertEqual(set(variants), set(images.FORMATS))
+        self.assertEqual([width for width, _ in variants['jpeg']], [160, 320, 640])
+        with default_storage.open(variants['jpeg'][1][1]) as f, Image.open(f) as derivative:
+            self.assertEqual((derivative.format, derivative.size), ('JPEG', (320, 160)))
+
+        small = images.generate_derivatives(BytesIO(self.png(100, 80, mode='P')), 'derivatives/small')
+        self.assertEqual(small['jpeg'], [[100, 'derivatives/small-100w.jpg']])
+
+    def test_category_image_renders_srcset_per_format(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(
+                name='Maison', slug='maison', image=SimpleUploadedFile('maison.png', self.png(1200, 600))
+            )
+            # Déclinaisons générées après commit, pas pendant l'enregistrement
+            self.assertEqual(Category.objects.get().image_variants, {})
+        category.refresh_from_db()
+        self.assertEqual(category.image_variants['source'], category.image.name)
+
+        html = Template('{% load store_images %}{% category_image category sizes="50vw" %}').render(
+            Context({'category': category})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertRegex(html, r'srcset="/media/derivatives/categories/maison\S*-160w\.jpg 160w, .* 1024w"')
+        self.assertRegex(html, r'<img src="/media/derivatives/categories/maison\S*-640w\.jpg"')
+        self.assertIn('alt="Maison"', html)
+
+        category.image_variants = {}
+        html = Template('{% load store_images %}{% category_image category %}').render(Context({'category': category}))
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'<img src="{category.image.url}"', html)
+
+    def test_build_image_derivatives_only_processes_stale_categories(self):
+        Category.objects.create(
+            name='Maison', slug='maison', image=SimpleUploadedFile('maison.png', self.png(400, 400))
+        )
+        Category.objects.update(image_variants={})
+
+        out = StringIO()
+        call_command('build_image_derivatives', stdout=out)
+        self.assertIn("1 image(s) de catégorie traitée(s)", out.getvalue())
+        variants = Category.objects.get().image_variants
+        self.assertEqual([width for width, _ in variants['jpeg']], [160, 320])
+        self.assertTrue(all(default_storage.exists(name) for _, name in variants['jpeg']))
+
+        out = StringIO()
+        call_command('build_image_derivatives', stdout=out)
+        self.assertIn("0 image(s) de catégorie traitée(s)", out.getvalue())
+        call_command('build_image_derivatives', '--force', stdout=out)
+        self.assertIn("1 image(s) de catégorie traitée(s)", out.getvalue())
+
+
+class StaticBuildTests(TestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(source, 'images'))
+        os.makedirs(os.path.join(source, 'js'))
+        for name in ('images/logo.png', 'images/logo - Copie.png'):
+            with open(os.path.join(source, name), 'wb') as f:
+                f.write(b'\x89PNG identique')
+        with open(os.path.join(source, 'js', 'app.js'), 'w') as f:
+            f.write('console.log("ChinaTradeMaster");\n' * 100)
+
+        settings = override_settings(STATICFILES_DIRS=[source], STATIC_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_identical_files_share_one_hashed_name(self):
+        self.assertEqual(static('images/logo - Copie.png'), static('images/logo.png'))
+        self.assertRegex(static('images/logo.png'), r'^/static/images/logo\.[0-9a-f]{12}\.png$')
+
+    def test_precompressed_variant_is_served_with_immutable_headers(self):
+        hashed = staticfiles_storage.stored_name('js/app.js')
+        self.assertTrue(os.path.exists(os.path.join(self.root, hashed + '.gz')))
+
+        response = self.client.get(static('js/app.js'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self.client.get(static('js/app.js'), HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+PERF_BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'perf_baseline.json')
+# Une vue régresse si sa médiane dépasse max(référence x facteur, référence + marge)
+PERF_TOLERANCE = 3.0
+PERF_MARGIN_MS = 25
+# Les temps dépendent de la machine de référence : comparaison sur demande seulement
+PERF_TIMINGS = bool(os.environ.get('PERF_TIMINGS') or os.environ.get('PERF_BASELINE_UPDATE'))
+
+
+class ViewPerformanceTests(TestCase):
+    """
+    Nombre de requêtes SQL constant quelle que soit la taille des données, et
+    temps de réponse comparés à store/perf_baseline.json, sur demande
+    (PERF_TIMINGS=1, sur une machine comparable à celle de la référence). Pour
+    régénérer la référence : PERF_BASELINE_UPDATE=1 python manage.py test store.tests.ViewPerformanceTests
+    """
+    small, large = 3, 30
+
+    def setUp(self):
+        self.user = User.objects.create_user('client', 'client@example.com', 'motdepasse')
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        self.seeded = 0
+
+    def seed(self, size):
+        """Porte les données à `size` catégories, commandes et lignes de panier"""
+        session_key = self.client.session.session_key
+        for i in range(self.seeded, size):
+            category = Category.objects.create(name=f'Catégorie {i}', slug=f'categorie-{i}')
+            products = [
+                Product.objects.create(
+                    title=f'Produit {i}-{j}', slug=f'produit-{i}-{j}', description='Description',
+                    price='10.00', stock=1000, category=category
+                )
+                for j in range(2)
+            ]
+            order = Order.objects.create(
+                user=self.user, email='client@example.com', first_name='Jean', last_name='Dupont',
+                address='Abidjan', total='20.00'
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price='10.00', total='10.00')
+                for product in products
+            )
+            CartItem.objects.create(
+                session_id=session_key, user=self.user, product=products[0],
+                quantity=1, price_snapshot='10.00'
+            )
+        self.seeded = size
+
+    def requests(self):
+        """(nom, méthode, chemin, corps JSON) pour chaque vue de store.views"""
+        product = Product.objects.order_by('-pk').first()
+        category = product.category
+        item = CartItem.objects.filter(user=self.user).order_by('-pk').first()
+        return [
+            ('index', 'get', '/', None),
+            ('cart_page', 'get', '/cart/', None),
+            ('product_detail_page', 'get', f'/product/{product.slug}/', None),
+            ('api_products', 'get', '/api/products/', None),
+            ('api_products_search', 'get', '/api/products/?q=produit', None),
+            ('api_products_cursor', 'get', '/api/products/?cursor=', None),
+            ('api_product_facets', 'get', '/api/facets/?q=produit&max_price=100', None),
+            ('api_product_detail', 'get', f'/api/products/{product.slug}/', None),
+            ('api_categories', 'get', '/api/categories/', None),
+            ('api_cart', 'get', '/api/cart/', None),
+            ('api_cart_add', 'post', '/api/cart/add/', {'product_id': product.id, 'quantity': 1}),
+            ('api_cart_update', 'patch', f'/api/cart/update/{item.id}/', {'quantity': 2}),
+            ('api_cart_batch', 'post', '/api/cart/batch/', {'operations': [
+                {'op': 'set', 'item_id': line.id, 'quantity': 1}
+                for line in CartItem.objects.filter(user=self.user)
+            ]}),
+            ('api_cart_remove_item', 'delete', f'/api/cart/remove/{item.id}/', None),
+            ('categories_page', 'get', '/categories/', None),
+            ('products_page', 'get', '/products/', None),
+            ('products_page_cursor', 'get', '/products/?cursor=', None),
+            ('category_detail_page', 'get', f'/category/{category.slug}/', None),
+            ('about_page', 'get', '/about/', None),
+            ('contact_page', 'get', '/contact/', None),
+            ('mon_compte_page', 'get', '/mon-compte/', None),
+            ('mes_commandes_page', 'get', '/mes-commandes/', None),
+            ('checkout_page', 'get', '/checkout/', None),
+            ('api_user_orders', 'get', '/api/user/orders/', None),
+            ('api_auth_status', 'get', '/api/auth/status/', None),
+            ('api_bootstrap', 'get', '/api/bootstrap/', None),
+            ('api_checkout', 'post', '/api/checkout/', CHECKOUT_DATA),
+        ]
+
+    def admin_requests(self):
+        return [
+            (f'admin_{model}', 'get', f'/admin/store/{model}/', None)
+            for model in ('category', 'product', 'order', 'cartitem', 'orderitem')
+        ]
+
+    def call(self, client, method, path, data):
+        # Cache vidé : on mesure le travail réel de la vue, pas un succès de cache
+        catalog_cache.get_cache().clear()
+        if data is None:
+            response = getattr(client, method)(path)
+        else:
+            response = getattr(client, method)(path, json.dumps(data), content_type='application/json')
+        self.assertLess(response.status_code, 400, f'{method.upper()} {path}')
+        return response
+
+    def count_queries(self, client, requests):
+        counts = {}
+        for name, method, path, data in requests:
+            with CaptureQueriesContext(connection) as ctx:
+                self.call(client, method, path, data)
+            counts[name] = len(ctx)
+        return counts
+
+    def auth_query_counts(self):
+        client = Client()
+        counts = {}
+        with CaptureQueriesContext(connection) as ctx:
+            self.call(client, 'post', '/api/auth/register/', {
+                'username': f'nouveau{self.seeded}', 'email': f'nouveau{self.seeded}@example.com',
+                'password': 'motdepasse',
+            })
+        counts['api_auth_register'] = len(ctx)
+        for name, path, data in [
+            ('api_auth_logout', '/api/auth/logout/', {}),
+            ('api_auth_login', '/api/auth/login/', {'username': 'client', 'password': 'motdepasse'}),
+        ]:
+            with CaptureQueriesContext(connection) as ctx:
+                self.call(client, 'post', path, data)
+            counts[name] = len(ctx)
+        return counts
+
+    def login(self, client, user):
+        client.force_login(user)
+        # Première requête hors mesure : prolongation de session (LazySessionMiddleware)
+        client.get('/api/auth/status/')
+
+    def measure_all(self):
+        # Administration d'abord : la commande finale vide le panier
+        admin = Client()
+        self.login(admin, self.admin)
+        counts = self.count_queries(admin, self.admin_requests())
+        self.login(self.client, self.user)
+        counts.update(self.count_queries(self.client, self.requests()))
+        counts.update(self.auth_query_counts())
+        return counts
+
+    def test_query_counts_do_not_depend_on_data_size(self):
+        self.seed(self.small)
+        small = self.measure_all()
+        self.seed(self.large)
+        large = self.measure_all()
+
+        for name in small:
+            with self.subTest(view=name):
+                self.assertEqual(small[name], large[name])
+
+    @skipUnless(PERF_TIMINGS, 'Comparaison des temps désactivée (PERF_TIMINGS=1 pour la lancer)')
+    def test_timings_against_baseline(self):
+        self.seed(self.large)
+        self.login(self.client, self.user)
+        admin = Client()
+        self.login(admin, self.admin)
+        reads = [request for request in self.requests() if request[1] == 'get']
+
+        timings = {}
+        for client, requests in ((self.client, reads), (admin, self.admin_requests())):
+            for name, method, path, data in requests:
+                self.call(client, method, path, data)  # échauffement (gabarits, imports)
+                durations = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    self.call(client, method, path, data)
+                    durations.append((time.perf_counter() - start) * 1000)
+                timings[name] = round(statistics.median(durations), 2)
+
+        if os.environ.get('PERF_BASELINE_UPDATE'):
+            with open(PERF_BASELINE_PATH, 'w') as f:
+                json.dump(timings, f, indent=2, sort_keys=True)
+                f.write('\n')
+            return
+
+        with open(PERF_BASELINE_PATH) as f:
+            baseline = json.load(f)
+        for name, elapsed in timings.items():
+            with self.subTest(view=name):
+                self.assertIn(name, baseline, 'Référence absente : régénérez perf_baseline.json')
+                limit = max(baseline[name] * PERF_TOLERANCE, baseline[name] + PERF_MARGIN_MS)
+                self.assertLessEqual(elapsed, limit, f'{name} : {elapsed} ms (référence {baseline[name]} ms)')
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN est propre à SQLite")
+class IndexUsageTests(TestCase):
+    """
+    Plan d'exécution des requêtes fréquentes de store.views : aucune ne doit
+    parcourir toute une table (ligne `SCAN <table>` sans index). Les listes de
+    catégories, petites et lues en entier par construction, ne sont pas vérifiées.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret')
+        # Volumes proportionnés à une vraie boutique : ANALYZE guide le planificateur
+        categories = Category.objects.bulk_create(
+            [Category(name=f'Rayon {i}', slug=f'rayon-{i}') for i in range(30)]
+        )
+        cls.category = Category.objects.create(name='Maison', slug='maison')
+        Product.objects.bulk_create([
+            Product(title=f'Lampe {i}', slug=f'lampe-{i}', description='Lampe de salon', price=5 + i % 100,
+                    stock=10, category=cls.category if i % 31 == 0 else categories[i % 30],
+                    is_active=i % 5 != 0)
+            for i in range(1000)
+        ])
+        search.rebuild_index()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def hot_queries(self):
+        active = Product.objects.filter(is_active=True).select_related('category')
+        in_category = active.filter(category=self.category)
+        product_ids = list(Product.objects.values_list('pk', flat=True)[:3])
+        session_key = 'a' * 32
+        return {
+            'index': active[:8],
+            'api_products': active[:12],
+            'api_products_count': active.order_by().values('pk'),
+            'api_products_category': active.filter(category__slug='maison')[:12],
+            'api_products_price': active.filter(price__gte=50, price__lte=60)[:12],
+            'api_products_category_price': active.filter(
+                category__slug='maison', price__gte=50, price__lte=60)[:12],
+            'api_products_cursor': active.filter(
+                Q(created_at__lt=timezone.now()) | Q(created_at=timezone.now(), pk__lt=100)
+            ).order_by('-created_at', '-pk')[:13],
+            'api_products_search': search.search_products(active, 'lampe')[:12],
+            'api_product_detail': Product.objects.filter(slug='lampe-1', is_active=True),
+            'category_detail_page': Product.objects.filter(category=self.category, is_active=True)[:12],
+            'category_detail_count': Product.objects.filter(category=self.category, is_active=True).order_by().values('pk'),
+            'cart_by_user': CartItem.objects.filter(user=self.user).select_related('product'),
+            'cart_by_session': CartItem.objects.filter(session_id=session_key).select_related('product'),
+            'cart_persist_user': CartItem.objects.filter(product_id__in=product_ids, user=self.user),
+            'cart_persist_session': CartItem.objects.filter(product_id__in=product_ids, session_id=session_key),
+            'checkout_stock': Product.objects.filter(
+                Q(pk=product_ids[0], stock__gte=1) | Q(pk=product_ids[1], stock__gte=2)),
+            'api_user_orders': Order.objects.filter(user=self.user)
+                .annotate(items_count=Count('items')).order_by('-created_at'),
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                full_scans = [
+                    line for line in plan.splitlines()
+                    if re.search(r'\bSCAN (store_\w+|auth_\w+)$', line.strip())
+                ]
+                self.assertEqual(full_scans, [], f"{name} :\n{plan}")
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    buyers = 8
+    stock = 3
+
+    def test_concurrent_checkouts_never_oversell(self):
+        category = Category.objects.create(name='Mode', slug='mode')
+        product = Product.objects.create(
+            title='Sneakers', slug='sneakers', description='Description',
+            price='50.00', stock=self.stock, category=category
+        )
+
+        clients = []
+        for i in range(self.buyers):
+            user = User.objects.create_user(f'acheteur{i}', f'acheteur{i}@example.com', 'motdepasse')
+            client = Client()
+            client.force_login(user)
+            CartItem.objects.create(
+                session_id=client.session.session_key, user=user,
+                product=product, quantity=1, price_snapshot=product.price
+            )
+            clients.append(client)
+
+        barrier = threading.Barrier(self.buyers)
+        statuses = []
+
+        def buy(client):
+            try:
+                barrier.wait()
+                response = client.post(
+                    '/api/checkout/', json.dumps(CHECKOUT_DATA), content_type='application/json'
+                )
+                statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).count()
+        self.assertEqual(statuses.count(200), self.stock)
+        self.assertEqual(statuses.count(400), self.buyers - self.stock)
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
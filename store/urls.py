@@ -14,17 +14,21 @@ urlpatterns = [
     
     # API endpoints
     path('api/products/', views.api_products, name='api_products'),
+    # Hors de api/products/ : aucun slug de produit ne peut masquer la route
+    path('api/facets/', views.api_product_facets, name='api_product_facets'),
     path('api/products/<slug:slug>/', views.api_product_detail, name='api_product_detail'),
     path('api/categories/', views.api_categories, name='api_categories'),
     path('api/cart/', views.api_cart, name='api_cart'),
     path('api/cart/add/', views.api_cart_add, name='api_cart_add'),
     path('api/cart/update/<int:item_id>/', views.api_cart_update, name='api_cart_update'),
     path('api/cart/remove/<int:item_id>/', views.api_cart_remove_item, name='api_cart_remove_item'),
+    path('api/cart/batch/', views.api_cart_batch, name='api_cart_batch'),
     path('api/checkout/', views.api_checkout, name='api_checkout'),
     path('api/auth/login/', views.api_auth_login, name='api_auth_login'),
     path('api/auth/register/', views.api_auth_register, name='api_auth_register'),
     path('api/auth/logout/', views.api_auth_logout, name='api_auth_logout'),
     path('api/auth/status/', views.api_auth_status, name='api_auth_status'),
+    path('api/bootstrap/', views.api_bootstrap, name='api_bootstrap'),
     
     # Nouvelles pages
     path('categories/', views.categories_page, name='categories'),
@@ -38,4 +42,7 @@ urlpatterns = [
     path('mes-commandes/', views.mes_commandes_page, name='mes_commandes'),
     path('checkout/', views.checkout_page, name='checkout'),
     path('api/user/orders/', views.api_user_orders, name='api_user_orders'),
+
+    # Supervision
+    path('internal/metrics', views.internal_metrics, name='internal_metrics'),
 ]
\ No newline at end of file
@@ -1,142 +1,295 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, Http404
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, condition
+from django.views.decorators.cache import cache_control
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, F, Case, When, Value, BooleanField
+from django.db.models.functions import Now
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.forms.models import model_to_dict
+from django.utils.crypto import constant_time_compare
 import json
 import decimal
+from functools import wraps
 from .models import Category, Product, CartItem, Order, OrderItem
+from . import search
+from . import cache as catalog_cache
+from . import conditional
+from . import documents
+from .pagination import paginate_by_cursor, apaginate_by_cursor, apage, InvalidCursor
+from .cart import get_cart, aget_cart, CartError
+from . import metrics
 
 def index(request):
     """
     Vue principale - page unique de l'e-commerce
     """
-    categories = Category.objects.all()
-    products = Product.objects.filter(is_active=True).select_related('category')
+    def build_context():
+        products = Product.objects.filter(is_active=True).select_related('category')
+        return {
+            'categories': list(Category.objects.all()),
+            'products': list(products[:8]),  # Limite pour la page d'accueil
+        }
     
-    context = {
-        'categories': categories,
-        'products': products[:8],  # Limite pour la page d'accueil
-    }
+    context = catalog_cache.get_or_set('index', {}, build_context)
     return render(request, 'index.html', context)
 
 def cart_page(request):
     """
     Vue pour la page du panier
+    
+    Le panier est embarqué dans la page (`initial_state`, json_script) : le
+    JavaScript l'affiche sans appeler /api/cart/.
     """
-    return render(request, 'cart.html')
+    context = {
+        'initial_state': {'cart': cart_response_data(get_cart(request).lines())},
+    }
+    return render(request, 'cart.html', context)
+
+# Produits de la même catégorie affichés sur la page d'un produit
+RELATED_PRODUCTS = 4
 
 def product_detail_page(request, slug):
     """
     Vue pour la page de détails d'un produit
-    """
-    product = get_object_or_404(Product, slug=slug, is_active=True)
+    
+    Le produit, les produits similaires et le panier sont embarqués dans la
+    page (`initial_state`, json_script), dans le format des API, au lieu
+    d'être redemandés par le JavaScript au chargement.
+    """
+    product = get_object_or_404(Product.objects.select_related('category'), slug=slug, is_active=True)
+    related = (
+        Product.objects.filter(category_id=product.category_id, is_active=True)
+        .exclude(pk=product.pk).select_related('category')[:RELATED_PRODUCTS]
+    )
     context = {
         'product': product,
+        'initial_state': {
+            'product': documents.product_detail_data(product),
+            'related': [documents.product_list_data(item) for item in related],
+            'cart': cart_response_data(get_cart(request).lines()),
+        },
     }
     return render(request, 'product_detail.html', context)
 
+def json_document_response(items):
+    """
+    Réponse JSON assemblée à partir de paires (clé, fragment déjà encodé)
+    """
+    return HttpResponse(documents.json_object(items), content_type='application/json')
+
+# Taille des pages de /api/products/ (`page_size` ou `limit`) et plafond
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 100
+
+def page_size(params):
+    """
+    Taille de page demandée par `page_size` ou `limit`, bornée à MAX_PAGE_SIZE
+    (les valeurs invalides donnent la taille par défaut)
+    """
+    try:
+        size = int(params.get('page_size') or params.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+def price_filter(params):
+    """
+    Condition sur les bornes `min_price` / `max_price` des paramètres GET
+    (les valeurs invalides sont ignorées)
+    """
+    condition = Q()
+    for param, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+        value = params.get(param)
+        if value:
+            try:
+                condition &= Q(**{lookup: decimal.Decimal(value)})
+            except (ValueError, decimal.InvalidOperation):
+                pass
+    return condition
+
 @require_http_methods(["GET"])
-def api_products(request):
+@cache_control(no_cache=True)
+@conditional.acondition(etag_func=conditional.acatalog_etag, last_modified_func=conditional.acatalog_last_modified)
+@catalog_cache.cached_catalog_view('api_products', params=(
+    'category', 'min_price', 'max_price', 'q', 'page', 'cursor', 'page_size', 'limit', 'fields',
+), stock=True)
+async def api_products(request):
     """
     API pour récupérer la liste des produits avec filtres et pagination
+    
+    Vue asynchrone (ORM asynchrone), comme les autres lectures fréquentes du
+    catalogue, du panier et de l'authentification : sous ASGI, aucun thread
+    n'est réservé à la requête pendant les attentes.
+    
+    `page_size` (ou `limit`) fixe la taille de page, plafonnée à MAX_PAGE_SIZE ;
+    `fields=id,name,...` ne renvoie (et ne lit en base) que ces champs.
     """
     products = Product.objects.filter(is_active=True).select_related('category')
+    per_page = page_size(request.GET)
+    
+    fields = None
+    if request.GET.get('fields'):
+        try:
+            fields = documents.parse_fields(request.GET['fields'])
+        except ValueError as e:
+            return JsonResponse({'error': f'Champ inconnu : {e}'}, status=400)
+        products = documents.sparse_queryset(products, fields)
+    
+    async def results(products_page):
+        if fields is not None:
+            return json.dumps([documents.product_sparse_data(product, fields) for product in products_page])
+        # Fragments JSON précalculés (voir store.documents), juxtaposés sans réencodage
+        return documents.json_array(await documents.aget_documents(documents.LIST, products_page))
     
     # Filtres
     category = request.GET.get('category')
     if category:
         products = products.filter(category__slug=category)
     
-    min_price = request.GET.get('min_price')
-    if min_price:
-        try:
-            products = products.filter(price__gte=decimal.Decimal(min_price))
-        except (ValueError, decimal.InvalidOperation):
-            pass
-    
-    max_price = request.GET.get('max_price')
-    if max_price:
-        try:
-            products = products.filter(price__lte=decimal.Decimal(max_price))
-        except (ValueError, decimal.InvalidOperation):
-            pass
+    products = products.filter(price_filter(request.GET))
     
-    # Recherche
+    # Recherche (index plein texte, trié par pertinence)
     q = request.GET.get('q')
     if q:
-        products = products.filter(
-            Q(title__icontains=q) | 
-            Q(description__icontains=q) |
-            Q(category__name__icontains=q)
-        )
+        products = search.search_products(products, q, available=await search.ais_available())
+    
+    # Pagination par curseur (optionnelle) : ni COUNT(*) ni OFFSET
+    if 'cursor' in request.GET:
+        try:
+            products_page = await apaginate_by_cursor(products, request.GET['cursor'], per_page)
+        except InvalidCursor:
+            return JsonResponse({'error': 'Curseur invalide'}, status=400)
+        
+        return json_document_response([
+            ('results', await results(products_page)),
+            ('pagination', json.dumps({
+                'next_cursor': products_page.next_cursor,
+                'previous_cursor': products_page.previous_cursor,
+                'has_next': products_page.has_next(),
+                'has_previous': products_page.has_previous(),
+            })),
+        ])
     
     # Pagination
     page = request.GET.get('page', 1)
-    paginator = Paginator(products, 12)
-    products_page = paginator.get_page(page)
-    
-    products_data = []
-    for product in products_page:
-        products_data.append({
-            'id': product.id,
-            'name': product.title,  # Corrected from 'title' to 'name'
-            'slug': product.slug,
-            'description': product.description[:200] + '...' if len(product.description) > 200 else product.description,
-            'price': float(product.price),
-            'stock': product.stock,
-            'images': [{'image': product.image_url}] if product.image_url else [], # Corrected to 'images' array
-            'category': {
-                'name': product.category.name,
-                'slug': product.category.slug
-            },
-            'is_in_stock': product.is_in_stock,
-            'average_rating': 0, # Placeholder
-            'discount_percentage': 0 # Placeholder
-        })
+    paginator, products_page = await apage(products, page, per_page)
     
-    return JsonResponse({
-        'count': paginator.count,
-        'results': products_data,
-        'pagination': {
+    return json_document_response([
+        ('count', json.dumps(paginator.count)),
+        ('results', await results(products_page)),
+        ('pagination', json.dumps({
             'current_page': products_page.number,
             'total_pages': paginator.num_pages,
             'has_next': products_page.has_next(),
             'has_previous': products_page.has_previous(),
-        }
+        })),
+    ])
+
+# Bornes des tranches de prix des facettes (la dernière tranche est ouverte)
+PRICE_FACET_BOUNDS = [10, 25, 50, 100, 250, 500, 1000]
+
+@require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@condition(etag_func=conditional.catalog_etag, last_modified_func=conditional.catalog_last_modified)
+@catalog_cache.cached_catalog_view('api_product_facets', params=('category', 'min_price', 'max_price', 'q'))
+def api_product_facets(request):
+    """
+    API des facettes de la liste des produits : nombre de produits par
+    catégorie et par tranche de prix pour les filtres et la recherche courants
+    
+    Une seule requête groupée par (catégorie, tranche, dans les bornes de
+    prix) ; les deux facettes en sont déduites. Chacune ignore son propre
+    filtre : les compteurs de catégories tiennent compte du prix et de la
+    recherche, ceux des tranches de la catégorie et de la recherche.
+    """
+    products = Product.objects.filter(is_active=True)
+    q = request.GET.get('q')
+    if q:
+        products = search.search_products(products, q)
+    
+    bucket = Case(
+        *[When(price__lt=bound, then=Value(i)) for i, bound in enumerate(PRICE_FACET_BOUNDS)],
+        default=Value(len(PRICE_FACET_BOUNDS)),
+    )
+    price_condition = price_filter(request.GET)
+    in_price_range = (
+        Case(When(price_condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+        if price_condition else Value(True, output_field=BooleanField())
+    )
+    rows = (
+        products.order_by()
+        .values('category__slug', 'category__name', price_bucket=bucket, in_price_range=in_price_range)
+        .annotate(n=Count('id'))
+    )
+    
+    selected_category = request.GET.get('category')
+    categories = {}
+    buckets = [0] * (len(PRICE_FACET_BOUNDS) + 1)
+    total = 0
+    for row in rows:
+        in_category = not selected_category or row['category__slug'] == selected_category
+        if row['in_price_range']:
+            slug = row['category__slug']
+            if slug not in categories:
+                categories[slug] = {'slug': slug, 'name': row['category__name'], 'count': 0}
+            categories[slug]['count'] += row['n']
+            if in_category:
+                total += row['n']
+        if in_category:
+            buckets[row['price_bucket']] += row['n']
+    
+    bounds = [0] + PRICE_FACET_BOUNDS + [None]
+    return JsonResponse({
+        'count': total,
+        'categories': sorted(categories.values(), key=lambda category: category['name']),
+        'price_buckets': [
+            {'min_price': low, 'max_price': high, 'count': count}
+            for low, high, count in zip(bounds, bounds[1:], buckets)
+        ],
     })
 
 @require_http_methods(["GET"])
-def api_product_detail(request, slug):
+@cache_control(no_cache=True)
+@conditional.acondition(etag_func=conditional.aproduct_etag, last_modified_func=conditional.aproduct_last_modified)
+@catalog_cache.cached_catalog_view('api_product_detail', stock=True)
+async def api_product_detail(request, slug):
     """
     API pour récupérer les détails d'un produit
     """
-    product = get_object_or_404(Product, slug=slug, is_active=True)
-    
-    product_data = {
-        'id': product.id,
-        'title': product.title,
-        'slug': product.slug,
-        'description': product.description,
-        'price': float(product.price),
-        'stock': product.stock,
-        'image_url': product.image_url,
-        'category': {
-            'name': product.category.name,
-            'slug': product.category.slug
-        },
-        'is_in_stock': product.is_in_stock
-    }
+    try:
+        product = await Product.objects.select_related('category').aget(slug=slug, is_active=True)
+    except Product.DoesNotExist:
+        raise Http404
     
-    return JsonResponse(product_data)
+    [product_data] = await documents.aget_documents(documents.DETAIL, [product])
+    return HttpResponse(product_data, content_type='application/json')
+
+def bootstrap_params(request):
+    # Les visiteurs sans session partagent la même entrée (anonyme, panier vide)
+    return {'session': request.session.session_key or ''}
+
+def forgets_bootstrap(view):
+    """
+    Pour les vues qui modifient le panier : supprime la réponse de
+    /api/bootstrap/ en cache pour la session
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code < 400 and request.session.session_key:
+            catalog_cache.forget('api_bootstrap', bootstrap_params(request))
+        return response
+    return wrapper
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@forgets_bootstrap
 def api_cart_add(request):
     """
     API pour ajouter un produit au panier
@@ -154,28 +307,8 @@ def api_cart_add(request):
         if product.stock < quantity:
             return JsonResponse({'error': 'Stock insuffisant'}, status=400)
         
-        # Identifier la session ou l'utilisateur
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.create()
-            session_id = request.session.session_key
-        
-        user = request.user if request.user.is_authenticated else None
-        
-        # Vérifier si le produit est déjà dans le panier
-        cart_item, created = CartItem.objects.get_or_create(
-            session_id=session_id,
-            product=product,
-            defaults={
-                'user': user,
-                'quantity': quantity,
-                'price_snapshot': product.price
-            }
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        cart_item = get_cart(request).add(product, quantity)
+        metrics.CART_ADDITIONS.inc(quantity, source='add')
         
         return JsonResponse({
             'success': True,
@@ -193,6 +326,7 @@ def api_cart_add(request):
 
 @csrf_exempt
 @require_http_methods(["PATCH"])
+@forgets_bootstrap
 def api_cart_update(request, item_id):
     """
     API pour mettre à jour la quantité d'un article dans le panier
@@ -204,58 +338,37 @@ def api_cart_update(request, item_id):
         if quantity <= 0:
             return JsonResponse({'error': 'Quantité invalide'}, status=400)
 
-        cart_item = get_object_or_404(CartItem, id=item_id)
-        
-        # Basic ownership check
-        if cart_item.session_id != request.session.session_key and cart_item.user != request.user:
-            return JsonResponse({'error': 'Accès refusé'}, status=403)
-
-        if cart_item.product.stock < quantity:
-            return JsonResponse({'error': 'Stock insuffisant'}, status=400)
-
-        cart_item.quantity = quantity
-        cart_item.save()
+        get_cart(request).update(item_id, quantity)
 
         return JsonResponse({'success': True, 'message': 'Panier mis à jour'})
 
+    except CartError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
     except (json.JSONDecodeError, ValueError, KeyError):
         return JsonResponse({'error': 'Données invalides'}, status=400)
 
 @csrf_exempt
 @require_http_methods(["DELETE"])
+@forgets_bootstrap
 def api_cart_remove_item(request, item_id):
     """
     API pour supprimer un article du panier
     """
-    cart_item = get_object_or_404(CartItem, id=item_id)
-
-    # Basic ownership check
-    if cart_item.session_id != request.session.session_key and cart_item.user != request.user:
-        return JsonResponse({'error': 'Accès refusé'}, status=403)
-
-    cart_item.delete()
+    try:
+        get_cart(request).remove(item_id)
+    except CartError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
 
     return JsonResponse({'success': True, 'message': 'Article supprimé'})
 
-@require_http_methods(["GET"])
-def api_cart(request):
+def cart_response_data(lines):
     """
-    API pour récupérer le contenu du panier
+    Contenu du panier tel que renvoyé par l'API
     """
-    session_id = request.session.session_key
-    user = request.user if request.user.is_authenticated else None
-    
-    if user:
-        cart_items = CartItem.objects.filter(user=user).select_related('product')
-    elif session_id:
-        cart_items = CartItem.objects.filter(session_id=session_id).select_related('product')
-    else:
-        cart_items = CartItem.objects.none()
-    
     cart_data = []
     total = decimal.Decimal('0.00')
     
-    for item in cart_items:
+    for item in lines:
         item_total = item.total_price
         total += item_total
         cart_data.append({
@@ -273,17 +386,68 @@ def api_cart(request):
             'total': float(item_total)
         })
     
-    return JsonResponse({
+    return {
         'items': cart_data,
         'total': float(total),
         'item_count': len(cart_data)
-    })
+    }
+
+@require_http_methods(["GET"])
+async def api_cart(request):
+    """
+    API pour récupérer le contenu du panier
+    """
+    cart = await aget_cart(request)
+    return JsonResponse(cart_response_data(await cart.alines()))
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@forgets_bootstrap
+def api_cart_batch(request):
+    """
+    API pour appliquer plusieurs modifications au panier en un seul appel
+    
+    Corps attendu : {"operations": [{"op": "add" | "set" | "remove",
+    "product_id" ou "item_id": ..., "quantity": ...}, ...]}.
+    "set" avec une quantité nulle supprime la ligne. Toutes les opérations
+    sont appliquées dans une transaction ; le panier résultant est renvoyé.
+    """
+    try:
+        data = json.loads(request.body)
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return JsonResponse({'error': 'Aucune opération'}, status=400)
+        if not all(isinstance(operation, dict) for operation in operations):
+            return JsonResponse({'error': 'Opération invalide'}, status=400)
+        
+        lines = get_cart(request).apply(operations)
+        added = sum(int(op.get('quantity', 1)) for op in operations if op.get('op') == 'add')
+        if added:
+            metrics.CART_ADDITIONS.inc(added, source='batch')
+        
+        return JsonResponse({'success': True, **cart_response_data(lines)})
+        
+    except CartError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
+    except (json.JSONDecodeError, ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Données invalides'}, status=400)
+
+class InsufficientStock(Exception):
+    """Levée dans la transaction de commande pour l'annuler"""
+    def __init__(self, products):
+        super().__init__(', '.join(products))
+        self.products = products
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@forgets_bootstrap
 def api_checkout(request):
     """
     API pour créer une commande (simulation)
+    
+    Tout se fait dans une seule transaction, avec un nombre de requêtes fixe
+    quelle que soit la taille du panier : lecture verrouillée du panier et des
+    stocks, décrément conditionnel des stocks, création en masse des lignes.
     """
     try:
         data = json.loads(request.body)
@@ -294,45 +458,75 @@ def api_checkout(request):
             if not data.get(field):
                 return JsonResponse({'error': f'Le champ {field} est requis'}, status=400)
         
-        session_id = request.session.session_key
         user = request.user if request.user.is_authenticated else None
         
-        if user:
-            cart_items = CartItem.objects.filter(user=user).select_related('product')
-        elif session_id:
-            cart_items = CartItem.objects.filter(session_id=session_id).select_related('product')
-        else:
-            return JsonResponse({'error': 'Panier vide'}, status=400)
-        
-        if not cart_items.exists():
+        cart = get_cart(request)
+        if not user and not request.session.session_key:
             return JsonResponse({'error': 'Panier vide'}, status=400)
         
-        # Calculer le total
-        total = sum(item.total_price for item in cart_items)
-        
-        # Créer la commande
-        order = Order.objects.create(
-            user=user,
-            email=data['email'],
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            address=data['address'],
-            phone=data.get('phone', ''),
-            total=total
-        )
-        
-        # Créer les éléments de commande
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                price=cart_item.price_snapshot,
-                total=cart_item.total_price
+        with transaction.atomic():
+            # Écriture différée : le panier de session passe en base ici
+            cart.persist()
+            cart_items = cart.queryset()
+            
+            # Panier et produits en une requête, lignes verrouillées jusqu'au commit
+            items = list(cart_items.select_related('product').select_for_update())
+            if not items:
+                return JsonResponse({'error': 'Panier vide'}, status=400)
+            
+            quantities = {}
+            for item in items:
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+            
+            products = {item.product_id: item.product for item in items}
+            missing = [products[pk].title for pk, qty in quantities.items() if products[pk].stock < qty]
+            if missing:
+                raise InsufficientStock(missing)
+            
+            # Décrément en une requête ; la condition stock >= quantité protège
+            # contre la survente même sans verrou de ligne
+            guard = Q()
+            for pk, qty in quantities.items():
+                guard |= Q(pk=pk, stock__gte=qty)
+            decrement = Case(*[When(pk=pk, then=F('stock') - qty) for pk, qty in quantities.items()])
+            updated = Product.objects.filter(guard).update(stock=decrement, updated_at=Now())
+            if updated != len(quantities):
+                raise InsufficientStock([products[pk].title for pk in quantities])
+            
+            # Créer la commande
+            total = sum(item.total_price for item in items)
+            order = Order.objects.create(
+                user=user,
+                email=data['email'],
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                address=data['address'],
+                phone=data.get('phone', ''),
+                total=total
             )
+            
+            # Créer les éléments de commande
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=item.product_id,
+                    quantity=item.quantity,
+                    price=item.price_snapshot,
+                    total=item.total_price
+                )
+                for item in items
+            ])
+            
+            # Vider le panier
+            CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+            
+            # Les stocks ont changé : invalider après commit les seules entrées
+            # du cache qui les exposent (liste, détail, état du catalogue)
+            transaction.on_commit(catalog_cache.bump_stock_version)
         
-        # Vider le panier
-        cart_items.delete()
+        cart.mark_persisted()
+        metrics.CHECKOUTS.inc(result='success')
+        metrics.ORDER_TOTALS.observe(float(order.total))
         
         return JsonResponse({
             'success': True,
@@ -344,6 +538,9 @@ def api_checkout(request):
             }
         })
         
+    except InsufficientStock as e:
+        metrics.CHECKOUTS.inc(result='insufficient_stock')
+        return JsonResponse({'error': 'Stock insuffisant', 'products': e.products}, status=400)
     except (json.JSONDecodeError, ValueError, KeyError) as e:
         return JsonResponse({'error': f'Données invalides: {str(e)}'}, status=400)
 
@@ -402,7 +599,8 @@ def api_auth_register(request):
             return JsonResponse({'error': 'Cet email existe déjà'}, status=400)
         
         user = User.objects.create_user(username=username, email=email, password=password)
-        login(request, user)
+        # Plusieurs backends configurés (allauth) : login() exige de préciser lequel
+        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
         
         return JsonResponse({
             'success': True,
@@ -430,20 +628,23 @@ def api_auth_logout(request):
     })
 
 @require_http_methods(["GET"])
-def api_categories(request):
+@cache_control(no_cache=True)
+@conditional.acondition(etag_func=conditional.acatalog_etag, last_modified_func=conditional.acatalog_last_modified)
+@catalog_cache.cached_catalog_view('api_categories')
+async def api_categories(request):
     """
     API pour récupérer toutes les catégories
     """
     categories = Category.objects.all()
     categories_data = []
     
-    for category in categories:
+    async for category in categories:
         categories_data.append({
             'id': category.id,
             'name': category.name,
             'slug': category.slug,
             'description': category.description,
-            'product_count': category.products.count()
+            'product_count': category.active_product_count
         })
     
     return JsonResponse({'success': True, 'categories': categories_data})
@@ -452,9 +653,7 @@ def categories_page(request):
     """
     Vue pour la page des catégories
     """
-    categories = Category.objects.annotate(
-        product_count=Count('products', filter=Q(products__is_active=True))
-    ).filter(product_count__gt=0).order_by('name')
+    categories = Category.objects.filter(active_product_count__gt=0).order_by('name')
     
     context = {
         'title': 'Toutes les catégories',
@@ -480,16 +679,22 @@ def products_page(request, category_slug=None):
             category = get_object_or_404(Category, slug=query_slug)
             products = products.filter(category=category)
     
-    # Pagination
-    page = request.GET.get('page', 1)
-    paginator = Paginator(products, 12)  # 12 produits par page
-    
-    try:
-        products_paginated = paginator.page(page)
-    except PageNotAnInteger:
-        products_paginated = paginator.page(1)
-    except EmptyPage:
-        products_paginated = paginator.page(paginator.num_pages)
+    # Pagination par curseur si demandée (?cursor=), sinon pagination classique
+    if 'cursor' in request.GET:
+        try:
+            products_paginated = paginate_by_cursor(products, request.GET['cursor'], 12)
+        except InvalidCursor:
+            products_paginated = paginate_by_cursor(products, None, 12)
+    else:
+        page = request.GET.get('page', 1)
+        paginator = Paginator(products, 12)  # 12 produits par page
+        
+        try:
+            products_paginated = paginator.page(page)
+        except PageNotAnInteger:
+            products_paginated = paginator.page(1)
+        except EmptyPage:
+            products_paginated = paginator.page(paginator.num_pages)
     
     context = {
         'title': 'Tous les produits' if not category else f'Produits - {category.name}',
@@ -571,7 +776,11 @@ def api_user_orders(request):
     """
     API pour récupérer l'historique des commandes de l'utilisateur
     """
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = (
+        Order.objects.filter(user=request.user)
+        .annotate(items_count=Count('items'))
+        .order_by('-created_at')
+    )
     orders_data = []
     for order in orders:
         orders_data.append({
@@ -579,25 +788,82 @@ def api_user_orders(request):
             'total': float(order.total),
             'status': order.get_status_display(),
             'created_at': order.created_at.strftime('%d/%m/%Y'),
-            'items_count': order.items.count()
+            'items_count': order.items_count
         })
     return JsonResponse({'orders': orders_data})
 
+def auth_status_data(user):
+    """
+    Statut d'authentification tel que renvoyé par l'API
+    """
+    if not user.is_authenticated:
+        return {'isAuthenticated': False}
+    return {
+        'isAuthenticated': True,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+        }
+    }
+
 @require_http_methods(["GET"])
-def api_auth_status(request):
+async def api_auth_status(request):
     """
     API pour vérifier le statut d'authentification de l'utilisateur
     """
-    if request.user.is_authenticated:
-        return JsonResponse({
-            'isAuthenticated': True,
-            'user': {
-                'id': request.user.id,
-                'username': request.user.username,
-                'email': request.user.email,
-                'first_name': request.user.first_name,
-                'last_name': request.user.last_name,
-            }
-        })
-    else:
-        return JsonResponse({'isAuthenticated': False})
+    return JsonResponse(auth_status_data(await request.auser()))
+
+async def nav_categories():
+    return [
+        {'name': category.name, 'slug': category.slug, 'product_count': category.active_product_count}
+        async for category in Category.objects.filter(active_product_count__gt=0).order_by('name')
+    ]
+
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+async def api_bootstrap(request):
+    """
+    API de démarrage des pages : statut d'authentification (comme
+    /api/auth/status/), résumé du panier et catégories de la navigation, en
+    un seul appel
+    
+    La réponse est gardée en cache par session (BOOTSTRAP_CACHE_TIMEOUT) :
+    connexion et déconnexion changent de session, les vues qui modifient le
+    panier oublient l'entrée (forgets_bootstrap) et toute écriture sur le
+    catalogue change sa version.
+    """
+    async def build():
+        cart = await aget_cart(request)
+        return {
+            **auth_status_data(await request.auser()),
+            'cart': await cart.asummary(),
+            'categories': await catalog_cache.aget_or_set('nav_categories', {}, nav_categories),
+        }
+    
+    data = await catalog_cache.aget_or_set(
+        'api_bootstrap', bootstrap_params(request), build,
+        timeout=getattr(settings, 'BOOTSTRAP_CACHE_TIMEOUT', 30),
+    )
+    return JsonResponse(data)
+
+def metrics_token_matches(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return False
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token)
+
+@require_http_methods(["GET"])
+def internal_metrics(request):
+    """
+    Métriques au format Prometheus (voir store.metrics), réservées aux
+    membres du staff et aux requêtes portant `Authorization: Bearer
+    <METRICS_TOKEN>`. L'adresse du client n'est pas un critère : derrière un
+    proxy inverse, toutes les requêtes viennent de 127.0.0.1.
+    """
+    if not metrics_token_matches(request) and not request.user.is_staff:
+        raise Http404
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')